@@ -3,8 +3,6 @@ import sqlite3
 import sys
 from typing import List, Optional, Union
 
-from proxy_hunter import copy_file, delete_path
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 
@@ -341,6 +339,8 @@ class SQLiteHelper:
         Returns:
             None
         """
+        from proxy_hunter import copy_file, delete_path
+
         self.close()
         backup_path = None
         if os.path.exists(new_db_path):
@@ -3,16 +3,22 @@ import os
 import re
 import json
 import hashlib
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-from .SQLiteHelper import SQLiteHelper
-from src.database.jsonDb import JsonDB
+from ..utils.console import safe_print
 from ..utils.file import get_relative_path
+from ..utils.tracing import traced
 
+if TYPE_CHECKING:
+    # Loaded on first use: SQLiteHelper pulls in proxy_hunter, JsonDB jsonpickle
+    from .SQLiteHelper import SQLiteHelper
 
-def get_database_instance() -> SQLiteHelper:
+
+def get_database_instance() -> "SQLiteHelper":
     """Get or create a singleton instance of the SQLiteHelper for the voucher database."""
+    from .SQLiteHelper import SQLiteHelper
+
     if not hasattr(
         get_database_instance, "_instance"
     ) or get_database_instance._db_path != get_relative_path(
@@ -30,6 +36,33 @@ def get_database_instance() -> SQLiteHelper:
 # Banned voucher codes (normalized, no spaces)
 BANNED_VOUCHERS = {"1234123412341234"}
 
+# One row per image; ``codes`` is a comma-separated list ("" when none were found)
+VOUCHER_COLUMNS = [
+    "image_path TEXT PRIMARY KEY",
+    "codes TEXT NOT NULL",
+    "created_at DATETIME DEFAULT CURRENT_TIMESTAMP",
+]
+# One row per (code, image), kept next to ``vouchers`` so reports can group by
+# code or day from an index instead of splitting every ``codes`` string
+VOUCHER_CODE_COLUMNS = [
+    "id INTEGER PRIMARY KEY",
+    "code TEXT NOT NULL",
+    "image_path TEXT NOT NULL",
+    "day TEXT NOT NULL",
+    "created_at DATETIME DEFAULT CURRENT_TIMESTAMP",
+    "UNIQUE (image_path, code)",
+]
+# Covering indexes for the reports in database.export
+VOUCHER_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_voucher_codes_code"
+    " ON voucher_codes (code, image_path)",
+    "CREATE INDEX IF NOT EXISTS idx_voucher_codes_day ON voucher_codes (day, code)",
+    "CREATE INDEX IF NOT EXISTS idx_vouchers_no_codes"
+    " ON vouchers (image_path, codes) WHERE codes = ''",
+]
+# Rows per statement when backfilling voucher_codes
+BACKFILL_PAGE_SIZE = 1000
+
 
 def md5(text: str) -> str:
     """Generate MD5 hash for a given string."""
@@ -70,15 +103,52 @@ def extract_voucher_codes(text: str, output_dir: Optional[str] = None) -> List[s
     return result
 
 
-def safe_print(message, file=sys.stderr):
-    """Safely print messages, handling encoding issues"""
-    try:
-        print(message, file=file)
-        file.flush()
-    except UnicodeEncodeError:
-        # Fallback to ASCII if Unicode fails
-        print(message.encode("ascii", "ignore").decode("ascii"), file=file)
-        file.flush()
+def split_codes(codes: str) -> List[str]:
+    """Parse a ``vouchers.codes`` value into normalized 16-digit codes."""
+    normalized = (re.sub(r"\s+", "", code) for code in (codes or "").split(","))
+    return [code for code in normalized if len(code) == 16]
+
+
+def ensure_voucher_schema(db_helper: "SQLiteHelper") -> None:
+    """
+    Create the ``vouchers`` and ``voucher_codes`` tables and their indexes.
+
+    ``voucher_codes`` is filled from existing ``vouchers`` rows the first time
+    it is created, a page of rowids at a time. Runs once per connection.
+    """
+    if getattr(db_helper, "_voucher_schema_ready", False):
+        return
+    conn = db_helper.conn
+    has_codes_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'voucher_codes'"
+    ).fetchone()
+    db_helper.create_table("vouchers", VOUCHER_COLUMNS)
+    db_helper.create_table("voucher_codes", VOUCHER_CODE_COLUMNS)
+    for sql in VOUCHER_INDEXES:
+        conn.execute(sql)
+    if not has_codes_table:
+        last = 0
+        while True:
+            rows = conn.execute(
+                "SELECT rowid, image_path, codes, created_at FROM vouchers"
+                " WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last, BACKFILL_PAGE_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO voucher_codes"
+                " (code, image_path, day, created_at)"
+                " VALUES (?, ?, date(?), ?)",
+                [
+                    (code, row[1], row[3], row[3])
+                    for row in rows
+                    for code in split_codes(row[2])
+                ],
+            )
+    conn.commit()
+    db_helper._voucher_schema_ready = True
 
 
 def normalize_path(path: str) -> str:
@@ -88,7 +158,7 @@ def normalize_path(path: str) -> str:
     return path
 
 
-def load_vouchers_from_database(db_helper: SQLiteHelper, image_path: str) -> list:
+def load_vouchers_from_database(db_helper: "SQLiteHelper", image_path: str) -> list:
     """Load vouchers from database
 
     Args:
@@ -100,14 +170,7 @@ def load_vouchers_from_database(db_helper: SQLiteHelper, image_path: str) -> lis
     """
     try:
         # Ensure vouchers table exists
-        db_helper.create_table(
-            "vouchers",
-            [
-                "image_path TEXT PRIMARY KEY",
-                "codes TEXT NOT NULL",
-                "created_at DATETIME DEFAULT CURRENT_TIMESTAMP",
-            ],
-        )
+        ensure_voucher_schema(db_helper)
 
         # Normalize the image path for consistent lookup
         normalized_path = normalize_path(image_path)
@@ -119,11 +182,7 @@ def load_vouchers_from_database(db_helper: SQLiteHelper, image_path: str) -> lis
         vouchers = []
         for record in records:
             # Normalize codes: remove spaces, ensure 16 digits
-            codes = [
-                re.sub(r"\s+", "", code)
-                for code in record["codes"].split(",")
-                if len(re.sub(r"\s+", "", code)) == 16
-            ]
+            codes = split_codes(record["codes"])
             voucher_entry = {
                 "image_path": record["image_path"],
                 "codes": codes,
@@ -139,8 +198,9 @@ def load_vouchers_from_database(db_helper: SQLiteHelper, image_path: str) -> lis
         return []
 
 
+@traced("db.store_voucher")
 def store_voucher_in_database(
-    db_helper: SQLiteHelper, voucher_code: str, image_path: str
+    db_helper: "SQLiteHelper", voucher_code: str, image_path: str
 ) -> None:
     """Save found voucher to database"""
     try:
@@ -156,14 +216,7 @@ def store_voucher_in_database(
             safe_print(f"⛔\tVoucher code '{normalized_code}' is banned, skipping")
             return
 
-        db_helper.create_table(
-            "vouchers",
-            [
-                "image_path TEXT PRIMARY KEY",
-                "codes TEXT NOT NULL",
-                "created_at DATETIME DEFAULT CURRENT_TIMESTAMP",
-            ],
-        )
+        ensure_voucher_schema(db_helper)
 
         existing = db_helper.select(
             "vouchers", where="image_path = ?", params=(normalized_path,)
@@ -196,41 +249,147 @@ def store_voucher_in_database(
             voucher_data = {"image_path": normalized_path, "codes": normalized_code}
             db_helper.insert("vouchers", voucher_data)
             safe_print(f"💾\tSaved voucher {normalized_code} to database")
+        db_helper.execute_query(
+            "INSERT OR IGNORE INTO voucher_codes (code, image_path, day)"
+            " VALUES (?, ?, date('now'))",
+            (normalized_code, normalized_path),
+        )
 
     except Exception as e:
         safe_print(f"❌\tError saving voucher to database: {str(e)}")
 
 
+@traced("db.store_scanned_image")
+def store_scanned_image(db_helper: "SQLiteHelper", image_path: str) -> None:
+    """Record an OCRed image in which no voucher code was found (``codes`` empty)."""
+    try:
+        ensure_voucher_schema(db_helper)
+        db_helper.execute_query(
+            "INSERT OR IGNORE INTO vouchers (image_path, codes) VALUES (?, '')",
+            (normalize_path(image_path),),
+        )
+    except Exception as e:
+        safe_print(f"❌\tError saving scanned image to database: {str(e)}")
+
+
+def _store_codes(conn: Any, image_path: str, codes: List[str]) -> int:
+    """Merge ``codes`` into the ``vouchers`` row of ``image_path``; no commit."""
+    row = conn.execute(
+        "SELECT codes FROM vouchers WHERE image_path = ?", (image_path,)
+    ).fetchone()
+    current = row[0] if row else ""
+    existing = {re.sub(r"\s+", "", code) for code in current.split(",")}
+    added = [code for code in dict.fromkeys(codes) if code not in existing]
+    if row is None:
+        conn.execute(
+            "INSERT INTO vouchers (image_path, codes) VALUES (?, ?)",
+            (image_path, ", ".join(added)),
+        )
+    elif added:
+        conn.execute(
+            "UPDATE vouchers SET codes = ? WHERE image_path = ?",
+            (", ".join(([current] if current else []) + added), image_path),
+        )
+    conn.executemany(
+        "INSERT OR IGNORE INTO voucher_codes (code, image_path, day)"
+        " VALUES (?, ?, date('now'))",
+        [(code, image_path) for code in added],
+    )
+    return len(added)
+
+
+@traced("db.store_vouchers_batch")
+def store_vouchers_batch(
+    db_helper: "SQLiteHelper", events: Sequence[Tuple[str, Sequence[str]]]
+) -> int:
+    """
+    Save the codes of many images in a single transaction.
+
+    Codes are normalized and filtered like ``store_voucher_in_database``; an
+    image with no valid code is recorded like ``store_scanned_image``.
+    ``sqlite3.OperationalError`` (e.g. ``SQLITE_BUSY``) is raised after a
+    rollback, so the caller can retry the whole batch.
+
+    Args:
+        db_helper (SQLiteHelper): Voucher database.
+        events: ``(image_path, codes)`` pairs.
+
+    Returns:
+        int: Codes that were not stored yet.
+    """
+    ensure_voucher_schema(db_helper)
+    merged: Dict[str, List[str]] = {}
+    for image_path, codes in events:
+        normalized = (re.sub(r"\s+", "", code) for code in codes)
+        merged.setdefault(normalize_path(image_path), []).extend(
+            code
+            for code in normalized
+            if len(code) == 16 and code not in BANNED_VOUCHERS
+        )
+    conn = db_helper.conn
+    if conn.in_transaction:
+        conn.commit()
+    # Take the write lock up front so the reads below see the rows we update
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        added = sum(
+            _store_codes(conn, image_path, codes)
+            for image_path, codes in merged.items()
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return added
+
+
+@traced("db.store_voucher_json")
 def storeVoucherJson(voucherCode: str, imagePath: str) -> None:
     """
     Store a voucher code as JSON for a given image path.
     :param voucherCode: The voucher code to store.
     :param imagePath: The image path associated with the voucher.
     """
+    storeVoucherJsonBatch([(imagePath, [voucherCode])])
+
+
+@traced("db.store_voucher_json_batch")
+def storeVoucherJsonBatch(events: Sequence[Tuple[str, Sequence[str]]]) -> None:
+    """
+    Store the voucher codes of many images as JSON, one load and save per image.
+    :param events: ``(image_path, codes)`` pairs.
+    """
+    from .jsonDb import JsonDB
+
     db = JsonDB(os.path.join(os.getcwd(), "tmp", "vouchers"))
 
-    try:
-        vouchers = db.load(imagePath) or []
-        if not isinstance(vouchers, list):
+    merged: Dict[str, List[str]] = {}
+    for imagePath, codes in events:
+        merged.setdefault(imagePath, []).extend(codes)
+
+    for imagePath, codes in merged.items():
+        try:
+            vouchers = db.load(imagePath) or []
+            if not isinstance(vouchers, list):
+                vouchers = []
+        except FileNotFoundError:
             vouchers = []
-    except FileNotFoundError:
-        vouchers = []
 
-    vouchers.append(voucherCode)
+        vouchers.extend(codes)
 
-    # Ensure no duplicates and normalize
-    uniqueVouchers = list({re.sub(r"\s+", "", v).strip() for v in vouchers})
+        # Ensure no duplicates and normalize
+        uniqueVouchers = list({re.sub(r"\s+", "", v).strip() for v in vouchers})
 
-    # Filter out banned vouchers and ensure valid length
-    filteredVouchers = [
-        v for v in uniqueVouchers if len(v) == 16 and v not in BANNED_VOUCHERS
-    ]
+        # Filter out banned vouchers and ensure valid length
+        filteredVouchers = [
+            v for v in uniqueVouchers if len(v) == 16 and v not in BANNED_VOUCHERS
+        ]
 
-    if not filteredVouchers:
-        safe_print(f"⚠️\tNo valid vouchers to store for {imagePath}")
-        return
+        if not filteredVouchers:
+            safe_print(f"⚠️\tNo valid vouchers to store for {imagePath}")
+            continue
 
-    db.save(imagePath, filteredVouchers)
+        db.save(imagePath, filteredVouchers)
 
 
 def loadVoucherJson(imagePath: str) -> Optional[Any]:
@@ -239,6 +398,8 @@ def loadVoucherJson(imagePath: str) -> Optional[Any]:
     :param imagePath: The image path to load the voucher for.
     :return: The loaded voucher list or None if not found or error.
     """
+    from .jsonDb import JsonDB
+
     db = JsonDB(os.path.join(os.getcwd(), "tmp", "vouchers"))
 
     try:
@@ -0,0 +1,354 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    TypedDict,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.VoucherDatabase import (
+    ensure_voucher_schema,
+    get_database_instance,
+    split_codes,
+)
+from src.utils.console import safe_print
+
+if TYPE_CHECKING:
+    from src.database.SQLiteHelper import SQLiteHelper
+
+# Rows read per keyset page; one page is held in memory at a time
+DEFAULT_PAGE_SIZE = 1000
+FORMATS = ("jsonl", "csv", "parquet", "arrow")
+TABLES = ("vouchers", "codes")
+
+
+class VoucherRow(TypedDict):
+    image_path: str
+    codes: List[str]
+    created_at: Optional[str]
+
+
+class CodeRow(TypedDict):
+    code: str
+    image_path: str
+    day: str
+    created_at: Optional[str]
+
+
+# SELECT of each exportable table, paged by rowid
+_PAGES: Dict[str, str] = {
+    "vouchers": "SELECT rowid, image_path, codes, created_at FROM vouchers",
+    "codes": "SELECT id, code, image_path, day, created_at FROM voucher_codes",
+}
+_KEYS: Dict[str, str] = {"vouchers": "rowid", "codes": "id"}
+COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "vouchers": tuple(VoucherRow.__annotations__),
+    "codes": tuple(CodeRow.__annotations__),
+}
+
+
+def _row(table: str, row: Sequence[Any]) -> Dict[str, Any]:
+    if table == "vouchers":
+        return {
+            "image_path": row[1],
+            "codes": split_codes(row[2]),
+            "created_at": row[3],
+        }
+    return {"code": row[1], "image_path": row[2], "day": row[3], "created_at": row[4]}
+
+
+def iter_pages(
+    db_helper: "SQLiteHelper",
+    table: str = "vouchers",
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Read ``table`` in rowid order, ``page_size`` rows per query.
+
+    Each page is one ``WHERE rowid > <last> ORDER BY rowid LIMIT n`` query on
+    the rowid b-tree (keyset pagination), so reading the millionth page costs
+    the same as the first, unlike ``OFFSET``, and no read transaction stays
+    open between pages. Rows added while exporting are included when their
+    rowid is past the current page.
+
+    Args:
+        db_helper (SQLiteHelper): Voucher database.
+        table (str): ``vouchers`` (one row per image, see ``VoucherRow``) or
+            ``codes`` (one row per code and image, see ``CodeRow``).
+        page_size (int): Rows per query.
+
+    Raises:
+        ValueError: If ``table`` is unknown.
+    """
+    if table not in _PAGES:
+        raise ValueError(f"Unknown export table '{table}', expected one of {TABLES}")
+    ensure_voucher_schema(db_helper)
+    key = _KEYS[table]
+    sql = f"{_PAGES[table]} WHERE {key} > ? ORDER BY {key} LIMIT ?"
+    last = 0
+    while True:
+        # A cursor of our own, so the helper's shared cursor is left alone
+        rows = db_helper.conn.cursor().execute(sql, (last, page_size)).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [_row(table, row) for row in rows]
+
+
+def iter_rows(
+    db_helper: "SQLiteHelper",
+    table: str = "vouchers",
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """``iter_pages`` flattened into single rows."""
+    for page in iter_pages(db_helper, table, page_size):
+        yield from page
+
+
+def _write_jsonl(pages: Iterator[List[Dict[str, Any]]], out: TextIO) -> int:
+    count = 0
+    for page in pages:
+        out.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in page))
+        count += len(page)
+    return count
+
+
+def _write_csv(
+    pages: Iterator[List[Dict[str, Any]]], out: TextIO, columns: List[str]
+) -> int:
+    writer = csv.DictWriter(out, fieldnames=columns)
+    writer.writeheader()
+    count = 0
+    for page in pages:
+        for row in page:
+            if isinstance(row.get("codes"), list):
+                # One cell; codes never contain spaces
+                row = {**row, "codes": " ".join(row["codes"])}
+            writer.writerow(row)
+        count += len(page)
+    return count
+
+
+def _arrow_schema(table: str):
+    import pyarrow as pa
+
+    if table == "vouchers":
+        return pa.schema(
+            [
+                ("image_path", pa.string()),
+                ("codes", pa.list_(pa.string())),
+                ("created_at", pa.string()),
+            ]
+        )
+    return pa.schema(
+        [
+            ("code", pa.string()),
+            ("image_path", pa.string()),
+            ("day", pa.string()),
+            ("created_at", pa.string()),
+        ]
+    )
+
+
+def _write_arrow(
+    pages: Iterator[List[Dict[str, Any]]], path: str, table: str, fmt: str
+) -> int:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError(f"The {fmt} export needs pyarrow: pip install pyarrow")
+    schema = _arrow_schema(table)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        write = writer.write_table
+    else:
+        import pyarrow.ipc as ipc
+
+        writer = ipc.new_file(path, schema)
+        write = writer.write_table
+    count = 0
+    try:
+        # One record batch (Parquet: one row group) per page
+        for page in pages:
+            write(pa.Table.from_pylist(page, schema=schema))
+            count += len(page)
+    finally:
+        writer.close()
+    return count
+
+
+@contextmanager
+def _open_text(path: str) -> Iterator[TextIO]:
+    if path == "-":
+        yield sys.stdout
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        yield f
+
+
+def export(
+    db_helper: "SQLiteHelper",
+    path: str,
+    fmt: str = "jsonl",
+    table: str = "vouchers",
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """
+    Stream ``table`` into a JSONL, CSV, Parquet or Arrow IPC file.
+
+    Rows are read with ``iter_pages`` and written a page at a time, so memory
+    stays at one page whatever the size of the database. Parquet and Arrow need
+    ``pyarrow``; each page becomes one row group or record batch.
+
+    Args:
+        db_helper (SQLiteHelper): Voucher database.
+        path (str): Output file; ``-`` writes JSONL or CSV to stdout.
+        fmt (str): One of ``FORMATS``.
+        table (str): One of ``TABLES``, see ``iter_pages``.
+        page_size (int): Rows per query and per write.
+
+    Returns:
+        int: Rows written.
+
+    Raises:
+        ValueError: If ``fmt`` or ``table`` is unknown, or a binary format is
+            written to stdout.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {FORMATS}")
+    pages = iter_pages(db_helper, table, page_size)
+    if fmt in ("parquet", "arrow"):
+        if path == "-":
+            raise ValueError(f"The {fmt} export needs a file path")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return _write_arrow(pages, path, table, fmt)
+    with _open_text(path) as out:
+        if fmt == "csv":
+            return _write_csv(pages, out, list(COLUMNS[table]))
+        return _write_jsonl(pages, out)
+
+
+# Reports: name -> (SQL, parameter names). Each one is answered from an index
+# of database.VoucherDatabase.VOUCHER_INDEXES without reading table rows.
+REPORTS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    # idx_voucher_codes_day, a range of days
+    "codes-per-day": (
+        "SELECT day, COUNT(*) AS codes FROM voucher_codes"
+        " WHERE day BETWEEN ? AND ? GROUP BY day ORDER BY day",
+        ("since", "until"),
+    ),
+    # idx_voucher_codes_code, read in code order so no sort is needed
+    "duplicates": (
+        "SELECT code, COUNT(*) AS images, MIN(image_path) AS first_image"
+        " FROM voucher_codes GROUP BY code HAVING COUNT(*) > 1 ORDER BY code",
+        (),
+    ),
+    # idx_vouchers_no_codes, a partial index holding only these images
+    "no-codes": (
+        "SELECT image_path FROM vouchers WHERE codes = '' ORDER BY image_path",
+        (),
+    ),
+}
+# Defaults for report parameters: every day
+REPORT_DEFAULTS = {"since": "0000-00-00", "until": "9999-12-31"}
+
+
+def _report_sql(name: str, **params: Optional[str]) -> Tuple[str, Tuple[str, ...]]:
+    if name not in REPORTS:
+        raise ValueError(
+            f"Unknown report '{name}', expected one of {tuple(sorted(REPORTS))}"
+        )
+    sql, names = REPORTS[name]
+    return sql, tuple(params.get(n) or REPORT_DEFAULTS[n] for n in names)
+
+
+def iter_report(
+    db_helper: "SQLiteHelper", name: str, **params: Optional[str]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run the report ``name`` and yield its rows as they are read.
+
+    Args:
+        db_helper (SQLiteHelper): Voucher database.
+        name (str): One of ``REPORTS``.
+        **params: ``since``/``until`` days (``YYYY-MM-DD``) for ``codes-per-day``.
+
+    Raises:
+        ValueError: If ``name`` is unknown.
+    """
+    sql, args = _report_sql(name, **params)
+    ensure_voucher_schema(db_helper)
+    cursor = db_helper.conn.cursor().execute(sql, args)
+    columns = [d[0] for d in cursor.description]
+    for row in cursor:
+        yield dict(zip(columns, row))
+
+
+def query_plan(db_helper: "SQLiteHelper", name: str) -> List[str]:
+    """``EXPLAIN QUERY PLAN`` of a report, to check it stays on its index."""
+    sql, args = _report_sql(name)
+    ensure_voucher_schema(db_helper)
+    rows = db_helper.conn.execute(f"EXPLAIN QUERY PLAN {sql}", args).fetchall()
+    return [row[-1] for row in rows]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Stream voucher data out of the voucher database"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump = commands.add_parser("export", help="Export vouchers to a file")
+    dump.add_argument(
+        "-o", "--output", default="-", help="Output file (default: stdout)"
+    )
+    dump.add_argument("-f", "--format", choices=FORMATS, default="jsonl")
+    dump.add_argument(
+        "-t",
+        "--table",
+        choices=TABLES,
+        default="vouchers",
+        help="One row per image (vouchers) or per code (codes)",
+    )
+    dump.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    report = commands.add_parser("report", help="Print an aggregate report as JSONL")
+    report.add_argument("name", choices=sorted(REPORTS))
+    report.add_argument("--since", help="First day (YYYY-MM-DD) for codes-per-day")
+    report.add_argument("--until", help="Last day (YYYY-MM-DD) for codes-per-day")
+    report.add_argument(
+        "--explain", action="store_true", help="Print the query plan instead"
+    )
+    args = parser.parse_args(argv)
+
+    db_helper = get_database_instance()
+    if args.command == "export":
+        count = export(db_helper, args.output, args.format, args.table, args.page_size)
+        if args.output != "-":
+            safe_print(f"📤\tExported {count} row(s) to {args.output}")
+        return 0
+    if args.explain:
+        for line in query_plan(db_helper, args.name):
+            print(line)
+        return 0
+    for row in iter_report(db_helper, args.name, since=args.since, until=args.until):
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 import os
 import hashlib
 import glob
-import jsonpickle
 from typing import Any, AsyncGenerator, List
 
 
@@ -30,6 +29,8 @@ class JsonDB:
         """
         Save data to a JSON file with the given id.
         """
+        import jsonpickle
+
         hashed_id = self._hash(id)
         save_path = os.path.join(self.directory, f"{hashed_id}.json")
         encoded = jsonpickle.encode(data, make_refs=True)
@@ -41,6 +42,8 @@ class JsonDB:
         """
         Load data from a JSON file with the given id.
         """
+        import jsonpickle
+
         hashed_id = self._hash(id)
         load_path = os.path.join(self.directory, f"{hashed_id}.json")
         if not os.path.exists(load_path):
@@ -61,6 +64,8 @@ class JsonDB:
         """
         Load all JSON files in the database directory.
         """
+        import jsonpickle
+
         files = glob.glob("**/*.json", root_dir=self.directory, recursive=True)
         results = []
         for file in files:
@@ -73,6 +78,8 @@ class JsonDB:
         """
         Asynchronously load all JSON files in the database directory, yielding each parsed object.
         """
+        import jsonpickle
+
         files = glob.glob("**/*.json", root_dir=self.directory, recursive=True)
         for file in files:
             file_path = os.path.join(self.directory, file)
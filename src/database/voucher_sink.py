@@ -0,0 +1,279 @@
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.VoucherDatabase import storeVoucherJsonBatch, store_vouchers_batch
+from src.utils.console import safe_print
+from src.utils.file import get_relative_path
+from src.utils.metrics import COUNT_BUCKETS, REGISTRY
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    from src.database.SQLiteHelper import SQLiteHelper
+
+BACKENDS = ("sqlite", "json")
+# Events waiting to be written; producers block when the queue is full
+DEFAULT_QUEUE_SIZE = 1024
+# A transaction is written once it holds this many events...
+DEFAULT_BATCH_SIZE = 64
+# ...or this many seconds after its first event arrived
+DEFAULT_FLUSH_INTERVAL = 0.5
+# Attempts per batch while SQLite reports the database busy or locked
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.1
+
+VoucherEvent = Tuple[str, List[str]]
+
+SINK_BATCH_SIZE = REGISTRY.histogram(
+    "ocr_voucher_sink_batch_size",
+    "Voucher events written per transaction by the write-behind sink",
+    ("backend",),
+    COUNT_BUCKETS,
+)
+SINK_QUEUE_DEPTH = REGISTRY.histogram(
+    "ocr_voucher_sink_queue_depth",
+    "Events still queued when the write-behind sink starts a transaction",
+    ("backend",),
+    COUNT_BUCKETS,
+)
+
+# Queue markers: write what is pending now / write it and stop
+_FLUSH = object()
+_STOP = object()
+
+
+class SinkStats(TypedDict):
+    submitted: int
+    written: int  # events committed
+    batches: int
+    retries: int  # batches retried after SQLITE_BUSY
+    errors: int  # events dropped after a failed write
+    depth: int
+
+
+def is_busy(error: Exception) -> bool:
+    """Whether ``error`` is SQLite's ``SQLITE_BUSY``/``SQLITE_LOCKED``."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    name = getattr(error, "sqlite_errorname", "")
+    return name.startswith(("SQLITE_BUSY", "SQLITE_LOCKED")) or "locked" in str(error)
+
+
+class VoucherSink:
+    """
+    Write-behind sink that batches voucher writes off the OCR thread.
+
+    ``submit`` only enqueues ``(image_path, codes)``; a writer thread groups
+    events into one transaction per ``batch_size`` events or ``flush_interval``
+    seconds, whichever comes first. The queue is bounded, so producers wait
+    instead of piling up memory when the disk falls behind. Batches failing
+    with ``SQLITE_BUSY`` are retried with backoff; other failures are logged
+    and the batch is dropped.
+
+    The writer opens its own connection, so the sink must be created in the
+    process that uses it (see ``get_voucher_sink``).
+
+    Usage:
+        >>> with VoucherSink() as sink:
+        ...     sink.submit("upload/voucher.jpg", ["1234567812345678"])
+
+    Args:
+        backend (str): ``sqlite`` (``store_vouchers_batch``) or ``json``
+            (``storeVoucherJsonBatch``).
+        db_path (Optional[str]): SQLite file (default
+            ``tmp/voucher_database.sqlite``).
+        queue_size (int): Most events waiting to be written.
+        batch_size (int): Most events per transaction.
+        flush_interval (float): Longest an event waits for its batch to fill.
+        retries (int): Attempts per batch on ``SQLITE_BUSY``.
+
+    Raises:
+        ValueError: If ``backend`` is unknown.
+    """
+
+    def __init__(
+        self,
+        backend: str = "sqlite",
+        db_path: Optional[str] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        retries: int = BUSY_RETRIES,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown voucher sink backend '{backend}', expected one of {BACKENDS}"
+            )
+        self.backend = backend
+        self.db_path = db_path or get_relative_path("tmp/voucher_database.sqlite")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retries = max(1, retries)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._db_helper: Optional["SQLiteHelper"] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats: SinkStats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "errors": 0,
+            "depth": 0,
+        }
+        self._thread = threading.Thread(
+            target=self._run, name=f"voucher-sink-{backend}", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Events submitted but not written yet (approximate)."""
+        return self._queue.qsize()
+
+    def stats(self) -> SinkStats:
+        with self._lock:
+            return {**self._stats, "depth": self.depth}
+
+    def _count(self, **amounts: int) -> None:
+        with self._lock:
+            for name, amount in amounts.items():
+                self._stats[name] += amount
+
+    def submit(
+        self, image_path: str, codes: Sequence[str], timeout: Optional[float] = None
+    ) -> None:
+        """
+        Queue the codes found in ``image_path`` (none records a scanned image).
+
+        Blocks while the queue is full, up to ``timeout`` seconds.
+
+        Raises:
+            RuntimeError: If the sink is closed.
+            queue.Full: If the queue stayed full for ``timeout`` seconds.
+        """
+        if self._closed:
+            raise RuntimeError("Voucher sink is closed")
+        self._queue.put((image_path, list(codes)), timeout=timeout)
+        self._count(submitted=1)
+
+    def flush(self) -> None:
+        """Write everything submitted so far and wait for it to be committed."""
+        if self._closed:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending events and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "VoucherSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _next_batch(self) -> Tuple[List[VoucherEvent], bool]:
+        """Wait for a batch of events; also returns whether to stop afterwards."""
+        item = self._queue.get()
+        batch: List[VoucherEvent] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                self._queue.task_done()
+                return batch, True
+            if item is _FLUSH:
+                self._queue.task_done()
+                return batch, False
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                SINK_QUEUE_DEPTH.observe(self.depth, backend=self.backend)
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+        if self._db_helper is not None:
+            self._db_helper.close()
+
+    def _writer(self) -> Callable[[List[VoucherEvent]], object]:
+        if self.backend == "json":
+            return storeVoucherJsonBatch
+        if self._db_helper is None:
+            from src.database.SQLiteHelper import SQLiteHelper
+
+            self._db_helper = SQLiteHelper(self.db_path)
+        return lambda batch: store_vouchers_batch(self._db_helper, batch)
+
+    def _write(self, batch: List[VoucherEvent]) -> None:
+        for attempt in range(1, self.retries + 1):
+            try:
+                with span(
+                    "voucher_sink.write", backend=self.backend, events=len(batch)
+                ):
+                    self._writer()(batch)
+            except Exception as e:
+                if is_busy(e) and attempt < self.retries:
+                    self._count(retries=1)
+                    time.sleep(BUSY_BACKOFF * 2 ** (attempt - 1))
+                    continue
+                self._count(errors=len(batch))
+                safe_print(
+                    f"❌\tError writing {len(batch)} voucher event(s) "
+                    f"to {self.backend}: {str(e)}"
+                )
+                return
+            self._count(written=len(batch), batches=1)
+            SINK_BATCH_SIZE.observe(len(batch), backend=self.backend)
+            return
+
+
+_sinks: Dict[Tuple[int, str], VoucherSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def get_voucher_sink(backend: str = "sqlite") -> VoucherSink:
+    """
+    Shared sink of this process, closed (and so flushed) at exit.
+
+    Sinks are per process: a forked worker gets its own writer thread instead
+    of the parent's, which does not survive the fork.
+    """
+    key = (os.getpid(), backend)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            sink = _sinks[key] = VoucherSink(backend)
+            atexit.register(sink.close)
+        return sink
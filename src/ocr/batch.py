@@ -0,0 +1,842 @@
+import argparse
+import contextlib
+import functools
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    BrokenExecutor,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Callable, Dict, Iterator, List, Optional, Set, TypedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.database.voucher_sink import VoucherSink, get_voucher_sink
+from src.ocr.pipeline import Stage, StagedPipeline, StageError, parse_stage_workers
+from src.ocr.rescale import DEFAULT_MAX_PIXELS, DEFAULT_TARGET_CHAR_HEIGHT
+from src.ocr.tuner import load_profile, tesseract_options
+from src.ocr.worker_pool import (
+    DEFAULT_MAX_JOBS,
+    PreforkPool,
+    WorkerError,
+    pool_size,
+)
+from src.utils.console import safe_print
+from src.utils.memory import memory_stage, track_memory
+from src.utils.metrics import CODES_FOUND, flush_metrics
+from src.utils.thread_budget import ThreadBudget, configure, init_worker
+from src.utils.tracing import span
+
+IMAGE_EXTENSIONS = {
+    ".avif",
+    ".bmp",
+    ".gif",
+    ".heic",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".tif",
+    ".tiff",
+    ".webp",
+}
+ENGINES = ("cli", "focus_pytesseract", "easyocr")
+
+
+class BatchItem(TypedDict):
+    source: str
+    key: str
+
+
+class BatchResult(TypedDict, total=False):
+    source: str
+    key: str
+    engine: str
+    codes: List[str]
+    seconds: float
+    error: Optional[str]
+    memory: Dict[str, int]  # peak bytes per stage, memory-bounded runs only
+
+
+def _is_url(source: str) -> bool:
+    return source.startswith("http://") or source.startswith("https://")
+
+
+def make_item(source: str) -> BatchItem:
+    """
+    Build a batch item whose key changes when a local file is modified.
+
+    The key is ``<abs path>|<size>|<mtime_ns>`` for files and the URL for URLs,
+    so an edited image is OCRed again after a resume.
+    """
+    if _is_url(source):
+        return {"source": source, "key": source}
+    path = os.path.abspath(source)
+    try:
+        st = os.stat(path)
+        key = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+    except OSError:
+        key = path
+    return {"source": path, "key": key}
+
+
+def _report_invalid(message: str) -> None:
+    safe_print(f"⚠️\t{message}")
+
+
+def iter_batch_inputs(
+    source: str, on_invalid: Callable[[str], None] = _report_invalid
+) -> Iterator[BatchItem]:
+    """
+    Expand a directory, glob pattern or JSONL manifest into batch items.
+
+    Manifest lines are either JSON strings or objects with a ``path``, ``image``
+    or ``url`` field; relative paths are resolved against the manifest directory.
+    Lines that are not valid JSON (a truncated manifest) or hold no path are
+    skipped and reported to ``on_invalid`` with their line number.
+    Directories are walked recursively for image files, in sorted order.
+    """
+    if source.endswith(".jsonl") and os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    on_invalid(f"{source}:{number}: invalid manifest line ({e})")
+                    continue
+                if isinstance(entry, dict):
+                    entry = entry.get("path") or entry.get("image") or entry.get("url")
+                if not isinstance(entry, str) or not entry:
+                    on_invalid(f"{source}:{number}: manifest line has no image path")
+                    continue
+                if not _is_url(entry) and not os.path.isabs(entry):
+                    entry = os.path.join(base_dir, entry)
+                yield make_item(entry)
+    elif os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield make_item(os.path.join(root, name))
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if os.path.isfile(path):
+                yield make_item(path)
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of finished batch items.
+
+    Only successful items are marked done; failed items are retried on the next
+    run. Each line is written and flushed as soon as the item finishes, so an
+    interrupted run loses at most the items in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted run
+                        continue
+                    if entry.get("status") == "ok":
+                        self.done.add(entry["key"])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.done
+
+    def mark(self, key: str, status: str) -> None:
+        self._fh.write(json.dumps({"key": key, "status": status}) + "\n")
+        self._fh.flush()
+        if status == "ok":
+            self.done.add(key)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _ocr_cli(
+    source: str,
+    chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> str:
+    from src.ocr.cli import get_image_from_url_or_path, process_image
+
+    with memory_stage("decode"):
+        image = get_image_from_url_or_path(
+            source,
+            target_char_height=DEFAULT_TARGET_CHAR_HEIGHT,
+            max_pixels=max_pixels,
+            gray=True,
+        )
+    name = os.path.splitext(os.path.basename(source))[0]
+    return process_image(
+        image,
+        name,
+        output_dir="tmp/pre-process/batch",
+        preprocess_chain=chain or "cli",
+        profile=profile,
+        max_pixels=max_pixels,
+    )["text"]
+
+
+def _ocr_focus_pytesseract(
+    source: str,
+    chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> str:
+    from src.ocr.focus_pytesseract import focus_extract_text_from_image
+
+    options = {}
+    if profile:
+        # The engine keeps its own crops; the profile picks chain and modes
+        config = load_profile(profile)
+        chain = config["chain"]
+        if config["engine"] == "tesseract":
+            options["tesseract_config"] = tesseract_options(config)
+    if chain:
+        options["chain"] = chain
+    return focus_extract_text_from_image(source, max_pixels=max_pixels, **options)
+
+
+def _ocr_easyocr(
+    source: str,
+    chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> str:
+    from src.ocr.easyocr_impl import extract_text_from_image
+
+    if profile:
+        chain = load_profile(profile)["chain"]
+    image = source
+    if max_pixels:
+        from src.ocr.decoders import open_image_buffer
+        from src.ocr.preprocess import Preprocessor
+        from src.ocr.rescale import decode_within_budget
+
+        # CRAFT detects on color, so the budgeted decode keeps the channels
+        with memory_stage("decode"), open_image_buffer(source) as buf:
+            image = decode_within_budget(buf, max_pixels)
+        with memory_stage("preprocess"):
+            image = Preprocessor(memo_size=0).run(
+                image, chain or "none", max_pixels=max_pixels
+            )["image"]
+        if image.ndim == 3:
+            # In place, so no second full-size copy exists
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    elif chain:
+        from src.ocr.decoders import read_image
+        from src.ocr.preprocess import preprocess
+
+        image = preprocess(read_image(source), chain)["image"]
+        if image.ndim == 3:
+            # EasyOCR reads arrays as RGB
+            image = np.ascontiguousarray(image[:, :, ::-1])
+    with memory_stage("ocr"):
+        return " ".join(item["text"] for item in extract_text_from_image(image))
+
+
+# engine(source, chain, max_pixels, profile) -> OCR text; chain None keeps the
+# engine's own preprocessing, max_pixels None disables the memory-bounded mode and
+# a profile name (see tuner.load_profile) overrides the chain
+ENGINE_FUNCTIONS: Dict[
+    str, Callable[[str, Optional[str], Optional[int], Optional[str]], str]
+] = {
+    "cli": _ocr_cli,
+    "focus_pytesseract": _ocr_focus_pytesseract,
+    "easyocr": _ocr_easyocr,
+}
+
+
+def process_item(
+    item: BatchItem,
+    engine: str = "cli",
+    store: bool = False,
+    preprocess_chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> BatchResult:
+    """
+    OCR one batch item and return its JSON-serializable result (never raises).
+
+    With ``max_pixels`` the item runs memory-bounded and the result carries the
+    peak memory of each stage (see ``memory.MemoryTracker``).
+    """
+    started = time.perf_counter()
+    result: BatchResult = {
+        "source": item["source"],
+        "key": item["key"],
+        "engine": engine,
+        "codes": [],
+        "error": None,
+    }
+    memory = track_memory() if max_pixels else contextlib.nullcontext()
+    try:
+        with span("batch.item", engine=engine), memory as tracker:
+            try:
+                with memory_stage("job"):
+                    text = ENGINE_FUNCTIONS[engine](
+                        item["source"], preprocess_chain, max_pixels, profile
+                    )
+                    result["codes"] = extract_voucher_codes(text)
+            finally:
+                if tracker is not None:
+                    result["memory"] = tracker.peaks()
+        CODES_FOUND.observe(len(result["codes"]), stage=f"batch.{engine}")
+        if store:
+            # Written behind by the process's sink (flushed at exit)
+            get_voucher_sink().submit(result["source"], result["codes"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def _process_in_worker(
+    item: BatchItem,
+    engine: str,
+    preprocess_chain: Optional[str],
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> BatchResult:
+    # Codes are stored by the parent: workers exit without running atexit
+    result = process_item(item, engine, False, preprocess_chain, max_pixels, profile)
+    flush_metrics()
+    return result
+
+
+def default_worker_count() -> int:
+    return max(1, os.cpu_count() or 1)
+
+
+def preload_engine(engine: str) -> None:
+    """
+    Import ``engine``'s modules and load its models in the calling process.
+
+    Run by the pre-fork supervisor, so every forked worker shares the loaded
+    EasyOCR weights instead of loading its own copy.
+    """
+    if engine == "easyocr":
+        from src.ocr.easyocr_impl import get_reader
+
+        get_reader()
+    elif engine == "focus_pytesseract":
+        import src.ocr.focus_pytesseract  # noqa: F401
+    else:
+        import src.ocr.cli  # noqa: F401
+
+
+def build_cli_pipeline(
+    stage_workers: Optional[Dict[str, int]] = None,
+    preprocess_chain: str = "cli",
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> StagedPipeline:
+    """
+    Split the ``cli`` engine into decode → preprocess → ocr → extract stages.
+
+    Decoding and pre-processing are cv2-bound and the OCR stage waits on a
+    tesseract subprocess, so with per-stage threads image N+1 is decoded and
+    pre-processed while image N is in OCR.
+
+    Args:
+        stage_workers (Optional[Dict[str, int]]): Worker count per stage name;
+            defaults to 2/2/CPU count/1.
+        preprocess_chain (str): Preprocessing chain of the preprocess stage.
+        max_pixels (Optional[int]): Decode gray within this pixel budget and keep
+            every preprocessing step within it.
+        profile (Optional[str]): Named OCR profile; its chain replaces
+            ``preprocess_chain`` and the OCR stage runs its engine, modes and crops.
+    """
+    from src.ocr.cli import (
+        extract_vouchers,
+        get_image_from_url_or_path,
+        ocr_refined,
+        preprocess_image,
+    )
+    from src.ocr.tuner import ocr_with_config
+
+    config = load_profile(profile) if profile else None
+    if config:
+        preprocess_chain = config["chain"]
+
+    workers = {
+        "decode": 2,
+        "preprocess": 2,
+        "ocr": default_worker_count(),
+        "extract": 1,
+    }
+    workers.update(stage_workers or {})
+    output_dir = "tmp/pre-process/batch"
+
+    def decode(job: dict) -> dict:
+        job["image"] = get_image_from_url_or_path(
+            job["item"]["source"],
+            target_char_height=DEFAULT_TARGET_CHAR_HEIGHT,
+            max_pixels=max_pixels,
+            gray=True,
+        )
+        return job
+
+    def preprocess(job: dict) -> dict:
+        name = os.path.splitext(os.path.basename(job["item"]["source"]))[0]
+        job["image"] = preprocess_image(
+            job.pop("image"),
+            name,
+            output_dir,
+            chain=preprocess_chain,
+            max_pixels=max_pixels,
+        )
+        return job
+
+    def ocr(job: dict) -> dict:
+        image = job.pop("image")
+        job["text"] = ocr_with_config(image, config) if config else ocr_refined(image)
+        return job
+
+    def extract(job: dict) -> dict:
+        job["codes"] = extract_vouchers(job.pop("text"), output_dir)
+        return job
+
+    return StagedPipeline(
+        [
+            Stage("decode", decode, workers["decode"]),
+            Stage("preprocess", preprocess, workers["preprocess"]),
+            Stage("ocr", ocr, workers["ocr"]),
+            Stage("extract", extract, workers["extract"]),
+        ],
+        queue_size=max(2, workers["ocr"]),
+    )
+
+
+def run_batch(
+    source: str,
+    output: str,
+    checkpoint: Optional[str] = None,
+    engine: str = "cli",
+    workers: Optional[int] = None,
+    store: bool = False,
+    pipelined: bool = False,
+    stage_workers: Optional[Dict[str, int]] = None,
+    preprocess_chain: Optional[str] = None,
+    threads: Optional[int] = None,
+    pin_cpus: bool = False,
+    prefork: bool = False,
+    max_jobs_per_worker: int = DEFAULT_MAX_JOBS,
+    max_rss_mb: Optional[int] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    OCR every image of ``source`` on a worker pool, resuming from ``checkpoint``.
+
+    Args:
+        source (str): Directory, glob pattern or JSONL manifest.
+        output (str): JSONL file receiving one result line per image (appended).
+        checkpoint (Optional[str]): Progress file (default ``<output>.checkpoint``).
+        engine (str): One of ``ENGINES``.
+        workers (Optional[int]): Worker processes (default: CPU count).
+        store (bool): Also save found codes to the voucher database.
+        pipelined (bool): Run the ``cli`` engine as a staged pipeline in this
+            process instead of a process pool (see ``build_cli_pipeline``).
+        stage_workers (Optional[Dict[str, int]]): Per-stage workers when pipelined.
+        preprocess_chain (Optional[str]): Preprocessing chain name (see
+            ``preprocess.CHAINS``); None keeps each engine's default.
+        threads (Optional[int]): Threads per OCR worker for torch, OpenCV and
+            tesseract (default: CPUs / concurrent OCR workers).
+        pin_cpus (bool): Pin each worker process to its own CPUs (pool mode).
+        prefork (bool): Load the engine's models once and fork workers sharing
+            them (see ``worker_pool.PreforkPool``); workers default to as many
+            as fit in available memory.
+        max_jobs_per_worker (int): Jobs before a pre-forked worker is recycled.
+        max_rss_mb (Optional[int]): RSS above which a pre-forked worker is recycled.
+        max_pixels (Optional[int]): Memory-bounded mode: images are decoded and
+            processed within this many pixels, gray unless the engine needs
+            color, and each result lists its peak memory per stage (pool and
+            pre-fork modes).
+        profile (Optional[str]): Named OCR profile from the tuner (see
+            ``tuner.load_profile``), replacing ``preprocess_chain``; the ``cli``
+            engine also runs its OCR settings, the others keep their own crops.
+
+    Returns:
+        Dict[str, int]: Counts of ``ok``, ``error`` and ``skipped`` items;
+        ``invalid`` counts manifest lines that could not be read.
+    """
+    if engine not in ENGINE_FUNCTIONS:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if pipelined and engine != "cli":
+        raise ValueError("Pipelined mode is only available for the 'cli' engine")
+    if pipelined and prefork:
+        raise ValueError("Pipelined and pre-fork modes cannot be combined")
+    if profile:
+        # Unknown names fail here rather than once per image in the workers
+        load_profile(profile)
+    workers = workers or (pool_size() if prefork else default_worker_count())
+    if pipelined:
+        # One process: OCR threads share the CPUs (each runs a tesseract subprocess)
+        ocr_workers = (stage_workers or {}).get("ocr", default_worker_count())
+        budget = configure(ocr_workers, threads=threads)
+    else:
+        budget = ThreadBudget(workers, threads=threads, pin=pin_cpus)
+    progress = Checkpoint(checkpoint or f"{output}.checkpoint")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    counts = {"ok": 0, "error": 0, "skipped": 0, "invalid": 0}
+
+    def invalid(message: str) -> None:
+        _report_invalid(message)
+        counts["invalid"] += 1
+
+    def failed(message: str) -> None:
+        # An error not tied to any item (reading the input failed)
+        safe_print(f"❌\t{message}")
+        counts["error"] += 1
+
+    def pending_items() -> Iterator[BatchItem]:
+        for item in iter_batch_inputs(source, invalid):
+            if item["key"] in progress:
+                counts["skipped"] += 1
+                continue
+            yield item
+
+    # Results of every mode arrive here, in this process, so one sink batches
+    # their database writes off the result loop. It starts with the first
+    # result, once the pool has forked its workers (see REGISTRY.reinit_locks
+    # for workers forked later)
+    sink: Optional[VoucherSink] = None
+    with open(output, "a", encoding="utf-8") as out:
+
+        def write(result: BatchResult) -> None:
+            nonlocal sink
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if store and not result["error"]:
+                if sink is None:
+                    sink = VoucherSink()
+                # No codes records the image for the "no-codes" report
+                sink.submit(result["source"], result["codes"])
+            status = "error" if result["error"] else "ok"
+            progress.mark(result["key"], status)
+            counts[status] += 1
+
+        try:
+            if pipelined:
+                _run_pipelined(
+                    pending_items(),
+                    write,
+                    failed,
+                    stage_workers,
+                    preprocess_chain,
+                    max_pixels,
+                    profile,
+                )
+            elif prefork:
+                _run_prefork(
+                    pending_items(),
+                    write,
+                    engine,
+                    budget,
+                    preprocess_chain,
+                    max_jobs_per_worker,
+                    max_rss_mb,
+                    max_pixels,
+                    profile,
+                )
+            else:
+                _run_pool(
+                    pending_items(),
+                    write,
+                    engine,
+                    budget,
+                    preprocess_chain,
+                    max_pixels,
+                    profile,
+                )
+        finally:
+            progress.close()
+            if sink is not None:
+                sink.close()
+                stats = sink.stats()
+                safe_print(
+                    f"💾\tStored {stats['written']} result(s) in {stats['batches']} "
+                    f"transaction(s), {stats['errors']} failed"
+                )
+    return counts
+
+
+def _error_result(item: BatchItem, engine: str, error: str) -> BatchResult:
+    """Result row of an item whose worker failed before returning one."""
+    return {
+        "source": item["source"],
+        "key": item["key"],
+        "engine": engine,
+        "codes": [],
+        "error": error,
+        "seconds": 0.0,
+    }
+
+
+def _run_pool(
+    items: Iterator[BatchItem],
+    write: Callable[[BatchResult], None],
+    engine: str,
+    budget: ThreadBudget,
+    preprocess_chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> None:
+    workers = budget.workers
+
+    def new_pool() -> ProcessPoolExecutor:
+        # Each worker process applies its share of the CPUs before loading any model
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(budget, multiprocessing.Value("i", 0)),
+        )
+
+    pool = new_pool()
+    in_flight: Dict = {}  # future -> (item, pool it was submitted to)
+
+    def collect(done) -> None:
+        nonlocal pool
+        for future in done:
+            item, owner = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # A worker died (OOM, crash in native code): fail only its items
+                result = _error_result(item, engine, f"{type(e).__name__}: {e}")
+                if isinstance(e, BrokenExecutor) and owner is pool:
+                    safe_print("⚠️\tOCR worker pool broke, restarting it")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = new_pool()
+            write(result)
+
+    try:
+        for item in items:
+            # Bound the number of queued items so huge inputs stream through
+            if len(in_flight) >= workers * 2:
+                collect(wait(list(in_flight), return_when=FIRST_COMPLETED)[0])
+            future = pool.submit(
+                _process_in_worker, item, engine, preprocess_chain, max_pixels, profile
+            )
+            in_flight[future] = (item, pool)
+        collect(wait(list(in_flight))[0])
+    finally:
+        pool.shutdown(wait=True)
+
+
+def _run_prefork(
+    items: Iterator[BatchItem],
+    write: Callable[[BatchResult], None],
+    engine: str,
+    budget: ThreadBudget,
+    preprocess_chain: Optional[str],
+    max_jobs: int,
+    max_rss_mb: Optional[int],
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> None:
+    pool = PreforkPool(
+        functools.partial(
+            _process_in_worker,
+            engine=engine,
+            preprocess_chain=preprocess_chain,
+            max_pixels=max_pixels,
+            profile=profile,
+        ),
+        workers=budget.workers,
+        preload=functools.partial(preload_engine, engine),
+        max_jobs=max_jobs,
+        max_rss_mb=max_rss_mb,
+        budget=budget,
+    )
+    with pool:
+        for item, result in pool.imap_unordered(items):
+            if isinstance(result, WorkerError):
+                result = _error_result(item, engine, result.error)
+            write(result)
+    stats = pool.stats
+    safe_print(
+        f"♻️	{stats['started']} worker(s) forked, {stats['recycled']} recycled, "
+        f"{stats['crashed']} crashed"
+    )
+
+
+def _run_pipelined(
+    items: Iterator[BatchItem],
+    write: Callable[[BatchResult], None],
+    fail: Callable[[str], None],
+    stage_workers: Optional[Dict[str, int]],
+    preprocess_chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> None:
+    pipeline = build_cli_pipeline(
+        stage_workers, preprocess_chain or "cli", max_pixels, profile
+    )
+    jobs = ({"item": item, "started": time.perf_counter()} for item in items)
+    for job in pipeline.run(jobs):
+        error = None
+        if isinstance(job, StageError):
+            error = f"{job.stage}: {type(job.error).__name__}: {job.error}"
+            if job.item is None:
+                # The input iterator failed: items already fed still drain
+                fail(f"Reading batch input failed: {error}")
+                continue
+            job = job.item
+        result: BatchResult = {
+            "source": job["item"]["source"],
+            "key": job["item"]["key"],
+            "engine": "cli",
+            "codes": job.get("codes", []),
+            "error": error,
+            "seconds": time.perf_counter() - job["started"],
+        }
+        write(result)
+    for name, stats in pipeline.report().items():
+        safe_print(
+            f"📊\t{name}: {stats['utilization']:.0%} busy with {stats['workers']} "
+            f"worker(s), {stats['items']} item(s), {stats['errors']} error(s)"
+        )
+    safe_print(f"🐢\tBottleneck stage: {pipeline.bottleneck()}")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, int]:
+    parser = argparse.ArgumentParser(
+        description="OCR a directory, glob or JSONL manifest of images in batch"
+    )
+    parser.add_argument("source", help="Directory, glob pattern or .jsonl manifest")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="tmp/batch/results.jsonl",
+        help="JSONL results file (default: tmp/batch/results.jsonl)",
+    )
+    parser.add_argument(
+        "--checkpoint", help="Checkpoint file (default: <output>.checkpoint)"
+    )
+    parser.add_argument(
+        "-e", "--engine", choices=ENGINES, default="cli", help="OCR pipeline to run"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Store found voucher codes (and images without any) in the voucher database",
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Overlap decode, pre-processing and OCR in one process (cli engine)",
+    )
+    parser.add_argument(
+        "--stage-workers",
+        default="",
+        help="Per-stage workers for --pipelined, e.g. decode=2,preprocess=2,ocr=4",
+    )
+    parser.add_argument(
+        "-p",
+        "--preprocess",
+        default=None,
+        help="Preprocessing chain name (default: the engine's own chain)",
+    )
+    parser.add_argument(
+        "-P",
+        "--profile",
+        default=None,
+        help="Named OCR profile from the tuner (e.g. fast, balanced, thorough); "
+        "replaces --preprocess",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Threads per OCR worker for torch/OpenCV/tesseract (default: CPUs / workers)",
+    )
+    parser.add_argument(
+        "--prefork",
+        action="store_true",
+        help="Load models once and fork workers that share them (Linux/macOS)",
+    )
+    parser.add_argument(
+        "--max-jobs-per-worker",
+        type=int,
+        default=DEFAULT_MAX_JOBS,
+        help="Recycle a pre-forked worker after this many images (0: never)",
+    )
+    parser.add_argument(
+        "--max-rss-mb",
+        type=int,
+        default=None,
+        help="Recycle a pre-forked worker once its RSS exceeds this many MB",
+    )
+    parser.add_argument(
+        "--max-pixels",
+        type=int,
+        nargs="?",
+        const=DEFAULT_MAX_PIXELS,
+        default=None,
+        help="Memory-bounded mode: images of at most this many pixels "
+        f"(default {DEFAULT_MAX_PIXELS}), peak memory per stage in the results",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Pin each worker process to its own set of CPUs",
+    )
+    args = parser.parse_args(argv)
+    safe_print(f"🚀\tBatch OCR of {args.source} with engine '{args.engine}'")
+    counts = run_batch(
+        args.source,
+        args.output,
+        checkpoint=args.checkpoint,
+        engine=args.engine,
+        workers=args.workers,
+        store=args.store,
+        pipelined=args.pipelined,
+        stage_workers=parse_stage_workers(args.stage_workers),
+        preprocess_chain=args.preprocess,
+        threads=args.threads,
+        pin_cpus=args.pin_cpus,
+        prefork=args.prefork,
+        max_jobs_per_worker=args.max_jobs_per_worker,
+        max_rss_mb=args.max_rss_mb,
+        max_pixels=args.max_pixels,
+        profile=args.profile,
+    )
+    safe_print(
+        f"✅\tDone: {counts['ok']} ok, {counts['error']} failed, "
+        f"{counts['skipped']} already processed, {counts['invalid']} invalid "
+        f"manifest line(s). Results in {args.output}"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, TypedDict
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.decoders import decode_image
+from src.ocr.image_fetcher import (
+    DEFAULT_CACHE_DIR,
+    ImageFetcher,
+    ImageTooLargeError,
+    RawBytesCache,
+    create_session,
+)
+from src.utils.console import safe_print
+from src.utils.file import get_relative_path
+from src.utils.metrics import flush_metrics
+from src.utils.thread_budget import configure
+from src.utils.tracing import span
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Images downloaded (or downloading) but not OCRed yet, per OCR worker
+PENDING_PER_OCR_WORKER = 2
+
+
+class DownloadedImage(TypedDict, total=False):
+    url: str
+    image: Optional[np.ndarray]
+    error: Optional[str]
+    attempts: int
+    seconds: float
+
+
+class UrlOCRResult(TypedDict, total=False):
+    url: str
+    vouchers: List[str]
+    text: str
+    error: Optional[str]
+    download_seconds: float
+    ocr_seconds: float
+
+
+def dedupe_urls(urls: Iterable[str]) -> List[str]:
+    """Strip blanks and drop repeated URLs, keeping first-seen order."""
+    return list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Only called after a failed download, so requests is already loaded
+    import requests
+
+    if isinstance(error, ImageTooLargeError):
+        return False
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_STATUS
+    return isinstance(
+        error,
+        (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError),
+    )
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+_fetcher: Optional[ImageFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_url_fetcher() -> ImageFetcher:
+    """
+    Shared caching fetcher whose session does not retry.
+
+    ``iter_downloaded_images`` retries with its own backoff; the urllib3 retries
+    of the default session on top of it would multiply the attempts per URL.
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ImageFetcher(
+                cache=RawBytesCache(get_relative_path(DEFAULT_CACHE_DIR)),
+                session=create_session(retries=0),
+            )
+        return _fetcher
+
+
+async def iter_downloaded_images(
+    urls: Iterable[str],
+    per_host_limit: int = 4,
+    max_concurrency: int = 16,
+    retries: int = 3,
+    backoff: float = 0.5,
+    fetcher: Optional[ImageFetcher] = None,
+    slots: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[DownloadedImage]:
+    """
+    Download and decode images concurrently, yielding each as soon as it is ready.
+
+    Identical URLs are fetched once. At most ``per_host_limit`` requests run against
+    a single host and ``max_concurrency`` overall; transient failures (connection
+    errors, timeouts, 429/5xx) are retried with jittered exponential backoff.
+    Failures are yielded with ``error`` set instead of raising.
+
+    Args:
+        urls (Iterable[str]): Image URLs.
+        per_host_limit (int): Concurrent requests per host.
+        max_concurrency (int): Concurrent requests overall.
+        retries (int): Retries per URL after the first attempt.
+        backoff (float): Base delay in seconds for the backoff schedule.
+        fetcher (Optional[ImageFetcher]): Fetcher to use (default:
+            ``get_url_fetcher``); it should not retry on its own.
+        slots (Optional[asyncio.Semaphore]): Acquired before each download and
+            released by the consumer once done with the image, so at most its
+            value of images are held at a time.
+    """
+    fetcher = fetcher or get_url_fetcher()
+    overall = asyncio.Semaphore(max_concurrency)
+    hosts: Dict[str, asyncio.Semaphore] = {}
+
+    async def download(url: str) -> DownloadedImage:
+        host = urlsplit(url).netloc
+        host_limit = hosts.setdefault(host, asyncio.Semaphore(per_host_limit))
+        if slots is not None:
+            await slots.acquire()
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                async with overall, host_limit:
+                    data = await asyncio.to_thread(fetcher.fetch, url)
+                image = await asyncio.to_thread(decode_image, data)
+                return {
+                    "url": url,
+                    "image": image,
+                    "error": None,
+                    "attempts": attempt + 1,
+                    "seconds": time.perf_counter() - started,
+                }
+            except Exception as e:
+                if attempt >= retries or not _is_retryable(e):
+                    return {
+                        "url": url,
+                        "image": None,
+                        "error": f"{type(e).__name__}: {e}",
+                        "attempts": attempt + 1,
+                        "seconds": time.perf_counter() - started,
+                    }
+                await asyncio.sleep(backoff_delay(attempt, backoff))
+                attempt += 1
+
+    tasks = [asyncio.create_task(download(url)) for url in dedupe_urls(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _default_ocr(url: str, image: np.ndarray) -> dict:
+    from src.ocr.cli import process_image
+
+    name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    return process_image(image, name, output_dir="tmp/pre-process/batch-urls")
+
+
+async def ingest_urls(
+    urls: Iterable[str],
+    ocr: Optional[Callable[[str, np.ndarray], dict]] = None,
+    ocr_workers: int = 2,
+    on_result: Optional[Callable[[UrlOCRResult], None]] = None,
+    **download_kwargs,
+) -> List[UrlOCRResult]:
+    """
+    Download URLs concurrently and OCR each image as soon as it arrives.
+
+    OCR runs on a thread pool of ``ocr_workers`` while further downloads
+    continue, but only ``PENDING_PER_OCR_WORKER`` images per OCR worker are
+    downloaded ahead: on a fast network decoded images would otherwise pile up
+    waiting for OCR.
+
+    Args:
+        urls (Iterable[str]): Image URLs (duplicates are fetched and OCRed once).
+        ocr (Optional[Callable]): ``ocr(url, image) -> {"text", "vouchers"}``;
+            defaults to the ``cli.process_image`` pipeline.
+        ocr_workers (int): Concurrent OCR calls.
+        on_result (Optional[Callable]): Called with each result as it completes.
+        **download_kwargs: Passed to ``iter_downloaded_images``.
+
+    Returns:
+        List[UrlOCRResult]: One result per unique URL, in completion order.
+    """
+    ocr = ocr or _default_ocr
+    loop = asyncio.get_running_loop()
+    results: List[UrlOCRResult] = []
+    slots = asyncio.Semaphore(max(1, ocr_workers) * PENDING_PER_OCR_WORKER)
+
+    def run_ocr(item: DownloadedImage) -> UrlOCRResult:
+        result: UrlOCRResult = {
+            "url": item["url"],
+            "vouchers": [],
+            "error": item.get("error"),
+            "download_seconds": item.get("seconds", 0.0),
+        }
+        if item.get("image") is None:
+            return result
+        started = time.perf_counter()
+        try:
+            with span("batch_urls.ocr", url=item["url"]):
+                output = ocr(item["url"], item["image"])
+            result["vouchers"] = list(output.get("vouchers") or [])
+            result["text"] = output.get("text", "")
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["ocr_seconds"] = time.perf_counter() - started
+        return result
+
+    def finish(future) -> None:
+        # Done callbacks run on the event loop, where the semaphore lives
+        slots.release()
+        result = future.result()
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    with ThreadPoolExecutor(max_workers=ocr_workers) as pool:
+        pending = []
+        async for item in iter_downloaded_images(urls, slots=slots, **download_kwargs):
+            future = loop.run_in_executor(pool, run_ocr, item)
+            future.add_done_callback(finish)
+            pending.append(future)
+        if pending:
+            await asyncio.gather(*pending)
+    return results
+
+
+def read_url_list(path: str) -> List[str]:
+    """Read URLs from a text file (one per line, ``#`` comments allowed)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download and OCR a batch of image URLs concurrently"
+    )
+    parser.add_argument("urls", nargs="*", help="Image URLs")
+    parser.add_argument(
+        "-f", "--file", help="Text file with one image URL per line (use - for stdin)"
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write JSON lines to this file instead of stdout"
+    )
+    parser.add_argument("--per-host", type=int, default=4, help="Requests per host")
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Concurrent downloads overall"
+    )
+    parser.add_argument("--retries", type=int, default=3, help="Retries per URL")
+    parser.add_argument(
+        "--ocr-workers", type=int, default=2, help="Concurrent OCR workers"
+    )
+    args = parser.parse_args()
+
+    # OCR threads share the CPUs; each tesseract call gets CPUs / --ocr-workers
+    configure(args.ocr_workers)
+
+    url_list = list(args.urls)
+    if args.file == "-":
+        url_list.extend(line.strip() for line in sys.stdin if line.strip())
+    elif args.file:
+        url_list.extend(read_url_list(args.file))
+    if not url_list:
+        parser.error("No URLs given")
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+
+    def write_result(result: UrlOCRResult) -> None:
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    try:
+        batch_results = asyncio.run(
+            ingest_urls(
+                url_list,
+                ocr_workers=args.ocr_workers,
+                on_result=write_result,
+                per_host_limit=args.per_host,
+                max_concurrency=args.concurrency,
+                retries=args.retries,
+            )
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        flush_metrics()
+    failed = sum(1 for r in batch_results if r.get("error"))
+    safe_print(f"✅\tProcessed {len(batch_results)} URL(s), {failed} failed")
@@ -1,37 +1,65 @@
 import argparse
+import contextlib
+import json
 import os
 import sys
-from datetime import datetime
-from io import BytesIO
-from typing import Optional, Union
+import time
+from typing import List, Optional, Union
 import cv2
-import imageio.v3 as iio
 import numpy as np
-import pytesseract
-import requests
 from colorama import Fore, Style
 from colorama import init as colorama_init
-from PIL import Image
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
 from src.database.VoucherDatabase import extract_voucher_codes
-from src.ocr.image_utils import dewarp_image
+from src.ocr.crop_plan import FOCUS, CropSpec, iter_crops
+from src.ocr.crop_plan import save_crops as write_crops
+from src.ocr.decoders import Buffer, decode_image, open_image_buffer
+from src.ocr.image_fetcher import fetch_image_bytes
+from src.ocr.rescale import (
+    DEFAULT_MAX_PIXELS,
+    DEFAULT_TARGET_CHAR_HEIGHT,
+    decode_for_ocr,
+    decode_within_budget,
+    fit_pixel_budget,
+)
+from src.ocr.preprocess import (
+    CHAINS,
+    Preprocessor,
+    Step,
+    StepTiming,
+    get_chain,
+    preprocess,
+    step,
+)
+from src.ocr.refine import refine, tesseract_words, words_to_lines
+from src.ocr.tiling import TextLine, lines_text, ocr_tiled
+from src.ocr.tuner import load_profile, ocr_with_config
 from src.utils.file import get_relative_path
+from src.utils.console import safe_print
+from src.utils.job_logger import JobLogger, get_job_log_path
+from src.utils.memory import memory_stage, track_memory
+from src.utils.metrics import CODES_FOUND, CROP_COUNT, flush_metrics
+from src.utils.thread_budget import (
+    THREADS_ENV,
+    WORKERS_ENV,
+    apply_budget,
+    configure,
+    env_count,
+)
+from src.utils.tracing import span, start_trace
 
-
-def get_job_log_path(jobId: str) -> str:
-    """
-    Returns the absolute path to the log file for a given job ID.
-    """
-    output_dir = get_relative_path("tmp/logs")
-    os.makedirs(output_dir, exist_ok=True)
-    return os.path.join(output_dir, f"{jobId}.log")
+# Regions OCRed in addition to the full image with --crop
+CROP_SPECS = FOCUS[1:]
 
 
 def log(jobId: str, resetOrMsg: Union[str, bool], message: Optional[str] = None):
     """
-    Log messages with a job ID for tracking.
+    Append a single structured record to a job log.
+
+    Kept for callers outside the OCR pipeline; each call opens the file, so
+    pipelines should use a ``JobLogger`` and flush once per job instead.
 
     Args:
         jobId (str): Unique identifier for the job.
@@ -42,74 +70,84 @@ def log(jobId: str, resetOrMsg: Union[str, bool], message: Optional[str] = None)
             - If resetOrMsg is not a string, this message will be appended to the log file.
     """
     log_file = get_job_log_path(jobId)
-    if (isinstance(resetOrMsg, bool) and resetOrMsg) or not os.path.exists(log_file):
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Reset the log file if reset is True
-        with open(log_file, "w") as f:
-            f.write(f"Log for job {jobId} {date}:\n\n")
-    if isinstance(resetOrMsg, str):
-        # Append the message to the log file
-        with open(log_file, "a") as f:
-            f.write(f"{resetOrMsg}\n")
-    if isinstance(message, str):
-        # Append the message to the log file
-        with open(log_file, "a") as f:
-            f.write(f"{message}\n")
+    reset = (isinstance(resetOrMsg, bool) and resetOrMsg) or not os.path.exists(
+        log_file
+    )
+    now = time.time()
+    records = []
+    if reset:
+        records.append(
+            {
+                "type": "job",
+                "job_id": jobId,
+                "ts": now,
+                "stage": "job",
+                "status": "started",
+            }
+        )
+    records.extend(
+        {"type": "log", "job_id": jobId, "ts": now, "stage": "log", "message": msg}
+        for msg in (resetOrMsg, message)
+        if isinstance(msg, str)
+    )
+    with open(log_file, "w" if reset else "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
 
 
 def get_image_from_url_or_path(
-    image_source: str, cache_dir: str = "tmp/downloaded_images"
+    image_source: str,
+    cache_dir: str = "tmp/downloaded_images",
+    target_char_height: Optional[float] = None,
+    max_pixels: Optional[int] = None,
+    gray: bool = False,
 ) -> np.ndarray:
     """
     Load an image from a URL or a local file path, with caching for URLs.
 
+    URLs are downloaded through the shared pooled ``ImageFetcher`` (timeouts,
+    size cap, raw-bytes cache revalidated with ETag/Last-Modified).
+
+    Local files are memory-mapped and every source goes through the decoder
+    registry, which sniffs the format once and returns a BGR ``uint8`` array.
+
     Args:
         image_source (str): URL or local file path of the image.
+        cache_dir (str): Directory of the raw download cache.
+        target_char_height (Optional[float]): When set, decode straight to the
+            resolution where text is about this many pixels high (JPEGs that will
+            be shrunk are decoded at 1/2, 1/4 or 1/8 scale, see ``decode_for_ocr``).
+        max_pixels (Optional[int]): When set, decode within this pixel budget
+            instead (see ``decode_within_budget``); the chain's ``rescale``
+            step then sets the text height.
+        gray (bool): With ``max_pixels``, decode to a single channel.
 
     Returns:
         numpy.ndarray: Loaded image.
     """
-    import hashlib
-
     if image_source.startswith("http://") or image_source.startswith("https://"):
-        # Use a cache directory for downloaded images
-        cache_dir = get_relative_path(cache_dir)
-        os.makedirs(cache_dir, exist_ok=True)
-        # Hash the URL to create a unique filename
-        url_hash = hashlib.sha256(image_source.encode("utf-8")).hexdigest()
-        ext = os.path.splitext(image_source)[1]
-        if not ext or len(ext) > 5:
-            ext = ".jpg"
-        cache_path = os.path.join(cache_dir, url_hash + ext)
-        if os.path.exists(cache_path):
-            image = cv2.imread(cache_path, cv2.IMREAD_COLOR)
-        else:
-            response = requests.get(image_source)
-            image = cv2.imdecode(
-                np.frombuffer(BytesIO(response.content).read(), np.uint8),
-                cv2.IMREAD_COLOR,
+        import requests
+
+        try:
+            data = fetch_image_bytes(image_source, cache_dir)
+        except requests.RequestException as e:
+            raise ValueError(
+                f"Image could not be downloaded from {image_source}. Details: {e}"
             )
-            if image is not None:
-                cv2.imwrite(cache_path, image)
+        with span("cli.decode", source="url", bytes=len(data)):
+            image = _decode_buffer(data, target_char_height, max_pixels, gray)
     else:
         # Resolve relative path to absolute path
         if not os.path.isabs(image_source):
             image_source = os.path.abspath(image_source)
-        image = cv2.imread(image_source, cv2.IMREAD_COLOR)
-        if image is None:
-            try:
-                img = iio.imread(image_source)
-                # Convert grayscale to BGR
-                if len(img.shape) == 2:
-                    image = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-                elif img.shape[2] == 4:
-                    image = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
-                else:
-                    image = img
-            except Exception as e:
-                raise ValueError(
-                    f"Image could not be loaded. Check the URL or file path. Details: {e}"
-                )
+        try:
+            with span("cli.decode", source="file"), open_image_buffer(
+                image_source
+            ) as buf:
+                image = _decode_buffer(buf, target_char_height, max_pixels, gray)
+        except OSError as e:
+            raise ValueError(
+                f"Image could not be loaded. Check the URL or file path. Details: {e}"
+            )
 
     if image is None:
         raise ValueError("Image could not be loaded. Check the URL or file path.")
@@ -117,78 +155,78 @@ def get_image_from_url_or_path(
     return image
 
 
+def _decode_buffer(
+    data: Buffer,
+    target_char_height: Optional[float],
+    max_pixels: Optional[int] = None,
+    gray: bool = False,
+) -> Optional[np.ndarray]:
+    if max_pixels:
+        try:
+            return decode_within_budget(data, max_pixels, gray)
+        except ValueError:
+            return None
+    if target_char_height:
+        image, _ = decode_for_ocr(data, target_char_height)
+        return image
+    try:
+        return decode_image(data)
+    except ValueError:
+        return None
+
+
 def main(
     imagePathOrUrl="test/fixtures/noise.avif",
     crop: bool = False,
     output_dir: str = "tmp/pre-process",
     jobId: str = "default_job",
-):
-    image = get_image_from_url_or_path(imagePathOrUrl)
-    basename = os.path.splitext(os.path.basename(imagePathOrUrl))[0] + ".png"
-
-    # Convert to PNG before pre-processing
-    converted_output = os.path.normpath(os.path.join(output_dir, "converted", basename))
-    os.makedirs(os.path.dirname(converted_output), exist_ok=True)
-    cv2.imwrite(converted_output, image)
-    log(jobId, f"Image converted to PNG and saved to {converted_output}")
-    # Optionally reload the PNG to ensure all further processing uses the PNG version
-    image = cv2.imread(converted_output, cv2.IMREAD_COLOR)
-    if image is None:
-        raise ValueError(f"Failed to reload PNG image from {converted_output}")
-
-    # Apply Gaussian blur
-    image = cv2.GaussianBlur(image, (5, 5), 1.0)
-    blurred_output = os.path.join(output_dir, "blurred", basename)
-    os.makedirs(os.path.dirname(blurred_output), exist_ok=True)
-    cv2.imwrite(blurred_output, image)
-    log(jobId, f"Blurred image saved to {blurred_output}")
-
-    # Dewarp the image
-    result_dewarp = dewarp_image(image)
-    if result_dewarp is not None:
-        dewarped_image, dewarped_path = result_dewarp
-        log(jobId, f"Dewarped image saved to {dewarped_path}")
-        # Convert to numpy array if needed
-        if isinstance(dewarped_image, Image.Image):
-            image = np.array(dewarped_image)
-        else:
-            image = dewarped_image
-    else:
-        log(jobId, "Dewarping failed: dewarp_image returned None")
-
-    # Run OCR
-    ocr_text = pytesseract.image_to_string(image, lang="eng", config="--psm 6")
-
-    # Crop for numpy ndarray (OpenCV image)
-    if crop:
-        height, width = image.shape[:2]
-        crops = [
-            ("full", image),
-            ("top_half", image[: height // 2, :]),
-            ("bottom_half", image[height // 2 :, :]),
-            ("left_half", image[:, : width // 2]),
-            ("right_half", image[:, width // 2 :]),
-        ]
-        crops_dir = os.path.join(output_dir, "crops")
-        os.makedirs(crops_dir, exist_ok=True)
-        for name, crop_img in crops:
-            crop_output_path = os.path.join(crops_dir, f"{name}.png")
-            cv2.imwrite(crop_output_path, crop_img)
-            log(jobId, f"Cropped image '{name}' saved to {crop_output_path}")
-
-    # Log OCR output with indicator on its own line, OCR result follows on fresh lines
-    log(jobId, "\n[OCR_OUTPUT_START]")
-    log(jobId, ocr_text.rstrip("\n"))
-    log(jobId, "[OCR_OUTPUT_END]\n")
-
-    # Log Vouchers
-    vouchers = extract_voucher_codes(
-        ocr_text, output_dir=os.path.join(output_dir, "vouchers")
-    )
-    vouchers_str = "\n".join(vouchers) if isinstance(vouchers, list) else str(vouchers)
-    log(jobId, "\n[VOUCHER_OUTPUT_START]")
-    log(jobId, vouchers_str)
-    log(jobId, "[VOUCHER_OUTPUT_END]\n")
+    save_crops: bool = False,
+    tile: bool = False,
+    tile_size: Optional[int] = None,
+    tile_overlap: Optional[int] = None,
+    refine_weak: bool = True,
+    preprocess_chain: str = "cli",
+    profile: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+) -> dict:
+    """
+    Pre-process an image, OCR it and extract voucher codes.
+
+    The job log (``tmp/logs/<jobId>.log``) is written once, as JSON lines, when
+    the job completes or fails.
+
+    With ``max_pixels`` the job runs memory-bounded (see ``process_image``) and
+    the peak memory of each stage is logged and printed.
+
+    Returns:
+        dict: ``{"text": str, "vouchers": List[str]}``.
+    """
+    # Tesseract, OpenCV and torch threads follow the process's thread budget
+    apply_budget()
+    with JobLogger(jobId) as logger:
+        tracer = start_trace(jobId, sink=logger.span)
+        memory = track_memory() if max_pixels else contextlib.nullcontext()
+        try:
+            with span("cli.main", source=imagePathOrUrl, crop=crop), memory as tracker:
+                result = _run_pipeline(
+                    imagePathOrUrl,
+                    crop,
+                    output_dir,
+                    logger,
+                    save_crops,
+                    tile=tile,
+                    tile_size=tile_size,
+                    tile_overlap=tile_overlap,
+                    refine_weak=refine_weak,
+                    preprocess_chain=preprocess_chain,
+                    profile=profile,
+                    max_pixels=max_pixels,
+                )
+            if tracker is not None:
+                logger.log("memory", "Peak memory per stage", stages=tracker.stages)
+                safe_print(f"🧠\tPeak memory per stage:\n{tracker.report()}")
+        finally:
+            tracer.flush()
 
     # Colorize jobId and log path in the output using colorama (green for jobId, cyan for path)
     try:
@@ -198,12 +236,317 @@ def main(
         RESET = Style.RESET_ALL
     except ImportError:
         GREEN = CYAN = RESET = ""
-    log_path = get_job_log_path(jobId)
-    print(f"Log for job {GREEN}{jobId}{RESET} saved to {CYAN}{log_path}{RESET}")
+    print(f"Log for job {GREEN}{jobId}{RESET} saved to {CYAN}{logger.path}{RESET}")
+    return result
+
+
+def _run_pipeline(
+    imagePathOrUrl: str,
+    crop: bool,
+    output_dir: str,
+    logger: JobLogger,
+    save_crops: bool = False,
+    tile: bool = False,
+    tile_size: Optional[int] = None,
+    tile_overlap: Optional[int] = None,
+    refine_weak: bool = True,
+    preprocess_chain: str = "cli",
+    profile: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+) -> dict:
+    with memory_stage("decode"):
+        # Tesseract reads gray, so a budgeted decode skips the color channels
+        image = get_image_from_url_or_path(
+            imagePathOrUrl,
+            target_char_height=DEFAULT_TARGET_CHAR_HEIGHT,
+            max_pixels=max_pixels,
+            gray=True,
+        )
+    name = os.path.splitext(os.path.basename(imagePathOrUrl))[0]
+    return process_image(
+        image,
+        name,
+        crop=crop,
+        output_dir=output_dir,
+        logger=logger,
+        save_crops=save_crops,
+        tile=tile,
+        tile_size=tile_size,
+        tile_overlap=tile_overlap,
+        refine_weak=refine_weak,
+        preprocess_chain=preprocess_chain,
+        profile=profile,
+        max_pixels=max_pixels,
+    )
+
+
+def process_image(
+    image: np.ndarray,
+    name: str,
+    crop: bool = False,
+    output_dir: str = "tmp/pre-process",
+    logger: Optional[JobLogger] = None,
+    save_crops: bool = False,
+    tile: bool = False,
+    tile_size: Optional[int] = None,
+    tile_overlap: Optional[int] = None,
+    refine_weak: bool = True,
+    preprocess_chain: str = "cli",
+    profile: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+) -> dict:
+    """
+    Run the pre-process → OCR → voucher extraction pipeline on a decoded image.
+
+    Args:
+        image (np.ndarray): BGR image.
+        name (str): Base name used for the intermediate files.
+        crop (bool): Also OCR the halves of the processed image and merge their
+            text (deduplicated by line) with the full-image text.
+        output_dir (str): Directory for intermediate images.
+        save_crops (bool): With ``crop``, also write the crops under
+            ``<output_dir>/crops`` for debugging.
+        logger (Optional[JobLogger]): Job logger; records are discarded when omitted.
+        tile (bool): OCR overlapping tiles in parallel instead of the full image
+            (and instead of the halves from ``crop``); lines read twice where
+            tiles overlap are merged.
+        tile_size (Optional[int]): Tile side in pixels; sized from the text
+            height when omitted.
+        tile_overlap (Optional[int]): Tile overlap in pixels; one code width
+            when omitted.
+        refine_weak (bool): Re-OCR low-confidence and partial-code lines of the
+            full-image pass with heavier pre-processing.
+        preprocess_chain (str): Name of the preprocessing chain (see
+            ``preprocess.CHAINS``).
+        profile (Optional[str]): Named OCR profile (see ``tuner.load_profile``);
+            its chain, engine, Tesseract modes, crops and refinement replace
+            ``preprocess_chain``, ``crop``, ``tile`` and ``refine_weak``.
+        max_pixels (Optional[int]): Memory-bounded mode: the image is made
+            gray and kept within this many pixels through every step, and
+            intermediate images are not memoized. Stages are measured when a
+            ``memory.track_memory`` tracker is active.
+
+    Returns:
+        dict: ``{"text": str, "vouchers": List[str]}``.
+    """
+    if logger is None:
+        logger = JobLogger(name)
+    config = load_profile(profile) if profile else None
+    if config:
+        preprocess_chain = config["chain"]
+        logger.log("profile", "OCR profile loaded", profile=profile, **config)
+    if max_pixels:
+        # Tesseract binarizes a gray image anyway; one channel is a third of BGR
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        image = fit_pixel_budget(image, max_pixels)[0]
+    with memory_stage("preprocess"):
+        image = preprocess_image(
+            image,
+            name,
+            output_dir,
+            logger,
+            chain=preprocess_chain,
+            max_pixels=max_pixels,
+        )
+    with memory_stage("ocr"):
+        if config:
+            with span("cli.ocr", profile=profile) as s:
+                ocr_text = ocr_with_config(image, config)
+                s.set_attribute("chars", len(ocr_text))
+        elif tile:
+            # The image was rescaled so code digits are about this tall
+            lines = ocr_tiled(
+                image,
+                ocr_lines,
+                DEFAULT_TARGET_CHAR_HEIGHT,
+                tile_size=tile_size,
+                overlap=tile_overlap,
+            )
+            ocr_text = lines_text(lines)
+            logger.log("tile", "Image OCRed in tiles", lines=len(lines))
+        elif refine_weak:
+            ocr_text = ocr_refined(image, logger)
+        else:
+            ocr_text = ocr_image(image)
+    logger.text("ocr", ocr_text.rstrip("\n"))
+
+    # OCR the halves too; crops are views of the processed image
+    if crop and not tile and not config:
+        with memory_stage("crops"):
+            crop_texts = ocr_crops(image, CROP_SPECS, logger)
+            if save_crops:
+                save_crop_images(image, output_dir, logger)
+        lines = [ocr_text] + crop_texts
+        ocr_text = "\n".join(
+            dict.fromkeys(
+                line.strip()
+                for text in lines
+                for line in text.splitlines()
+                if line.strip()
+            )
+        )
+
+    with memory_stage("extract"):
+        vouchers = extract_vouchers(ocr_text, output_dir)
+    logger.vouchers("extract_vouchers", vouchers)
+    return {"text": ocr_text, "vouchers": vouchers}
+
+
+# Steps whose output is saved under <output_dir>/<directory> for debugging
+STEP_OUTPUT_DIRS = {"rescale": "converted", "blur": "blurred", "dewarp": "dewarped"}
+
+
+def preprocess_image(
+    image: np.ndarray,
+    name: str,
+    output_dir: str = "tmp/pre-process",
+    logger: Optional[JobLogger] = None,
+    target_char_height: Optional[float] = DEFAULT_TARGET_CHAR_HEIGHT,
+    chain: str = "cli",
+    max_pixels: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Run the preprocessing ``chain`` on ``image``; the cv2-bound half of the pipeline.
+
+    The default ``cli`` chain rescales so the dominant text height is about
+    ``target_char_height`` pixels (pass None to keep the original resolution),
+    blurs and dewarps. Each step is timed and logged; the outputs of the steps in
+    ``STEP_OUTPUT_DIRS`` are saved as PNG.
+
+    With ``max_pixels`` no step output grows past that many pixels, and each
+    intermediate is freed once the next step has run instead of being kept in
+    the shared memo.
+
+    Raises:
+        ValueError: If ``chain`` is not a registered preprocessing chain.
+    """
+    if logger is None:
+        logger = JobLogger(name)
+    basename = name + ".png"
+    steps = [
+        (
+            step("rescale", target_char_height=target_char_height)
+            if s.name == "rescale"
+            else s
+        )
+        for s in get_chain(chain)
+        if s.name != "rescale" or target_char_height
+    ]
+
+    def on_step(s: Step, output: np.ndarray, timing: StepTiming) -> None:
+        fields = {"chain": chain, "seconds": round(timing["seconds"], 4)}
+        if timing["cached"]:
+            fields["cached"] = True
+        directory = STEP_OUTPUT_DIRS.get(s.name)
+        if directory:
+            path = os.path.normpath(os.path.join(output_dir, directory, basename))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cv2.imwrite(path, output)
+            fields["path"] = path
+        logger.log(
+            s.name,
+            f"Preprocessing step {s} applied",
+            width=output.shape[1],
+            height=output.shape[0],
+            **fields,
+        )
+
+    if max_pixels:
+        return Preprocessor(memo_size=0).run(
+            image, steps, on_step=on_step, max_pixels=max_pixels
+        )["image"]
+    return preprocess(image, steps, on_step=on_step)["image"]
+
+
+def ocr_image(image: np.ndarray) -> str:
+    """Run Tesseract (``--psm 6``) on a pre-processed image."""
+    import pytesseract
+
+    with span("cli.ocr", engine="tesseract", psm=6) as s:
+        # pytesseract reads arrays as RGB
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image.ndim == 3 else image
+        ocr_text = pytesseract.image_to_string(rgb, lang="eng", config="--psm 6")
+        s.set_attribute("chars", len(ocr_text))
+    return ocr_text
+
+
+def ocr_lines(image: np.ndarray) -> List[TextLine]:
+    """Run Tesseract (``--psm 6``) and return its text lines with pixel boxes."""
+    return words_to_lines(tesseract_words(image, lang="eng", config="--psm 6"))
+
+
+def ocr_refined(image: np.ndarray, logger: Optional[JobLogger] = None) -> str:
+    """
+    Run Tesseract (``--psm 6``) once with word confidences, then re-OCR only the
+    low-confidence or partial-code lines (see ``refine.refine``).
+    """
+    with span("cli.ocr", engine="tesseract", psm=6, refine=True) as s:
+        words = tesseract_words(image, lang="eng", config="--psm 6")
+        result = refine(image, words)
+        s.set_attributes(words=len(words), regions=len(result["regions"]))
+    if logger is not None and result["regions"]:
+        logger.log(
+            "refine",
+            "Low-confidence regions re-OCRed",
+            regions=[list(box) for box in result["regions"]],
+            texts=result["region_texts"],
+        )
+    return result["text"]
+
+
+def ocr_crops(image: np.ndarray, specs: List[CropSpec], logger: JobLogger) -> List[str]:
+    """OCR each crop of ``image`` (views, produced one at a time) and log its text."""
+    CROP_COUNT.observe(len(specs), stage="cli.crop")
+    texts = []
+    for spec, view in iter_crops(image, specs):
+        with span("cli.crop_ocr", crop=spec.name):
+            text = ocr_image(view)
+        logger.text(f"ocr.{spec.name}", text.rstrip("\n"))
+        texts.append(text)
+    return texts
+
+
+def save_crop_images(image: np.ndarray, output_dir: str, logger: JobLogger) -> None:
+    """Save the full image and its halves under ``<output_dir>/crops``."""
+    with span("cli.crop_save"):
+        paths = write_crops(image, FOCUS, os.path.join(output_dir, "crops"))
+    for spec, path in zip(FOCUS, paths):
+        logger.log("crop", "Cropped image saved", crop=spec.name, path=path)
+
+
+def extract_vouchers(ocr_text: str, output_dir: str = "tmp/pre-process") -> List[str]:
+    """Extract voucher codes from OCR text, writing debug output under ``output_dir``."""
+    with span("cli.extract_vouchers") as s:
+        vouchers = extract_voucher_codes(
+            ocr_text, output_dir=os.path.join(output_dir, "vouchers")
+        )
+        s.set_attribute("codes", len(vouchers))
+    CODES_FOUND.observe(len(vouchers), stage="cli")
+    return vouchers
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Pre-process an image for OCR")
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # python src/ocr/cli.py batch <dir|glob|manifest.jsonl> [options]
+        from src.ocr.batch import main as batch_main
+
+        batch_main(sys.argv[2:])
+        flush_metrics()
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "tune":
+        # python src/ocr/cli.py tune [--labels labels.jsonl] [options]
+        from src.ocr.tuner import main as tune_main
+
+        tune_main(sys.argv[2:])
+        flush_metrics()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(
+        description="Pre-process an image for OCR",
+        epilog="Use 'cli.py batch -h' to OCR a directory, glob or manifest, and "
+        "'cli.py tune -h' to build OCR profiles from labeled images.",
+    )
     parser.add_argument(
         "-i",
         "--image",
@@ -214,7 +557,71 @@ if __name__ == "__main__":
         "-c",
         "--crop",
         action="store_true",
-        help="Enable cropping of the image into halves and quarters",
+        help="Also OCR the halves of the image and merge their text",
+    )
+    parser.add_argument(
+        "--save-crops",
+        action="store_true",
+        help="With --crop, save the crops under <output-dir>/crops",
+    )
+    parser.add_argument(
+        "-t",
+        "--tile",
+        action="store_true",
+        help="OCR overlapping tiles in parallel instead of the full image",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=int,
+        default=None,
+        help="With --tile, tile side in pixels (default: sized from the text height)",
+    )
+    parser.add_argument(
+        "--tile-overlap",
+        type=int,
+        default=None,
+        help="With --tile, overlap between tiles in pixels (default: one code width)",
+    )
+    parser.add_argument(
+        "-p",
+        "--preprocess",
+        default="cli",
+        choices=sorted(CHAINS),
+        help="Preprocessing chain to run before OCR",
+    )
+    parser.add_argument(
+        "-P",
+        "--profile",
+        default=None,
+        help="Named OCR profile from the tuner (e.g. fast, balanced, thorough)",
+    )
+    parser.add_argument(
+        "--max-pixels",
+        type=int,
+        nargs="?",
+        const=DEFAULT_MAX_PIXELS,
+        default=None,
+        help="Memory-bounded mode: gray images of at most this many pixels "
+        f"(default {DEFAULT_MAX_PIXELS}) and peak memory per stage",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=env_count(WORKERS_ENV) or 1,
+        help="OCR jobs running at the same time on this machine; each gets "
+        f"CPUs / workers threads (default: ${WORKERS_ENV} or 1)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=env_count(THREADS_ENV),
+        help=f"Threads for tesseract/OpenCV/torch (default: ${THREADS_ENV} or "
+        "CPUs / --workers)",
+    )
+    parser.add_argument(
+        "--no-refine",
+        action="store_true",
+        help="Skip re-OCRing low-confidence lines with heavier pre-processing",
     )
     parser.add_argument(
         "-o",
@@ -229,12 +636,21 @@ if __name__ == "__main__":
         help="Unique identifier for the job, used for logging",
     )
     args = parser.parse_args()
-    # Reset the log file for this job ID
-    log(args.jobId, True)
+    # Concurrent jobs share the CPUs instead of each taking all of them
+    configure(max(1, args.workers), threads=args.threads)
     # Call the main function with the parsed arguments
     main(
         imagePathOrUrl=args.image,
         crop=args.crop,
         output_dir=args.output_dir,
         jobId=args.jobId,
+        save_crops=args.save_crops,
+        tile=args.tile,
+        tile_size=args.tile_size,
+        tile_overlap=args.tile_overlap,
+        refine_weak=not args.no_refine,
+        preprocess_chain=args.preprocess,
+        profile=args.profile,
+        max_pixels=args.max_pixels,
     )
+    flush_metrics()
@@ -0,0 +1,142 @@
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.file import get_relative_path
+
+
+class CropSpec(NamedTuple):
+    """
+    A region of an image to OCR, described without touching any pixels.
+
+    Attributes:
+        name (str): Label used in logs, traces and saved file names.
+        box (Tuple[float, float, float, float]): ``(x0, y0, x1, y1)`` as fractions
+            of the image width and height.
+        rotation (int): Counter-clockwise rotation in degrees (0, 90, 180 or 270),
+            matching ``PIL.Image.rotate(angle, expand=True)``.
+    """
+
+    name: str
+    box: Tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0)
+    rotation: int = 0
+
+    def pixel_box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        x0, y0, x1, y1 = self.box
+        return (
+            int(x0 * width),
+            int(y0 * height),
+            int(x1 * width),
+            int(y1 * height),
+        )
+
+    def view(self, image: np.ndarray) -> np.ndarray:
+        """Return the region as a view of ``image`` (no pixels are copied)."""
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = self.pixel_box(width, height)
+        region = image[y0:y1, x0:x1]
+        if self.rotation % 360:
+            region = np.rot90(region, k=(self.rotation // 90) % 4)
+        return region
+
+
+FULL = CropSpec("full")
+HALVES = [
+    CropSpec("half_left", (0.0, 0.0, 0.5, 1.0)),
+    CropSpec("half_right", (0.5, 0.0, 1.0, 1.0)),
+    CropSpec("half_top", (0.0, 0.0, 1.0, 0.5)),
+    CropSpec("half_bottom", (0.0, 0.5, 1.0, 1.0)),
+]
+QUARTERS = [
+    CropSpec("quarter_1", (0.0, 0.0, 0.5, 0.5)),
+    CropSpec("quarter_2", (0.5, 0.0, 1.0, 0.5)),
+    CropSpec("quarter_3", (0.0, 0.5, 0.5, 1.0)),
+    CropSpec("quarter_4", (0.5, 0.5, 1.0, 1.0)),
+]
+# The full image followed by its halves, as OCRed by the focus_* engines
+FOCUS = [
+    FULL,
+    CropSpec("top_half", (0.0, 0.0, 1.0, 0.5)),
+    CropSpec("bottom_half", (0.0, 0.5, 1.0, 1.0)),
+    CropSpec("left_half", (0.0, 0.0, 0.5, 1.0)),
+    CropSpec("right_half", (0.5, 0.0, 1.0, 1.0)),
+]
+ROTATIONS = [CropSpec(f"angle_{angle}", rotation=angle) for angle in (0, 90, 180, 270)]
+
+PLANS: Dict[str, List[CropSpec]] = {
+    "full": [FULL],
+    "halves": HALVES,
+    "quarters": QUARTERS,
+    "focus": FOCUS,
+    "rotations": ROTATIONS,
+}
+
+
+def crop_plan(mode: str) -> List[CropSpec]:
+    """
+    Return the named crop plan (``full``, ``halves``, ``quarters``, ``focus``
+    or ``rotations``).
+
+    Raises:
+        ValueError: If ``mode`` is not a known plan.
+    """
+    try:
+        return list(PLANS[mode])
+    except KeyError:
+        raise ValueError(f"Unknown crop plan: {mode}")
+
+
+def is_cv2_compatible(view: np.ndarray) -> bool:
+    """True when OpenCV can use ``view`` without a copy (rows may be strided)."""
+    item = view.itemsize
+    if any(stride <= 0 for stride in view.strides):
+        return False
+    if view.strides[-1] != item:
+        return False
+    return view.ndim == 2 or view.strides[1] == view.shape[2] * item
+
+
+def iter_crops(
+    image: np.ndarray, specs: Iterable[CropSpec], contiguous: bool = False
+) -> Iterator[Tuple[CropSpec, np.ndarray]]:
+    """
+    Lazily yield ``(spec, pixels)`` for each crop of ``image``.
+
+    Plain regions are yielded as views. Rotated regions (and every region when
+    ``contiguous`` is set) are copied only when the consumer asks for that crop,
+    so a job holds at most one extra crop buffer at a time.
+    """
+    for spec in specs:
+        view = spec.view(image)
+        if contiguous or not is_cv2_compatible(view):
+            view = np.ascontiguousarray(view)
+        yield spec, view
+
+
+def save_crops(
+    image: np.ndarray,
+    specs: Iterable[CropSpec],
+    directory: str,
+    channel_order: str = "BGR",
+) -> List[str]:
+    """
+    Write each crop of ``image`` to ``<directory>/<spec.name>.png`` for debugging.
+
+    Returns:
+        List[str]: Paths of the saved files, in plan order.
+    """
+    directory = get_relative_path(directory)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for spec, pixels in iter_crops(image, specs):
+        if channel_order == "RGB" and pixels.ndim == 3:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+        path = get_relative_path(directory, f"{spec.name}.png")
+        cv2.imwrite(path, pixels)
+        paths.append(path)
+    return paths
@@ -0,0 +1,272 @@
+import io
+import mmap
+import os
+import sys
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.tracing import span
+
+Buffer = Union[bytes, bytearray, memoryview, np.ndarray]
+# A decoder takes a uint8 buffer and returns an image array or None when it cannot
+Decoder = Callable[[np.ndarray], Optional[np.ndarray]]
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD}
+_SOF_MARKERS |= {0xCE, 0xCF}
+
+
+def as_buffer(data: Buffer) -> np.ndarray:
+    """View ``data`` as a 1-D uint8 array without copying."""
+    if isinstance(data, np.ndarray):
+        return data.reshape(-1).view(np.uint8)
+    return np.frombuffer(data, np.uint8)
+
+
+def sniff_format(data: Buffer) -> Optional[str]:
+    """
+    Identify an encoded image from its magic bytes.
+
+    Returns:
+        Optional[str]: One of ``jpeg``, ``png``, ``gif``, ``bmp``, ``webp``,
+        ``tiff``, ``avif`` or ``heif``; None when the signature is unknown.
+    """
+    head = as_buffer(data)[:16].tobytes()
+    if head[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:2] == b"BM":
+        return "bmp"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"avif", b"avis"):
+            return "avif"
+        if brand in (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"):
+            return "heif"
+    return None
+
+
+def image_size(data: Buffer) -> Optional[Tuple[int, int]]:
+    """
+    Return ``(width, height)`` from the header without decoding pixels.
+
+    JPEG and PNG headers are parsed directly; other formats go through PIL's lazy
+    ``Image.open``. Returns None when the size cannot be determined.
+    """
+    buf = as_buffer(data)
+    fmt = sniff_format(buf)
+    if fmt == "png" and len(buf) >= 24:
+        width = int.from_bytes(buf[16:20].tobytes(), "big")
+        height = int.from_bytes(buf[20:24].tobytes(), "big")
+        return width, height
+    if fmt == "jpeg":
+        return _jpeg_size(buf)
+    try:
+        with Image.open(io.BytesIO(buf)) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def _jpeg_size(buf: np.ndarray) -> Optional[Tuple[int, int]]:
+    i = 2
+    n = len(buf)
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return None
+        marker = int(buf[i + 1])
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = int(buf[i + 5]) << 8 | int(buf[i + 6])
+            width = int(buf[i + 7]) << 8 | int(buf[i + 8])
+            return width, height
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            i += 2
+            continue
+        i += 2 + (int(buf[i + 2]) << 8 | int(buf[i + 3]))
+    return None
+
+
+def to_bgr(image: np.ndarray, channel_order: str = "RGB") -> np.ndarray:
+    """
+    Convert a decoded array to the canonical form: 3-channel BGR, uint8, contiguous.
+
+    Args:
+        image (np.ndarray): Gray, RGB(A) or BGR(A) array of any integer depth.
+        channel_order (str): ``RGB`` for PIL/imageio output, ``BGR`` for OpenCV.
+    """
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    elif image.dtype != np.uint8:
+        image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    if image.ndim == 2 or image.shape[2] == 1:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        code = cv2.COLOR_RGBA2BGR if channel_order == "RGB" else cv2.COLOR_BGRA2BGR
+        return cv2.cvtColor(image, code)
+    if channel_order == "RGB":
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    return np.ascontiguousarray(image)
+
+
+def decode_cv2(buf: np.ndarray) -> Optional[np.ndarray]:
+    """Decode with OpenCV (applies EXIF orientation, returns BGR directly)."""
+    try:
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    except cv2.error:
+        return None
+
+
+def decode_pil(buf: np.ndarray) -> Optional[np.ndarray]:
+    """Decode with Pillow, using pillow-heif for HEIF/AVIF when it is installed."""
+    _register_heif_opener()
+    try:
+        with Image.open(io.BytesIO(buf)) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("L", "RGB", "RGBA"):
+                img = img.convert("RGB")
+            return to_bgr(np.asarray(img), "RGB")
+    except Exception:
+        return None
+
+
+def decode_imageio(buf: np.ndarray) -> Optional[np.ndarray]:
+    """Decode with imageio (last resort; needs a copy of the buffer as bytes)."""
+    try:
+        import imageio.v3 as iio
+
+        return to_bgr(iio.imread(buf.tobytes()), "RGB")
+    except Exception:
+        return None
+
+
+_heif_registered = False
+
+
+def _register_heif_opener() -> None:
+    global _heif_registered
+    if _heif_registered:
+        return
+    _heif_registered = True
+    try:
+        from pillow_heif import register_heif_opener
+
+        register_heif_opener()
+    except ImportError:
+        pass
+
+
+# Decoders tried per format, fastest first. Unknown formats use the "*" chain.
+DECODERS: Dict[str, List[Decoder]] = {
+    "jpeg": [decode_cv2, decode_pil],
+    "png": [decode_cv2, decode_pil],
+    "bmp": [decode_cv2, decode_pil],
+    "tiff": [decode_cv2, decode_pil],
+    "webp": [decode_cv2, decode_pil],
+    "gif": [decode_pil, decode_cv2],
+    "avif": [decode_cv2, decode_pil, decode_imageio],
+    "heif": [decode_pil, decode_imageio],
+    "*": [decode_cv2, decode_pil, decode_imageio],
+}
+
+
+def register_decoder(fmt: str, decoder: Decoder, first: bool = True) -> None:
+    """Add ``decoder`` to the chain for ``fmt`` (at the front by default)."""
+    chain = DECODERS.setdefault(fmt, [])
+    if decoder in chain:
+        chain.remove(decoder)
+    chain.insert(0 if first else len(chain), decoder)
+
+
+def decode_image(data: Buffer, fmt: Optional[str] = None) -> np.ndarray:
+    """
+    Decode an encoded image into the canonical BGR uint8 array.
+
+    The format is sniffed once from the magic bytes and the buffer is handed to
+    the decoders registered for it, in order, until one succeeds.
+
+    Raises:
+        ValueError: If no registered decoder can read the data.
+    """
+    buf = as_buffer(data)
+    if not len(buf):
+        raise ValueError("Could not decode image data (empty buffer)")
+    fmt = fmt or sniff_format(buf)
+    for decoder in DECODERS.get(fmt or "*", DECODERS["*"]):
+        with span("decode", format=fmt or "unknown", decoder=decoder.__name__):
+            image = decoder(buf)
+        if image is not None:
+            return image
+    raise ValueError(f"Could not decode image data (format: {fmt or 'unknown'})")
+
+
+@contextmanager
+def open_image_buffer(path: str) -> Iterator[np.ndarray]:
+    """
+    Memory-map ``path`` read-only and yield it as a uint8 array.
+
+    The mapping is only valid inside the ``with`` block; decode before leaving it.
+    Empty files yield an empty array.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield np.empty(0, np.uint8)
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield np.frombuffer(mapped, np.uint8)
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is released with it
+            pass
+
+
+def read_image(path: str) -> np.ndarray:
+    """
+    Read and decode a local image file into the canonical BGR array.
+
+    Raises:
+        FileNotFoundError: If ``path`` does not exist.
+        ValueError: If the file is not a decodable image.
+    """
+    with open_image_buffer(path) as buf:
+        try:
+            return decode_image(buf)
+        except ValueError as e:
+            raise ValueError(f"{e}: {path}")
+
+
+def load_image(image: Union[str, Image.Image, np.ndarray]) -> np.ndarray:
+    """Return a path, PIL image or array as the canonical BGR array."""
+    if isinstance(image, str):
+        return read_image(image)
+    if isinstance(image, Image.Image):
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGB")
+        return to_bgr(np.asarray(image), "RGB")
+    if isinstance(image, np.ndarray):
+        return to_bgr(image, "BGR")
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+def load_pil_image(image: Union[str, Image.Image, np.ndarray]) -> Image.Image:
+    """Return a path, PIL image or BGR array as an RGB PIL image."""
+    if isinstance(image, Image.Image):
+        return image
+    return Image.fromarray(cv2.cvtColor(load_image(image), cv2.COLOR_BGR2RGB))
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.console import safe_print
+from src.utils.file import get_relative_path
+from src.utils.thread_budget import current_budget
+from src.utils.tracing import span
+
+# "eager" keeps EasyOCR's own PyTorch modules
+BACKENDS = ("eager", "torchscript", "onnx")
+DEFAULT_CACHE_DIR = "tmp/easyocr_models"
+# Bump when the export code changes so stale artifacts are not reused
+EXPORT_VERSION = 1
+ONNX_OPSET = 17
+# Int8 weights for the recognizer's LSTM and linear layers; CRAFT is all
+# convolutions, which dynamic int8 makes slower on CPU, so they stay float
+ONNX_QUANTIZED_OPS = ["MatMul", "Gemm", "LSTM"]
+
+
+def cache_key(backend: str, settings: Sequence[Any]) -> str:
+    """Identify an export by backend, Reader settings and library versions."""
+    import easyocr
+
+    h = hashlib.blake2b(digest_size=12)
+    for part in (backend, EXPORT_VERSION, torch.__version__, easyocr.__version__):
+        h.update(repr(part).encode())
+    h.update(repr(tuple(settings)).encode())
+    return h.hexdigest()
+
+
+def _examples(reader: Any) -> Dict[str, Tuple[torch.Tensor, ...]]:
+    """Trace/export inputs: an RGB page for CRAFT, a text line for the recognizer."""
+    height = getattr(reader, "imgH", 64)
+    return {
+        "detector": (torch.zeros(1, 3, 640, 640),),
+        "recognizer": (
+            torch.zeros(1, 1, height, 256),
+            torch.zeros(1, 26, dtype=torch.long),
+        ),
+    }
+
+
+def _networks(reader: Any) -> List[str]:
+    """The networks of ``reader`` this module can replace."""
+    names = []
+    # DBNet has its own inference entry point; only CRAFT is a plain forward()
+    if (
+        hasattr(reader, "detector")
+        and getattr(reader, "detect_network", "craft") == "craft"
+    ):
+        names.append("detector")
+    if hasattr(reader, "recognizer"):
+        names.append("recognizer")
+    return names
+
+
+def _atomic(path: str, write) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_torchscript(
+    model: torch.nn.Module, example: Tuple[torch.Tensor, ...], path: str
+) -> torch.nn.Module:
+    """
+    Trace, freeze and optimize ``model`` into ``path`` on first use, then load it.
+
+    Frozen graphs inline the weights and fold batch norms into convolutions;
+    EasyOCR's dynamic int8 quantization (``quantize=True``) is kept.
+    """
+    if not os.path.exists(path):
+        with span("easyocr_backend.export", backend="torchscript"), torch.no_grad():
+            traced = torch.jit.trace(model.eval(), example, check_trace=False)
+            frozen = torch.jit.freeze(traced)
+            frozen = torch.jit.optimize_for_inference(frozen)
+            _atomic(path, lambda p: torch.jit.save(frozen, p))
+    return torch.jit.load(path, map_location="cpu").eval()
+
+
+class OnnxModule(torch.nn.Module):
+    """
+    Runs an ONNX Runtime session behind the ``forward`` of the module it replaces.
+
+    Inputs are fed in order (unused inputs dropped by the export are skipped) and
+    outputs come back as tensors, so EasyOCR's pre- and post-processing run
+    unchanged.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = current_budget().threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = [i.name for i in self.session.get_inputs()]
+
+    def forward(self, *args: torch.Tensor):
+        feeds = {
+            name: arg.detach().cpu().numpy() for name, arg in zip(self.inputs, args)
+        }
+        outputs = [torch.from_numpy(o) for o in self.session.run(None, feeds)]
+        return tuple(outputs) if len(outputs) > 1 else outputs[0]
+
+
+def load_onnx(
+    model: torch.nn.Module,
+    example: Tuple[torch.Tensor, ...],
+    path: str,
+    network: str,
+) -> torch.nn.Module:
+    """
+    Export ``model`` to ONNX with dynamic shapes and int8 weights on first use.
+
+    The model must hold float weights: PyTorch's dynamically quantized layers do
+    not export, so ONNX Runtime quantizes the exported graph instead.
+    """
+    if not os.path.exists(path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        if network == "detector":
+            inputs, outputs = ["image"], ["score", "feature"]
+            axes = {
+                "image": {0: "batch", 2: "height", 3: "width"},
+                "score": {0: "batch", 1: "out_height", 2: "out_width"},
+                "feature": {0: "batch", 2: "out_height", 3: "out_width"},
+            }
+        else:
+            inputs, outputs = ["image", "text"], ["preds"]
+            axes = {
+                "image": {0: "batch", 3: "width"},
+                "text": {0: "batch"},
+                "preds": {0: "batch", 1: "steps"},
+            }
+        float_path = f"{path}.float.onnx"
+        with span("easyocr_backend.export", backend="onnx", network=network):
+            with torch.no_grad():
+                torch.onnx.export(
+                    model.eval(),
+                    example,
+                    float_path,
+                    input_names=inputs,
+                    output_names=outputs,
+                    dynamic_axes=axes,
+                    opset_version=ONNX_OPSET,
+                )
+            try:
+                _atomic(
+                    path,
+                    lambda p: quantize_dynamic(
+                        float_path,
+                        p,
+                        op_types_to_quantize=ONNX_QUANTIZED_OPS,
+                        weight_type=QuantType.QInt8,
+                    ),
+                )
+            finally:
+                os.remove(float_path)
+    return OnnxModule(path)
+
+
+def reader_kwargs_for(backend: str, reader_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reader settings needed by ``backend``.
+
+    The ONNX export needs float weights, so EasyOCR's own quantization is
+    disabled; the exported graph is quantized by ONNX Runtime instead.
+    """
+    if backend == "onnx":
+        return {**reader_kwargs, "quantize": False}
+    return dict(reader_kwargs)
+
+
+def optimize_reader(
+    reader: Any,
+    backend: str,
+    key: str,
+    cache_dir: Optional[str] = None,
+) -> Any:
+    """
+    Swap ``reader``'s detector and recognizer for ``backend`` versions.
+
+    Artifacts are exported once into ``cache_dir`` (default
+    ``tmp/easyocr_models``) under ``key`` and loaded from there afterwards.
+
+    Args:
+        reader: An ``easyocr.Reader`` on CPU.
+        backend (str): One of ``BACKENDS``.
+        key (str): Cache key, see ``cache_key``.
+        cache_dir (Optional[str]): Directory of exported models.
+
+    Returns:
+        The same Reader, modified in place.
+
+    Raises:
+        ValueError: If ``backend`` is unknown or the Reader runs on a GPU.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown EasyOCR backend '{backend}', expected one of {BACKENDS}"
+        )
+    if backend == "eager":
+        return reader
+    if getattr(reader, "device", "cpu") != "cpu":
+        raise ValueError(f"The {backend} backend is for CPU readers only")
+    directory = get_relative_path(cache_dir or DEFAULT_CACHE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    examples = _examples(reader)
+    extension = "onnx" if backend == "onnx" else "pt"
+    for network in _networks(reader):
+        path = os.path.join(directory, f"{key}-{network}.{extension}")
+        if not os.path.exists(path):
+            safe_print(f"📦\tExporting EasyOCR {network} to {backend}: {path}")
+        model = getattr(reader, network)
+        if backend == "onnx":
+            optimized = load_onnx(model, examples[network], path, network)
+        else:
+            optimized = load_torchscript(model, examples[network], path)
+        setattr(reader, network, optimized)
+    return reader
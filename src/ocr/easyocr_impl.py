@@ -1,26 +1,43 @@
 import argparse
+import inspect
 import os
 import re
 import sys
 import warnings
-import easyocr
+import cv2
 import numpy as np
-from typing import TypedDict, List, Optional, Any
+from typing import TypedDict, List, Optional, Any, Tuple
 from PIL import Image
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from src.utils.file import get_relative_path
 from src.database.VoucherDatabase import (
     get_database_instance,
-    store_voucher_in_database,
     safe_print,
     extract_voucher_codes,
 )
+from src.database.voucher_sink import get_voucher_sink
+from src.ocr.crop_plan import QUARTERS
+from src.ocr.decoders import read_image
 from src.ocr.image_utils import split_image
+from src.ocr.preprocess import CHAINS, preprocess
+from src.ocr.rescale import TARGET_CHAR_HEIGHT
+from src.ocr.tiling import Box, Tile, merge_tile_boxes, tile_geometry, tile_plan
+from src.ocr.tuner import load_profile
+from src.utils.metrics import CODES_FOUND, flush_metrics
+from src.utils.thread_budget import apply_budget
+from src.utils.tracing import span
 
 # Suppress PyTorch DataLoader warnings about pin_memory
 warnings.filterwarnings("ignore", message=".*pin_memory.*")
 
+# Section labels of the quarters, in crop_plan.QUARTERS order
+SECTION_NAMES = ["top-left", "top-right", "bottom-left", "bottom-right"]
+# CRAFT shrinks larger images to this side (easyocr's canvas_size); bigger ones are tiled
+DETECT_CANVAS_SIZE = 2560
+# Line crops per recognizer batch in detect-once mode
+RECOGNIZE_BATCH_SIZE = 16
+
 
 class OCRResult(TypedDict, total=False):
     bbox: List[List[int]]
@@ -44,6 +61,95 @@ class EasyOCROptions(TypedDict, total=False):
     verbose: bool
     quantize: bool
     cudnn_benchmark: bool
+    backend: str  # "eager" (default), "torchscript" or "onnx", see easyocr_backend
+    backend_cache_dir: str
+
+
+_readers: dict = {}
+
+
+def get_reader(
+    languages: Optional[List[str]] = None,
+    backend: str = "eager",
+    backend_cache_dir: Optional[str] = None,
+    **reader_kwargs: Any,
+):
+    """
+    Return a cached ``easyocr.Reader`` for ``languages`` and ``reader_kwargs``.
+
+    Loading the detector and recognizer takes seconds and hundreds of MB, so
+    every call with the same settings shares one Reader. A Reader loaded before
+    the process forks (see ``worker_pool.PreforkPool``) is shared copy-on-write
+    by the workers.
+
+    ``backend`` ``torchscript`` or ``onnx`` swaps the detector and recognizer for
+    optimized CPU exports, cached in ``backend_cache_dir`` (see
+    ``easyocr_backend.optimize_reader``).
+    """
+    languages = list(languages or ["en"])
+    settings = (
+        tuple(languages),
+        tuple(sorted((k, repr(v)) for k, v in reader_kwargs.items())),
+    )
+    key = (backend,) + settings
+    reader = _readers.get(key)
+    if reader is None:
+        # easyocr loads torch, so it is only imported when a Reader is needed
+        import easyocr
+
+        if backend != "eager":
+            from src.ocr.easyocr_backend import (
+                cache_key,
+                optimize_reader,
+                reader_kwargs_for,
+            )
+
+            reader_kwargs = reader_kwargs_for(backend, reader_kwargs)
+        with span("easyocr.load_reader", backend=backend):
+            reader = easyocr.Reader(languages, **reader_kwargs)
+            if backend != "eager":
+                reader = optimize_reader(
+                    reader, backend, cache_key(backend, settings), backend_cache_dir
+                )
+        _readers[key] = reader
+    return reader
+
+
+def _reader_for(easyocr_options: Optional[EasyOCROptions]):
+    """The cached Reader for ``easyocr_options``, with torch within this worker's share."""
+    # Prepare Reader kwargs from EasyOCROptions
+    reader_kwargs = (
+        easyocr_options.get("reader_kwargs", {}).copy() if easyocr_options else {}
+    )
+    # Map all supported Reader params from easyocr_options if present
+    if easyocr_options:
+        for k in [
+            "gpu",
+            "model_storage_directory",
+            "user_network_directory",
+            "detect_network",
+            "recog_network",
+            "download_enabled",
+            "detector",
+            "recognizer",
+            "verbose",
+            "quantize",
+            "cudnn_benchmark",
+        ]:
+            if k in easyocr_options:
+                reader_kwargs[k] = easyocr_options[k]
+    reader_langs = (
+        easyocr_options.get("languages", ["en"]) if easyocr_options else ["en"]
+    )
+    reader = get_reader(
+        reader_langs,
+        backend=(easyocr_options or {}).get("backend", "eager"),
+        backend_cache_dir=(easyocr_options or {}).get("backend_cache_dir"),
+        **reader_kwargs,
+    )
+    # Keep torch's threads within this worker's share
+    apply_budget()
+    return reader
 
 
 def extract_text_from_image(
@@ -63,44 +169,22 @@ def extract_text_from_image(
         List of OCRResult dictionaries.
     """
     try:
-        # Prepare Reader kwargs from EasyOCROptions
-        reader_kwargs = (
-            easyocr_options.get("reader_kwargs", {}).copy() if easyocr_options else {}
-        )
-        # Map all supported Reader params from easyocr_options if present
-        if easyocr_options:
-            for k in [
-                "gpu",
-                "model_storage_directory",
-                "user_network_directory",
-                "detect_network",
-                "recog_network",
-                "download_enabled",
-                "detector",
-                "recognizer",
-                "verbose",
-                "quantize",
-                "cudnn_benchmark",
-            ]:
-                if k in easyocr_options:
-                    reader_kwargs[k] = easyocr_options[k]
-        reader_langs = (
-            easyocr_options.get("languages", ["en"]) if easyocr_options else ["en"]
-        )
-        reader = easyocr.Reader(reader_langs, **reader_kwargs)
+        reader = _reader_for(easyocr_options)
 
         # Use options for readtext if provided
         readtext_kwargs = (
             easyocr_options.get("readtext_kwargs", {}) if easyocr_options else {}
         )
 
-        if isinstance(image, str):
-            # File path
-            result = reader.readtext(image, **readtext_kwargs)
-        else:
-            # PIL Image object - convert to array
-            img_array = np.array(image)
-            result = reader.readtext(img_array, **readtext_kwargs)
+        with span("easyocr.readtext", section=section_name or "") as s:
+            if isinstance(image, str):
+                # File path
+                result = reader.readtext(image, **readtext_kwargs)
+            else:
+                # PIL Image or ndarray (crop views are passed through uncopied)
+                img_array = np.asarray(image)
+                result = reader.readtext(img_array, **readtext_kwargs)
+            s.set_attribute("elements", len(result))
 
         if section_name:
             safe_print(f"✅\tFound {len(result)} text elements in {section_name}")
@@ -129,8 +213,169 @@ def extract_text_from_image(
         return []
 
 
-def main(voucher_path):
-    """Main function to extract text from voucher image"""
+def section_for_box(bbox: List[List[int]], width: int, height: int) -> str:
+    """The quarter (see ``SECTION_NAMES``) holding the center of ``bbox``."""
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    cx = (min(xs) + max(xs)) / 2 / max(1, width)
+    cy = (min(ys) + max(ys)) / 2 / max(1, height)
+    for name, spec in zip(SECTION_NAMES, QUARTERS):
+        x0, y0, x1, y1 = spec.box
+        if x0 <= cx < x1 and y0 <= cy < y1:
+            return name
+    return SECTION_NAMES[-1]
+
+
+def _kwargs_for(method, kwargs: dict) -> dict:
+    """The subset of readtext-style ``kwargs`` that ``method`` accepts."""
+    accepted = inspect.signature(method).parameters
+    return {k: v for k, v in kwargs.items() if k in accepted}
+
+
+def detect_lines(
+    reader,
+    image: np.ndarray,
+    tile_size: Optional[int] = None,
+    detect_kwargs: Optional[dict] = None,
+) -> Tuple[List[List[int]], List[List[List[int]]]]:
+    """
+    Run CRAFT once over ``image`` and return its text lines.
+
+    EasyOCR groups the detected words into lines itself; the result is its
+    ``horizontal_list`` (``[x_min, x_max, y_min, y_max]`` boxes) and
+    ``free_list`` (four-point polygons for slanted lines), in image coordinates.
+
+    CRAFT scales images down to ``DETECT_CANVAS_SIZE``, which loses small text on
+    large scans, so larger images (or any image when ``tile_size`` is given) are
+    detected tile by tile and the boxes found twice in the overlaps are dropped.
+
+    Args:
+        reader: An ``easyocr.Reader``.
+        image (np.ndarray): RGB or grayscale image.
+        tile_size (Optional[int]): Tile side in pixels; default sized for
+            ``TARGET_CHAR_HEIGHT["easyocr"]`` when the image needs tiling.
+        detect_kwargs (Optional[dict]): Extra ``Reader.detect`` arguments.
+
+    Returns:
+        Tuple: ``(horizontal_list, free_list)``.
+    """
+    detect_kwargs = detect_kwargs or {}
+    height, width = image.shape[:2]
+    if tile_size is None and max(width, height) <= DETECT_CANVAS_SIZE:
+        with span("easyocr.detect"):
+            horizontal, free = reader.detect(image, **detect_kwargs)
+        return [list(map(int, b)) for b in horizontal[0]], [
+            [[int(x), int(y)] for x, y in poly] for poly in free[0]
+        ]
+
+    default_size, overlap = tile_geometry(TARGET_CHAR_HEIGHT["easyocr"])
+    tile_size = tile_size or default_size
+    overlap = min(overlap, tile_size // 2)
+    found: List[Tuple[Box, Tile]] = []
+    lines: List[Tuple[str, Any]] = []
+    for tile in tile_plan(width, height, tile_size, overlap):
+        with span("easyocr.detect", tile=tile.name):
+            horizontal, free = reader.detect(tile.view(image), **detect_kwargs)
+        for x_min, x_max, y_min, y_max in horizontal[0]:
+            box = tile.to_global((int(x_min), int(y_min), int(x_max), int(y_max)))
+            found.append((box, tile))
+            lines.append(("horizontal", [box[0], box[2], box[1], box[3]]))
+        for poly in free[0]:
+            points = [[int(x) + tile.x0, int(y) + tile.y0] for x, y in poly]
+            xs = [x for x, _ in points]
+            ys = [y for _, y in points]
+            found.append(((min(xs), min(ys), max(xs), max(ys)), tile))
+            lines.append(("free", points))
+    keep = merge_tile_boxes(found, width, height)
+    horizontal_list = [lines[i][1] for i in keep if lines[i][0] == "horizontal"]
+    free_list = [lines[i][1] for i in keep if lines[i][0] == "free"]
+    return horizontal_list, free_list
+
+
+def extract_text_detect_once(
+    image: "np.ndarray | Image.Image",
+    easyocr_options: Optional[EasyOCROptions] = None,
+    tile_size: Optional[int] = None,
+) -> List[OCRResult]:
+    """
+    Detect text once on the full image and recognize only the line crops.
+
+    Replaces reading the full image and each quarter separately: detection runs
+    once, every detected line is recognized in a single ``Reader.recognize``
+    call, and each result's section is the quarter holding its box.
+
+    Args:
+        image: Numpy array or PIL Image (RGB or grayscale).
+        easyocr_options: Optional EasyOCROptions; ``readtext_kwargs`` are split
+            between ``Reader.detect`` and ``Reader.recognize``.
+        tile_size: Detect in tiles of this size (see ``detect_lines``).
+
+    Returns:
+        List of OCRResult dictionaries with ``section`` set.
+    """
+    try:
+        reader = _reader_for(easyocr_options)
+        readtext_kwargs = (
+            easyocr_options.get("readtext_kwargs", {}) if easyocr_options else {}
+        )
+        img_array = np.asarray(image)
+        height, width = img_array.shape[:2]
+        horizontal_list, free_list = detect_lines(
+            reader,
+            img_array,
+            tile_size,
+            _kwargs_for(reader.detect, readtext_kwargs),
+        )
+        count = len(horizontal_list) + len(free_list)
+        if not count:
+            safe_print("✅\tFound 0 text elements")
+            return []
+
+        recognize_kwargs = {
+            "batch_size": max(2, min(count, RECOGNIZE_BATCH_SIZE)),
+            **_kwargs_for(reader.recognize, readtext_kwargs),
+            "detail": 1,
+        }
+        with span("easyocr.recognize", lines=count) as s:
+            result = reader.recognize(
+                img_array,
+                horizontal_list=horizontal_list,
+                free_list=free_list,
+                **recognize_kwargs,
+            )
+            s.set_attribute("elements", len(result))
+        safe_print(f"✅\tFound {len(result)} text elements in {count} lines")
+
+        return [
+            {
+                "bbox": [[int(coord) for coord in point] for point in bbox],
+                "text": text,
+                "confidence": float(conf),
+                "section": section_for_box(bbox, width, height),
+            }
+            for bbox, text, conf in result
+        ]
+
+    except Exception as e:
+        safe_print(f"❌\tError reading text: {str(e)}")
+        return []
+
+
+def main(
+    voucher_path,
+    chain: str = "none",
+    backend: str = "eager",
+    detect_once: bool = False,
+    detect_tile_size: Optional[int] = None,
+):
+    """
+    Main function to extract text from voucher image.
+
+    With ``detect_once`` text is detected a single time and the quarter
+    sections are assigned from the box positions (see
+    ``extract_text_detect_once``) instead of OCRing every quarter again.
+    """
+    options: EasyOCROptions = {"backend": backend}
 
     if not voucher_path:
         voucher_path = get_relative_path("test/fixtures/voucher-fix.jpeg")
@@ -153,29 +398,46 @@ def main(voucher_path):
         safe_print(f"❌\tError initializing database: {str(e)}")
         return
 
-    # Split image into quarters
-    safe_print("✂️\tSplitting image into quarters...")
-    original_img, quarters, _ = split_image(voucher_path)
-
-    if original_img is None:
+    try:
+        image = preprocess(read_image(voucher_path), chain)["image"]
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    except (OSError, ValueError) as e:
+        safe_print(f"❌\tError loading image: {str(e)}")
         return
 
-    safe_print(f"✅\tImage split into {len(quarters)} quarters")
-
     # Extract text from all sections
     all_results = []
 
-    # Extract from original full image
-    safe_print("🔍\tExtracting text from full image...")
-    full_results = extract_text_from_image(voucher_path, "full")
-    all_results.extend(full_results)
-
-    # Extract from each quarter
-    quarter_names = ["top-left", "top-right", "bottom-left", "bottom-right"]
-    for i, quarter in enumerate(quarters):
-        safe_print(f"🔍\tExtracting text from {quarter_names[i]} quarter...")
-        quarter_results = extract_text_from_image(quarter, quarter_names[i])
-        all_results.extend(quarter_results)
+    if detect_once:
+        safe_print("🔍\tDetecting text once on the full image...")
+        results = extract_text_detect_once(image, options, detect_tile_size)
+        # The full image holds every line; the quarters hold the lines centered in them
+        all_results.extend({**item, "section": "full"} for item in results)
+        for name in SECTION_NAMES:
+            all_results.extend(item for item in results if item["section"] == name)
+    else:
+        # Split image into quarters (views of one RGB decode; EasyOCR reads arrays as RGB)
+        safe_print("✂️\tSplitting image into quarters...")
+        original_img, quarters, _ = split_image(image)
+
+        if original_img is None:
+            return
+
+        safe_print(f"✅\tImage split into {len(quarters)} quarters")
+
+        # Extract from original full image
+        safe_print("🔍\tExtracting text from full image...")
+        full_results = extract_text_from_image(original_img, "full", options)
+        all_results.extend(full_results)
+
+        # Extract from each quarter
+        for i, quarter in enumerate(quarters):
+            safe_print(f"🔍\tExtracting text from {SECTION_NAMES[i]} quarter...")
+            quarter_results = extract_text_from_image(
+                quarter, SECTION_NAMES[i], options
+            )
+            all_results.extend(quarter_results)
 
     # Group and merge text by section
     safe_print(f"📝\tAll extracted text ({len(all_results)} total items):")
@@ -188,21 +450,21 @@ def main(voucher_path):
         sections[section].append(item["text"])
 
     # Print merged text for each section and save vouchers
+    sink = get_voucher_sink()
     for section, texts in sections.items():
         merged_text = " ".join(texts)
         # Use extract_voucher_codes instead of local regex
         matches = extract_voucher_codes(merged_text)
+        CODES_FOUND.observe(len(matches), stage=f"easyocr.{section}")
 
         print(f"[{section}] {merged_text}")
         if matches:
             safe_print(f"🎯\tFound voucher codes in {section}: {matches}")
 
-            # Save each found voucher to database
-            for voucher_code in matches:
-                # Clean up the voucher code (remove extra spaces)
-                clean_code = re.sub(r"\s+", "", voucher_code)
-                store_voucher_in_database(db_helper, clean_code, voucher_path)
+            # Queue the section's codes; all sections are written in one transaction
+            sink.submit(voucher_path, [re.sub(r"\s+", "", c) for c in matches])
 
+    sink.flush()
     safe_print("🎉\tExtraction completed successfully!")
 
 
@@ -216,19 +478,44 @@ if __name__ == "__main__":
         default="test/fixtures/voucher-fix.jpeg",
         help="Path to the voucher image file (default: test/fixtures/voucher-fix.jpeg)",
     )
-
-    args = parser.parse_args()
-    main(args.file)
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(
-        description="Extract text from voucher images using OCR"
+    parser.add_argument(
+        "-p",
+        "--preprocess",
+        default="none",
+        choices=sorted(CHAINS),
+        help="Preprocessing chain to run before OCR",
     )
     parser.add_argument(
-        "-f",
-        "--file",
-        default="test/fixtures/voucher-fix.jpeg",
-        help="Path to the voucher image file (default: test/fixtures/voucher-fix.jpeg)",
+        "-P",
+        "--profile",
+        default=None,
+        help="Named OCR profile from the tuner; its chain replaces --preprocess",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        default="eager",
+        choices=["eager", "torchscript", "onnx"],
+        help="Inference backend for the detector and recognizer",
+    )
+    parser.add_argument(
+        "--detect-once",
+        action="store_true",
+        help="Detect text once and label quarters from box positions",
+    )
+    parser.add_argument(
+        "--detect-tile-size",
+        type=int,
+        default=None,
+        help="Detect in tiles of this many pixels (default: only for large images)",
     )
 
     args = parser.parse_args()
-    main(args.file)
+    main(
+        args.file,
+        chain=load_profile(args.profile)["chain"] if args.profile else args.preprocess,
+        backend=args.backend,
+        detect_once=args.detect_once,
+        detect_tile_size=args.detect_tile_size,
+    )
+    flush_metrics()
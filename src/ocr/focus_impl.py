@@ -1,93 +1,87 @@
 import sys
 import os
-import easyocr
 from PIL import Image
 import cv2
-import numpy as np
-from proxy_hunter import write_file
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from src.database.VoucherDatabase import (
-    extract_voucher_codes,
-    get_database_instance,
-    safe_print,
-    store_voucher_in_database,
-)
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.database.voucher_sink import get_voucher_sink
 from src.utils.file import get_relative_path
-from src.ocr.image_utils import dewarp_image
-
-
-def preprocess_image_for_ocr(image_path: str) -> Image.Image:
+from src.ocr.crop_plan import FOCUS, iter_crops
+from src.ocr.crop_plan import save_crops as save_crop_images
+from src.ocr.decoders import read_image
+from src.ocr.easyocr_impl import get_reader
+from src.ocr.preprocess import preprocess
+from src.ocr.rescale import TARGET_CHAR_HEIGHT, decode_for_ocr
+from src.utils.metrics import CODES_FOUND, CROP_COUNT, flush_metrics
+from src.utils.thread_budget import apply_budget
+from src.utils.tracing import span, traced
+
+
+@traced("focus_easyocr.preprocess")
+def preprocess_image_for_ocr(image_path: str, chain: str = "focus") -> Image.Image:
     """
     Preprocess the image for better OCR results.
-    Steps: Upscale, grayscale, contrast, sharpening, thresholding, noise removal.
+    Steps: Rescale, then the ``focus`` chain: grayscale, contrast, sharpening,
+    thresholding, noise removal.
     """
-    img = cv2.imread(image_path)
-    if img is None:
+    try:
+        with open(image_path, "rb") as f:
+            data = f.read()
+    except OSError:
         raise FileNotFoundError(f"Could not load image at path: {image_path}")
 
-    # Upscale image for better OCR (2x)
-    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # Increase contrast using histogram equalization
-    gray = cv2.equalizeHist(gray)
-
-    # Sharpen image
-    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-    sharp = cv2.filter2D(gray, -1, kernel)
-
-    # Try Otsu's thresholding
-    _, thresh = cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Decode at the resolution where text is ~32px high instead of a fixed 2x upscale
+    img, _ = decode_for_ocr(data, TARGET_CHAR_HEIGHT["easyocr"])
+    if img is None:
+        raise FileNotFoundError(f"Could not load image at path: {image_path}")
 
-    # Remove noise
-    denoised = cv2.medianBlur(thresh, 3)
+    processed = preprocess(img, chain)["image"]
 
     # Convert back to PIL Image
-    pil_img = Image.fromarray(denoised)
-    return pil_img
+    if processed.ndim == 3:
+        processed = cv2.cvtColor(processed, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(processed)
 
 
-def focus_extract_text_from_image(image_path: str) -> str:
+def focus_extract_text_from_image(
+    image_path: str, save_crops: bool = False, chain: str = "dewarp"
+) -> str:
     """
     Split the image into halves and extract text from each part.
     :param image_path: Path to the image file.
+    :param save_crops: Also save each crop as a PNG under tmp/split.
+    :param chain: Preprocessing chain applied before cropping (see preprocess.CHAINS).
     :return: Extracted text from all parts.
     """
-    # img = preprocess_image_for_ocr(image_path)
-    # img = Image.open(image_path)
-    dewarp_result = dewarp_image(image_path)
-    if dewarp_result is None:
-        raise ValueError(f"dewarp_image returned None for image: {image_path}")
-    if isinstance(dewarp_result, tuple):
-        img = dewarp_result[0]
-    else:
-        img = dewarp_result
-    width, height = img.size
-    crops = [
-        ("full", img),
-        ("top_half", img.crop((0, 0, width, height // 2))),
-        ("bottom_half", img.crop((0, height // 2, width, height))),
-        ("left_half", img.crop((0, 0, width // 2, height))),
-        ("right_half", img.crop((width // 2, 0, width, height))),
-    ]
+    from proxy_hunter import write_file
 
-    reader = easyocr.Reader(["en"], gpu=False)
+    img = preprocess(read_image(image_path), chain)["image"]
+    # EasyOCR reads arrays as RGB
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    CROP_COUNT.observe(len(FOCUS), stage="focus_easyocr")
+
+    with span("focus_easyocr.load_reader"):
+        reader = get_reader(["en"], gpu=False)
+    # Keep torch's threads within this worker's share
+    apply_budget()
     all_text = []
-    for name, crop_img in crops:
-        crop_path = get_relative_path("tmp/split", f"{name}.png")
-        os.makedirs(os.path.dirname(crop_path), exist_ok=True)
-        crop_img.save(crop_path)
-        # Convert PIL Image to numpy array for EasyOCR
-        crop_np = np.array(crop_img)
-        result = reader.readtext(crop_np, detail=0)
+    if save_crops:
+        save_crop_images(img, FOCUS, "tmp/split", channel_order="RGB")
+    # Crops are views of the dewarped image; nothing is copied per region
+    for spec, crop_img in iter_crops(img, FOCUS):
+        name = spec.name
+        text_path = get_relative_path("tmp/split", f"{name}.txt")
+        os.makedirs(os.path.dirname(text_path), exist_ok=True)
+        with span("focus_easyocr.readtext", crop=name):
+            result = reader.readtext(crop_img, detail=0)
         text = "\n".join(str(r) for r in result if isinstance(r, str))
         if text:
             all_text.append(text)
-            write_file(crop_path.replace(".png", ".txt"), text)
+            write_file(text_path, text)
 
     return "\n".join(all_text)
 
@@ -96,12 +90,10 @@ if __name__ == "__main__":
     voucher_path = "test/fixtures/voucher-fix.jpeg"
     extract = focus_extract_text_from_image(voucher_path)
     result = extract_voucher_codes(extract)
-    try:
-        db_helper = get_database_instance()
-        safe_print("✅\tDatabase initialized successfully")
-    except Exception as e:
-        safe_print(f"❌\tError initializing database: {str(e)}")
+    CODES_FOUND.observe(len(result), stage="focus_easyocr")
     if result:
-        for code in result:
-            # safe_print(f"📜\tFound voucher code: {code}")
-            store_voucher_in_database(db_helper, code, voucher_path)
+        # All codes of the image in one transaction, written behind the OCR
+        sink = get_voucher_sink()
+        sink.submit(voucher_path, result)
+        sink.flush()
+    flush_metrics()
@@ -1,29 +1,47 @@
 import sys
 import os
-import pytesseract
-from PIL import Image
+import cv2
 import argparse
 from pathlib import Path
-from proxy_hunter import write_file
+from typing import Optional
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from src.database.VoucherDatabase import (
-    extract_voucher_codes,
-    safe_print,
-    storeVoucherJson,
-)
+from src.database.VoucherDatabase import extract_voucher_codes, safe_print
+from src.database.voucher_sink import get_voucher_sink
 from src.utils.file import get_relative_path
-from src.ocr.image_utils import detect_image_skew_angle, dewarp_image, is_image_upright
+from src.ocr.crop_plan import FOCUS, iter_crops
+from src.ocr.crop_plan import save_crops as save_crop_images
+from src.ocr.decoders import open_image_buffer, read_image
+from src.ocr.preprocess import CHAINS, Preprocessor, preprocess
+from src.ocr.rescale import decode_within_budget
+from src.ocr.tuner import load_profile, tesseract_options
+from src.utils.memory import memory_stage
+from src.utils.metrics import CODES_FOUND, CROP_COUNT, flush_metrics
+from src.utils.tracing import span
 import json
 
 
-def focus_extract_text_from_image(image_path: str) -> str:
+def focus_extract_text_from_image(
+    image_path: str,
+    save_crops: bool = False,
+    chain: str = "deskew_dewarp",
+    max_pixels: Optional[int] = None,
+    tesseract_config: str = "--psm 3 --oem 1",
+) -> str:
     """
     Split the image into halves and extract text from each part.
     :param image_path: Path to the image file.
+    :param save_crops: Also save each crop as a PNG under tmp/split.
+    :param chain: Preprocessing chain applied before cropping (see preprocess.CHAINS).
+    :param max_pixels: Memory-bounded mode: decode gray within this many pixels
+        and keep every preprocessing step within it.
+    :param tesseract_config: Tesseract options (page segmentation and engine modes).
     :return: Extracted text from all parts.
     """
+    import pytesseract
+    from proxy_hunter import write_file
+
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Image path does not exist: {image_path}")
     elif os.path.exists(os.path.join(os.getcwd(), image_path)):
@@ -32,47 +50,36 @@ def focus_extract_text_from_image(image_path: str) -> str:
     elif os.path.exists(os.path.join(Path.cwd(), image_path)):
         # fix for relative paths
         image_path = os.path.join(Path.cwd(), image_path)
-    # Detect if the image is upright
-    if not is_image_upright(image_path):
-        # Rotate the image to make it upright
-        safe_print("Image is not upright, correcting...")
-        angle = detect_image_skew_angle(image_path)
-        safe_print(f"Detected skew angle: {angle} degrees")
-        if angle is not None:
-            img = Image.open(image_path)
-            img = img.rotate(angle, expand=True)
-            basename = os.path.basename(image_path)
-            image_path = get_relative_path(f"tmp/fixed/{basename}")
-            os.makedirs(os.path.dirname(image_path), exist_ok=True)
-            img.save(image_path)
-            safe_print(f"Corrected image saved to: {image_path}")
-    dewarp_result = dewarp_image(image_path)
-    if dewarp_result is None:
-        img = Image.open(image_path)
-    elif isinstance(dewarp_result, tuple):
-        img = dewarp_result[0]
+    # Decode once; the default chain deskews (when tilted) and dewarps the array
+    if max_pixels:
+        with memory_stage("decode"), open_image_buffer(image_path) as buf:
+            image = decode_within_budget(buf, max_pixels, gray=True)
+        with memory_stage("preprocess"):
+            result = Preprocessor(memo_size=0).run(image, chain, max_pixels=max_pixels)
+            image = result["image"]
     else:
-        img = dewarp_result
-    width, height = img.size
-    crops = [
-        ("full", img),
-        ("top_half", img.crop((0, 0, width, height // 2))),
-        ("bottom_half", img.crop((0, height // 2, width, height))),
-        ("left_half", img.crop((0, 0, width // 2, height))),
-        ("right_half", img.crop((width // 2, 0, width, height))),
-    ]
+        image = preprocess(read_image(image_path), chain)["image"]
+    # pytesseract reads arrays as RGB
+    img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image.ndim == 3 else image
+
+    CROP_COUNT.observe(len(FOCUS), stage="focus_pytesseract")
 
     all_text = []
-    for name, crop_img in crops:
-        crop_path = get_relative_path("tmp/split", f"{name}.png")
-        os.makedirs(os.path.dirname(crop_path), exist_ok=True)
-        crop_img.save(crop_path)
-        text = pytesseract.image_to_string(
-            crop_img, lang="eng", config="--psm 3 --oem 1"
-        )
-        if text:
-            all_text.append(text)
-            write_file(crop_path.replace(".png", ".txt"), text)
+    if save_crops:
+        save_crop_images(img, FOCUS, "tmp/split", channel_order="RGB")
+    with memory_stage("ocr"):
+        # Crops are views of the dewarped image; nothing is copied per region
+        for spec, crop_img in iter_crops(img, FOCUS):
+            name = spec.name
+            text_path = get_relative_path("tmp/split", f"{name}.txt")
+            os.makedirs(os.path.dirname(text_path), exist_ok=True)
+            with span("focus_pytesseract.ocr", crop=name):
+                text = pytesseract.image_to_string(
+                    crop_img, lang="eng", config=tesseract_config
+                )
+            if text:
+                all_text.append(text)
+                write_file(text_path, text)
 
     return "\n".join(all_text)
 
@@ -87,12 +94,35 @@ if __name__ == "__main__":
         default=get_relative_path("test/fixtures/voucher.jpeg"),
         help="Path to the voucher image file",
     )
+    parser.add_argument(
+        "-p",
+        "--preprocess",
+        default="deskew_dewarp",
+        choices=sorted(CHAINS),
+        help="Preprocessing chain to run before OCR",
+    )
+    parser.add_argument(
+        "-P",
+        "--profile",
+        default=None,
+        help="Named OCR profile from the tuner; its chain and Tesseract modes "
+        "replace --preprocess and the defaults",
+    )
     args = parser.parse_args()
     voucher_path = args.file
-    extract = focus_extract_text_from_image(voucher_path)
+    options = {"chain": args.preprocess}
+    if args.profile:
+        config = load_profile(args.profile)
+        options["chain"] = config["chain"]
+        if config["engine"] == "tesseract":
+            options["tesseract_config"] = tesseract_options(config)
+    extract = focus_extract_text_from_image(voucher_path, **options)
     result = extract_voucher_codes(extract)
+    CODES_FOUND.observe(len(result), stage="focus_pytesseract")
     if isinstance(result, list):
         safe_print("\n\n" + json.dumps(result, indent=2, ensure_ascii=False))
-        for code in result:
-            # safe_print(f"📜\tFound voucher code: {code}")
-            storeVoucherJson(code, voucher_path)
+        # One JSON load and save for all the codes, written behind the OCR
+        sink = get_voucher_sink("json")
+        sink.submit(voucher_path, result)
+        sink.flush()
+    flush_metrics()
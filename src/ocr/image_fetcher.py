@@ -0,0 +1,329 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.file import get_relative_path
+from src.utils.metrics import CACHE_REQUESTS
+from src.utils.tracing import span
+
+if TYPE_CHECKING:
+    # requests is imported on the first download, not when the module loads
+    import requests
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+# Largest image body accepted from a URL (bytes)
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+# Size budget of the raw-bytes download cache (bytes)
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024
+DEFAULT_CACHE_DIR = "tmp/downloaded_images"
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when a download exceeds the configured ``max_bytes``."""
+
+
+def create_session(pool_size: int = 16, retries: int = 2) -> "requests.Session":
+    """
+    Create a ``requests.Session`` with a pooled adapter and retry on transient errors.
+
+    Args:
+        pool_size (int): Keep-alive connections kept per host.
+        retries (int): Retries on connection errors and 502/503/504 responses.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "node-ocr-app/1.0 (+image fetcher)"
+    return session
+
+
+class RawBytesCache:
+    """
+    Download cache storing the original response bytes, keyed by URL.
+
+    Each entry is ``<sha256(url)>.bin`` plus a ``.json`` sidecar holding the URL,
+    validators (ETag/Last-Modified), size and last access time. Entries are evicted
+    least-recently-used first once the total size exceeds ``max_bytes``.
+
+    Args:
+        directory (str): Cache directory (created if missing).
+        max_bytes (int): Size budget for cached bodies.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BUDGET):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, self.key(url))
+        return base + ".bin", base + ".json"
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the metadata of a cached entry, or None when not cached."""
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not os.path.exists(data_path):
+            return None
+        meta["path"] = data_path
+        return meta
+
+    def read(self, url: str) -> Optional[bytes]:
+        data_path, _ = self._paths(url)
+        try:
+            with open(data_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def touch(self, url: str, **updates) -> None:
+        """Mark an entry as used now (and optionally update its validators)."""
+        meta = self.get(url)
+        if meta is None:
+            return
+        meta.pop("path", None)
+        meta.update(updates, last_access=time.time())
+        _, meta_path = self._paths(url)
+        self._write_json(meta_path, meta)
+
+    def put(
+        self,
+        url: str,
+        data: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """Store ``data`` for ``url`` and evict older entries if over budget."""
+        data_path, meta_path = self._paths(url)
+        tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, data_path)
+        now = time.time()
+        self._write_json(
+            meta_path,
+            {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "content_type": content_type,
+                "size": len(data),
+                "fetched_at": now,
+                "validated_at": now,
+                "last_access": now,
+            },
+        )
+        self.evict()
+        return data_path
+
+    def evict(self) -> int:
+        """
+        Remove least-recently-used entries until the cache fits its budget.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                size = int(meta.get("size") or 0)
+                total += size
+                entries.append((meta.get("last_access", 0), size, entry.path))
+            removed = 0
+            for _, size, meta_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (meta_path[: -len(".json")] + ".bin", meta_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                removed += 1
+            return removed
+
+    @staticmethod
+    def _write_json(path: str, data: dict) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+class ImageFetcher:
+    """
+    Fetch image bytes over HTTP(S) with a pooled session, timeouts and a size cap.
+
+    Responses are streamed and aborted as soon as they exceed ``max_bytes``. The
+    original bytes are cached by URL and revalidated with ``If-None-Match`` /
+    ``If-Modified-Since`` once older than ``max_age`` seconds; when revalidation
+    fails on a network error the cached copy is served instead.
+
+    Args:
+        cache (Optional[RawBytesCache]): Download cache, or None to disable caching.
+        session (Optional[requests.Session]): Session to use (default: shared pool).
+        connect_timeout (float): Seconds to wait for the TCP/TLS connection.
+        read_timeout (float): Seconds to wait between received bytes.
+        max_bytes (int): Largest accepted response body.
+        max_age (float): Seconds a cached entry is trusted without revalidation.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[RawBytesCache] = None,
+        session: Optional["requests.Session"] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = 0.0,
+    ):
+        self.cache = cache
+        self.session = session or get_shared_session()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Return the body of ``url``, from the cache when it is still valid.
+
+        Raises:
+            ImageTooLargeError: If the body is larger than ``max_bytes``.
+            requests.RequestException: On network or HTTP errors without a cached copy.
+        """
+        import requests
+
+        entry = self.cache.get(url) if self.cache else None
+        if entry and time.time() - entry.get("validated_at", 0) < self.max_age:
+            data = self.cache.read(url)
+            if data is not None:
+                CACHE_REQUESTS.inc(cache="download", result="hit")
+                self.cache.touch(url)
+                return data
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        with span("fetch.download", url=url, conditional=bool(headers)) as s:
+            try:
+                response = self.session.get(
+                    url, headers=headers, stream=True, timeout=self.timeout
+                )
+            except requests.RequestException:
+                stale = self.cache.read(url) if entry else None
+                if stale is None:
+                    raise
+                CACHE_REQUESTS.inc(cache="download", result="stale")
+                s.set_attribute("stale", True)
+                return stale
+            with response:
+                s.set_attribute("status", response.status_code)
+                if response.status_code == 304 and entry:
+                    data = self.cache.read(url)
+                    if data is not None:
+                        CACHE_REQUESTS.inc(cache="download", result="revalidated")
+                        self.cache.touch(url, validated_at=time.time())
+                        return data
+                response.raise_for_status()
+                data = self._read_body(response, url)
+                s.set_attribute("bytes", len(data))
+
+        CACHE_REQUESTS.inc(cache="download", result="miss")
+        if self.cache:
+            self.cache.put(
+                url,
+                data,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                content_type=response.headers.get("Content-Type"),
+            )
+        return data
+
+    def _read_body(self, response: "requests.Response", url: str) -> bytes:
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ImageTooLargeError(
+                f"Image at {url} is {declared} bytes, limit is {self.max_bytes}"
+            )
+        buf = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            buf += chunk
+            if len(buf) > self.max_bytes:
+                raise ImageTooLargeError(
+                    f"Image at {url} exceeds the {self.max_bytes} byte limit"
+                )
+        return bytes(buf)
+
+
+_shared_session: Optional["requests.Session"] = None
+_shared_lock = threading.Lock()
+_fetchers: dict = {}
+
+
+def get_shared_session() -> "requests.Session":
+    """Return the process-wide pooled session, creating it on first use."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def get_image_fetcher(cache_dir: str = DEFAULT_CACHE_DIR) -> ImageFetcher:
+    """Return a shared ``ImageFetcher`` caching into ``cache_dir``."""
+    directory = get_relative_path(cache_dir)
+    with _shared_lock:
+        fetcher = _fetchers.get(directory)
+        if fetcher is None:
+            fetcher = ImageFetcher(cache=RawBytesCache(directory))
+            _fetchers[directory] = fetcher
+        return fetcher
+
+
+def fetch_image_bytes(url: str, cache_dir: str = DEFAULT_CACHE_DIR) -> bytes:
+    """Download ``url`` through the shared fetcher (see ``ImageFetcher.fetch``)."""
+    return get_image_fetcher(cache_dir).fetch(url)
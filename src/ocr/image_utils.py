@@ -4,13 +4,18 @@ import sys
 from PIL import Image
 import cv2
 import numpy as np
-from typing import Union
+from typing import Optional, Tuple, Union
 import io
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from src.database.VoucherDatabase import safe_print
+from src.ocr.crop_plan import crop_plan, iter_crops, save_crops
+from src.ocr.decoders import load_image, read_image
+from src.ocr.orientation import orientation_specs
+from src.utils.console import safe_print
 from src.utils.file import get_relative_path
+from src.utils.metrics import CROP_COUNT
+from src.utils.tracing import traced
 
 
 def unique_hash(text_or_image: Union[str, Image.Image]) -> str:
@@ -27,92 +32,54 @@ def unique_hash(text_or_image: Union[str, Image.Image]) -> str:
     return hashlib.md5(data).hexdigest()[:5]
 
 
+def _as_array(
+    image: Union[str, Image.Image, np.ndarray],
+) -> tuple[np.ndarray, str, str]:
+    """Return ``(pixels, image_path, channel_order)`` without converting color."""
+    if isinstance(image, str):
+        return read_image(image), image, "BGR"
+    if isinstance(image, Image.Image):
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGB")
+        return np.asarray(image), getattr(image, "filename", "in_memory_image"), "RGB"
+    if isinstance(image, np.ndarray):
+        return image, "ndarray_input", "BGR"
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+@traced("image_utils.split_image")
 def split_image(
-    image: Union[str, Image.Image],
+    image: Union[str, Image.Image, np.ndarray],
     mode: str = "quarters",  # "quarters" (default) or "halves"
     output_dir: str = "tmp/crop",
-) -> tuple[Image.Image | None, list[Image.Image], list[str]]:
+    save: bool = False,
+) -> tuple[np.ndarray | None, list[np.ndarray], list[str]]:
     """
-    Split image (from path or PIL.Image) into 4 quarters or 2 left/right halves.
-    Saves them to tmp, and returns list of image objects and file paths.
+    Split image (from path, PIL.Image or ndarray) into 4 quarters or 4 halves.
+
+    The splits are ndarray views of the source (see ``crop_plan``), in its color
+    order: BGR for paths and arrays, RGB for PIL images. They are only written
+    to ``<output_dir>/<hash>/`` when ``save`` is True.
     mode: "quarters" (default) or "halves"
     """
     try:
-        # Accept either a file path or a PIL Image object
-        if isinstance(image, str):
-            img = Image.open(image)
-            image_path = image
-        elif isinstance(image, Image.Image):
-            img = image
-            image_path = getattr(img, "filename", "in_memory_image")
-        else:
+        if mode not in ("quarters", "halves"):
+            safe_print(f"❌\tUnknown split mode: {mode}")
+            return None, [], []
+        try:
+            img, image_path, channel_order = _as_array(image)
+        except TypeError:
             safe_print("❌\tInvalid input type for split_image.")
             return None, [], []
 
-        width, height = img.size
-
-        splits = []
+        specs = crop_plan(mode)
+        splits = [view for _, view in iter_crops(img, specs)]
         split_paths = []
+        if save:
+            hash_dir = get_relative_path(output_dir, unique_hash(image_path))
+            split_paths = save_crops(img, specs, hash_dir, channel_order)
 
-        hash_dir = get_relative_path(output_dir, unique_hash(image_path))
-        os.makedirs(hash_dir, exist_ok=True)
-
-        if mode == "halves":
-            # Left half
-            left = img.crop((0, 0, width // 2, height))
-            left_path = get_relative_path(hash_dir, "half_left.png")
-            left.save(left_path)
-            splits.append(left)
-            split_paths.append(left_path)
-            # Right half
-            right = img.crop((width // 2, 0, width, height))
-            right_path = get_relative_path(hash_dir, "half_right.png")
-            right.save(right_path)
-            splits.append(right)
-            split_paths.append(right_path)
-            # Top half
-            top = img.crop((0, 0, width, height // 2))
-            top_path = get_relative_path(hash_dir, "half_top.png")
-            top.save(top_path)
-            splits.append(top)
-            split_paths.append(top_path)
-            # Bottom half
-            bottom = img.crop((0, height // 2, width, height))
-            bottom_path = get_relative_path(hash_dir, "half_bottom.png")
-            bottom.save(bottom_path)
-            splits.append(bottom)
-            split_paths.append(bottom_path)
-        elif mode == "quarters":
-            mid_width = width // 2
-            mid_height = height // 2
-            # Top-left quarter
-            q1 = img.crop((0, 0, mid_width, mid_height))
-            q1_path = get_relative_path(hash_dir, "quarter_1.png")
-            q1.save(q1_path)
-            splits.append(q1)
-            split_paths.append(q1_path)
-            # Top-right quarter
-            q2 = img.crop((mid_width, 0, width, mid_height))
-            q2_path = get_relative_path(hash_dir, "quarter_2.png")
-            q2.save(q2_path)
-            splits.append(q2)
-            split_paths.append(q2_path)
-            # Bottom-left quarter
-            q3 = img.crop((0, mid_height, mid_width, height))
-            q3_path = get_relative_path(hash_dir, "quarter_3.png")
-            q3.save(q3_path)
-            splits.append(q3)
-            split_paths.append(q3_path)
-            # Bottom-right quarter
-            q4 = img.crop((mid_width, mid_height, width, height))
-            q4_path = get_relative_path(hash_dir, "quarter_4.png")
-            q4.save(q4_path)
-            splits.append(q4)
-            split_paths.append(q4_path)
-        else:
-            safe_print(f"❌\tUnknown split mode: {mode}")
-            return None, [], []
-
+        CROP_COUNT.observe(len(splits), stage=f"split_{mode}")
         return img, splits, split_paths
 
     except Exception as e:
@@ -120,21 +87,208 @@ def split_image(
         return None, [], []
 
 
+# Longest side of the pyramid level used to find the document outline
+DEWARP_DETECT_MAX_SIDE = 800
+
+
+def _to_gray(image: np.ndarray, channel_order: str = "BGR") -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        code = cv2.COLOR_BGRA2GRAY if channel_order == "BGR" else cv2.COLOR_RGBA2GRAY
+    else:
+        code = cv2.COLOR_BGR2GRAY if channel_order == "BGR" else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(image, code)
+
+
+def _order_corners(pts: np.ndarray) -> np.ndarray:
+    """Order 4 points as top-left, top-right, bottom-right, bottom-left."""
+    rect = np.zeros((4, 2), dtype="float32")
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)]
+    rect[2] = pts[np.argmax(s)]
+    diff = np.diff(pts, axis=1)
+    rect[1] = pts[np.argmin(diff)]
+    rect[3] = pts[np.argmax(diff)]
+    return rect
+
+
+def _refine_corners(
+    image: np.ndarray, corners: np.ndarray, radius: int, channel_order: str
+) -> np.ndarray:
+    """Sub-pixel refine ``corners`` on small full-resolution patches around each."""
+    height, width = image.shape[:2]
+    refined = corners.copy()
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.05)
+    for i, (x, y) in enumerate(corners):
+        x0, y0 = max(int(x) - 2 * radius, 0), max(int(y) - 2 * radius, 0)
+        x1, y1 = min(int(x) + 2 * radius + 1, width), min(
+            int(y) + 2 * radius + 1, height
+        )
+        if x1 - x0 < 2 * radius + 5 or y1 - y0 < 2 * radius + 5:
+            continue
+        patch = _to_gray(image[y0:y1, x0:x1], channel_order).astype(np.float32)
+        point = np.array([[[x - x0, y - y0]]], dtype=np.float32)
+        try:
+            cv2.cornerSubPix(patch, point, (radius, radius), (-1, -1), criteria)
+        except cv2.error:
+            continue
+        # Keep the coarse corner if refinement wandered off the patch
+        if np.all(np.abs(point[0, 0] - (x - x0, y - y0)) <= radius):
+            refined[i] = point[0, 0] + (x0, y0)
+    return refined
+
+
+def detect_document_quad(
+    image: np.ndarray,
+    detect_max_side: int = DEWARP_DETECT_MAX_SIDE,
+    channel_order: str = "BGR",
+    debug_name: Optional[str] = None,
+) -> Optional[np.ndarray]:
+    """
+    Find the document outline in ``image``.
+
+    Thresholding and contour search run on a pyramid level whose longest side is
+    at most ``detect_max_side``; the four corners are then refined on small
+    full-resolution patches, so the cost does not grow with camera megapixels.
+
+    Args:
+        image (np.ndarray): Gray, BGR or RGB image.
+        detect_max_side (int): Longest side of the detection level.
+        channel_order (str): ``BGR`` or ``RGB`` for color input.
+        debug_name (Optional[str]): When set, threshold and contour images are
+            written to ``tmp/dewarp_debug/<debug_name>_*.png``.
+
+    Returns:
+        Optional[np.ndarray]: ``(4, 2)`` float32 corners (TL, TR, BR, BL) in
+        full-resolution pixels, or None when no quadrilateral is found.
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, detect_max_side / max(height, width))
+    level = image
+    while level.shape[0] * 0.5 >= height * scale and level.shape[1] > 1:
+        level = cv2.pyrDown(level)
+    if max(level.shape[:2]) > detect_max_side:
+        level = cv2.resize(
+            level,
+            (round(width * scale), round(height * scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    level_scale = level.shape[1] / width
+    gray = _to_gray(level, channel_order)
+
+    # Use adaptive thresholding for better results
+    thresh = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 21, 15
+    )
+    debug_dir = get_relative_path("tmp", "dewarp_debug")
+    if debug_name:
+        os.makedirs(debug_dir, exist_ok=True)
+        cv2.imwrite(get_relative_path(debug_dir, f"{debug_name}_thresh.png"), thresh)
+
+    # Find contours
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        safe_print("❌\tNo contours found for dewarping.")
+        return None
+
+    # Find the largest contour (assume it's the document)
+    contour = max(contours, key=cv2.contourArea)
+    peri = cv2.arcLength(contour, True)
+    approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
+    if len(approx) != 4:
+        if debug_name:
+            contour_img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+            cv2.drawContours(contour_img, [contour], -1, (0, 255, 0), 2)
+            cv2.imwrite(
+                get_relative_path(debug_dir, f"{debug_name}_contours.png"), contour_img
+            )
+        safe_print("❌\tCould not find 4 corners for perspective transform.")
+        return None
+
+    corners = _order_corners(approx.reshape(4, 2).astype("float32")) / level_scale
+    if level_scale < 1.0:
+        radius = max(3, int(np.ceil(1.0 / level_scale)))
+        corners = _refine_corners(image, corners, radius, channel_order)
+    return corners
+
+
+def warp_quad(
+    image: np.ndarray,
+    corners: np.ndarray,
+    crop: Optional[Tuple[float, float, float, float]] = None,
+) -> np.ndarray:
+    """
+    Warp the quadrilateral ``corners`` of ``image`` to an upright rectangle.
+
+    Args:
+        image (np.ndarray): Source image (any channel order is preserved).
+        corners (np.ndarray): TL, TR, BR, BL corners in ``image`` pixels.
+        crop (Optional[Tuple[float, float, float, float]]): ``(x0, y0, x1, y1)``
+            as fractions of the dewarped page. The crop is folded into the
+            transform, so only the pixels of that region are computed.
+    """
+    tl, tr, br, bl = corners
+    max_width = max(int(np.linalg.norm(br - bl)), int(np.linalg.norm(tr - tl)))
+    max_height = max(int(np.linalg.norm(tr - br)), int(np.linalg.norm(tl - bl)))
+    dst = np.array(
+        [
+            [0, 0],
+            [max_width - 1, 0],
+            [max_width - 1, max_height - 1],
+            [0, max_height - 1],
+        ],
+        dtype="float32",
+    )
+    M = cv2.getPerspectiveTransform(corners.astype("float32"), dst)
+    out_width, out_height = max_width, max_height
+    if crop is not None:
+        x0, y0 = int(crop[0] * max_width), int(crop[1] * max_height)
+        x1, y1 = int(crop[2] * max_width), int(crop[3] * max_height)
+        M = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=M.dtype) @ M
+        out_width, out_height = max(x1 - x0, 1), max(y1 - y0, 1)
+    return cv2.warpPerspective(image, M, (out_width, out_height))
+
+
+@traced("image_utils.dewarp_image")
 def dewarp_image(
     image: Union[str, Image.Image, np.ndarray],
-) -> tuple[Image.Image, str] | None:
+    crop: Optional[Tuple[float, float, float, float]] = None,
+    channel_order: str = "BGR",
+    detect_max_side: int = DEWARP_DETECT_MAX_SIDE,
+    save: bool = True,
+    debug: bool = False,
+) -> tuple[np.ndarray, Optional[str]] | None:
     """
     Attempt to dewarp an image using perspective transform.
-    Accepts a file path, PIL Image, or numpy ndarray. Returns the dewarped image as a PIL Image object and output path.
+
+    Accepts a file path, PIL Image, or numpy ndarray. The document outline is
+    detected on a reduced pyramid level and refined at full resolution (see
+    ``detect_document_quad``); the warp is then applied once, fused with ``crop``.
+
+    Args:
+        image: File path (decoded to BGR), PIL Image (RGB) or ndarray.
+        crop: Optional ``(x0, y0, x1, y1)`` fractions of the dewarped page to keep.
+        channel_order (str): Channel order of an ndarray input, ``BGR`` or ``RGB``.
+        detect_max_side (int): Longest side of the detection pyramid level.
+        save (bool): Save the result to ``tmp/dewarped/<hash>.png``.
+        debug (bool): Save threshold/contour debug images to ``tmp/dewarp_debug``.
+
+    Returns:
+        tuple[np.ndarray, Optional[str]] | None: The dewarped image in the
+        caller's color order (RGB for PIL input) and the saved path (None when
+        ``save`` is False), or None when no document outline was found.
     """
     try:
         # Accept file path, PIL Image, or numpy ndarray
         if isinstance(image, str):
-            img = cv2.imread(image)
+            img = read_image(image)
             image_path = image
+            channel_order = "BGR"
         elif isinstance(image, Image.Image):
-            img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            img = np.asarray(image.convert("RGB"))
             image_path = getattr(image, "filename", "in_memory_image")
+            channel_order = "RGB"
         elif isinstance(image, np.ndarray):
             img = image
             image_path = "ndarray_input"
@@ -146,139 +300,90 @@ def dewarp_image(
             safe_print(f"❌\tError loading image for dewarping: {image_path}")
             return None
 
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Use adaptive thresholding for better results
-        thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 21, 15
-        )
-
-        # Optionally save thresholded image for debugging
-        debug_dir = get_relative_path("tmp", "dewarp_debug")
-        os.makedirs(debug_dir, exist_ok=True)
-        debug_thresh_path = get_relative_path(
-            debug_dir, f"{unique_hash(image_path)}_thresh.png"
+        name = unique_hash(image_path)
+        corners = detect_document_quad(
+            img, detect_max_side, channel_order, debug_name=name if debug else None
         )
-        cv2.imwrite(debug_thresh_path, thresh)
-
-        # Find contours
-        contours, _ = cv2.findContours(
-            thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-        )
-        if not contours:
-            safe_print("❌\tNo contours found for dewarping.")
+        if corners is None:
             return None
+        warped = warp_quad(img, corners, crop)
 
-        # Find the largest contour (assume it's the document)
-        contour = max(contours, key=cv2.contourArea)
-        peri = cv2.arcLength(contour, True)
-        approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
-
-        if len(approx) == 4:
-            pts = approx.reshape(4, 2)
-            # Order points: top-left, top-right, bottom-right, bottom-left
-            rect = np.zeros((4, 2), dtype="float32")
-            s = pts.sum(axis=1)
-            rect[0] = pts[np.argmin(s)]
-            rect[2] = pts[np.argmax(s)]
-            diff = np.diff(pts, axis=1)
-            rect[1] = pts[np.argmin(diff)]
-            rect[3] = pts[np.argmax(diff)]
-
-            (tl, tr, br, bl) = rect
-            widthA = np.linalg.norm(br - bl)
-            widthB = np.linalg.norm(tr - tl)
-            maxWidth = max(int(widthA), int(widthB))
-
-            heightA = np.linalg.norm(tr - br)
-            heightB = np.linalg.norm(tl - bl)
-            maxHeight = max(int(heightA), int(heightB))
-
-            dst = np.array(
-                [
-                    [0, 0],
-                    [maxWidth - 1, 0],
-                    [maxWidth - 1, maxHeight - 1],
-                    [0, maxHeight - 1],
-                ],
-                dtype="float32",
-            )
-
-            M = cv2.getPerspectiveTransform(rect, dst)
-            warped = cv2.warpPerspective(img, M, (maxWidth, maxHeight))
-
-            # Convert back to PIL Image
-            dewarped_img = Image.fromarray(cv2.cvtColor(warped, cv2.COLOR_BGR2RGB))
-
-            # Optionally save
-            output_path = f"tmp/dewarped/{unique_hash(image_path)}.png"
+        output_path = None
+        if save:
+            output_path = f"tmp/dewarped/{name}.png"
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            dewarped_img.save(output_path)
+            bgr = warped
+            if channel_order == "RGB" and warped.ndim == 3:
+                bgr = cv2.cvtColor(warped, cv2.COLOR_RGB2BGR)
+            cv2.imwrite(output_path, bgr)
 
-            return dewarped_img, output_path
-        else:
-            # Optionally save the contour image for debugging
-            debug_contour_path = get_relative_path(
-                debug_dir, f"{unique_hash(image_path)}_contours.png"
-            )
-            contour_img = img.copy()
-            cv2.drawContours(contour_img, [contour], -1, (0, 255, 0), 2)
-            cv2.imwrite(debug_contour_path, contour_img)
-            safe_print(
-                "❌\tCould not find 4 corners for perspective transform. Debug images saved."
-            )
-            return None
+        return warped, output_path
 
     except Exception as e:
         safe_print(f"❌\tError dewarping image: {str(e)}")
         return None
 
 
-def rotate_image(image: Union[str, Image.Image]) -> list[tuple[Image.Image, int, str]]:
+@traced("image_utils.rotate_image")
+def rotate_image(
+    image: Union[str, Image.Image, np.ndarray],
+    save: bool = False,
+    detect: bool = True,
+) -> list[tuple[np.ndarray, int, str | None]]:
     """
-    Rotate the image in 0, 90, 180, 270 degrees and return a list of (rotated_image, angle, save_path).
-    Saves each rotated image to tmp/rotate/{unique_hash(image_path)}/angle_{angle}.png.
+    Rotate the image to its likely upright orientations and return a list of (rotated_image, angle, save_path).
+
+    With ``detect`` (the default) the orientation is estimated first and only the
+    best angle is returned, or the top two when the detector is unsure. Pass
+    ``detect=False`` to get all of 0, 90, 180 and 270 degrees.
+
+    Rotations are ``np.rot90`` views of one copy of the image (pass them through
+    ``np.ascontiguousarray`` before handing them to OpenCV). Each one is saved to
+    tmp/rotate/{unique_hash(image_path)}/angle_{angle}.png only when ``save`` is True;
+    otherwise save_path is None.
     """
     try:
-        if isinstance(image, str):
-            img = Image.open(image)
-            image_path = image
-        elif isinstance(image, Image.Image):
-            img = image
-            image_path = getattr(img, "filename", "in_memory_image")
-        else:
+        try:
+            img, image_path, channel_order = _as_array(image)
+        except TypeError:
             safe_print("❌\tInvalid input type for rotate_image.")
             return []
 
-        hash_dir = get_relative_path("tmp", "rotate", unique_hash(image_path))
-        os.makedirs(hash_dir, exist_ok=True)
-        rotated_images = []
-        for angle in [0, 90, 180, 270]:
-            rotated = img.rotate(angle, expand=True)
-            save_path = get_relative_path(hash_dir, f"angle_{angle}.png")
-            rotated.save(save_path)
-            rotated_images.append((rotated, angle, save_path))
-        return rotated_images
+        if detect:
+            gray = _to_gray(img, channel_order)
+            specs = orientation_specs(gray)
+        else:
+            specs = crop_plan("rotations")
+        paths: list[str | None] = [None] * len(specs)
+        if save:
+            hash_dir = get_relative_path("tmp", "rotate", unique_hash(image_path))
+            paths = save_crops(img, specs, hash_dir, channel_order)
+        return [
+            (spec.view(img), spec.rotation, path) for spec, path in zip(specs, paths)
+        ]
     except Exception as e:
         safe_print(f"❌\tError rotating image: {str(e)}")
         return []
 
 
-def detect_image_skew_angle(image: Union[str, Image.Image]) -> float:
+@traced("image_utils.detect_skew_angle")
+def detect_image_skew_angle(image: Union[str, Image.Image, np.ndarray]) -> float:
     """
     Deteksi sudut kemiringan (skew angle) gambar dokumen/teks.
     Mengembalikan sudut (dalam derajat). Positif = miring searah jarum jam.
     Jika gagal, return 0.0.
     """
     try:
-        # Terima path atau PIL Image
+        # Terima path, PIL Image atau ndarray BGR
         if isinstance(image, str):
-            img = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+            img = cv2.cvtColor(read_image(image), cv2.COLOR_BGR2GRAY)
             image_path = image
         elif isinstance(image, Image.Image):
-            img = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+            img = cv2.cvtColor(load_image(image), cv2.COLOR_BGR2GRAY)
             image_path = getattr(image, "filename", "in_memory_image")
+        elif isinstance(image, np.ndarray):
+            img = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            image_path = "ndarray_input"
         else:
             safe_print("❌\tInvalid input type for detect_image_skew_angle.")
             return 0.0
@@ -290,9 +395,11 @@ def detect_image_skew_angle(image: Union[str, Image.Image]) -> float:
         # Threshold untuk memperjelas garis
         _, thresh = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
-        # Cari kontur, lalu cari minAreaRect (bounding box miring)
-        coords = np.column_stack(np.where(thresh > 0))
-        if coords.shape[0] < 10:
+        # Cari kontur, lalu cari minAreaRect (bounding box miring).
+        # findNonZero on the transpose gives (row, col) points like np.where, as
+        # int32 pairs instead of two int64 index arrays plus their stacked copy
+        coords = cv2.findNonZero(np.ascontiguousarray(thresh.T))
+        if coords is None or coords.shape[0] < 10:
             safe_print("❌\tNot enough features for skew detection.")
             return 0.0
         rect = cv2.minAreaRect(coords)
@@ -306,7 +413,9 @@ def detect_image_skew_angle(image: Union[str, Image.Image]) -> float:
         return 0.0
 
 
-def is_image_upright(image: Union[str, Image.Image], tolerance: float = 2.0) -> bool:
+def is_image_upright(
+    image: Union[str, Image.Image, np.ndarray], tolerance: float = 2.0
+) -> bool:
     """
     Cek apakah gambar sudah tegak lurus (tidak miring), dengan toleransi derajat tertentu.
     Return True jika sudut kemiringan antara -tolerance sampai +tolerance derajat.
@@ -0,0 +1,375 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TypedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.ocr.refine import CODE_PATTERN
+from src.ocr.rescale import (
+    TARGET_CHAR_HEIGHT,
+    estimate_char_height,
+    rescale_factor,
+    resize,
+)
+from src.ocr.tiling import Box, TextLine
+from src.utils.console import safe_print
+from src.utils.metrics import CODES_FOUND
+from src.utils.tracing import span
+
+# Frames are scored on a gray copy at most this many pixels on the long side
+ANALYSIS_MAX_SIDE = 640
+# Laplacian variance (at analysis scale) below which a frame is too blurry to read
+MIN_SHARPNESS = 100.0
+# Mean absolute thumbnail difference (0..1) from the last OCRed frame below
+# which a frame shows nothing new; sensor noise stays under 0.001 and a code
+# line appearing on a still background is about 0.007
+MIN_CHANGE = 0.005
+# A change this large while tracking (camera swung, scene cut) drops the region
+LOST_CHANGE = 0.1
+# Reads finding all the tracked codes before the stream stops
+STABLE_FRAMES = 3
+# Code region padding, in code-line heights, so small movements stay inside
+ROI_PADDING = 1.5
+# Region reads without any code before going back to full frames
+ROI_MISSES = 2
+# Size of the thumbnails compared for change
+_THUMBNAIL = (64, 48)
+
+# One OCR pass: image in (gray or BGR), lines with pixel boxes out
+LineReader = Callable[[np.ndarray], List[TextLine]]
+
+
+class FrameResult(TypedDict):
+    index: int
+    action: str  # "ocr", "roi", "blurry", "unchanged" or "stopped"
+    sharpness: float
+    change: float
+    codes: List[str]  # read from this frame (empty when not OCRed)
+    roi: Optional[Box]  # code region of the next frames, in frame pixels
+    stable: int  # reads finding all the current codes since they changed
+
+
+def tesseract_lines(image: np.ndarray) -> List[TextLine]:
+    """Default ``LineReader``: one Tesseract pass grouped into lines."""
+    from src.ocr.refine import tesseract_words, words_to_lines
+
+    return words_to_lines(tesseract_words(image))
+
+
+def analysis_gray(frame: np.ndarray) -> np.ndarray:
+    """Small gray copy of ``frame`` used for scoring."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    scale = ANALYSIS_MAX_SIDE / max(gray.shape[:2])
+    return resize(gray, scale) if scale < 1.0 else gray
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the Laplacian: high for sharp edges, low for blur."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def thumbnail(gray: np.ndarray) -> np.ndarray:
+    """Blurred thumbnail, insensitive to sensor noise, for ``frame_change``."""
+    small = cv2.resize(gray, _THUMBNAIL, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(small, (3, 3), 0).astype(np.float32) / 255.0
+
+
+def frame_change(a: Optional[np.ndarray], b: np.ndarray) -> float:
+    """Mean absolute difference of two thumbnails, 1.0 when there is no ``a``."""
+    if a is None:
+        return 1.0
+    return float(np.abs(a - b).mean())
+
+
+def code_region(
+    boxes: Sequence[Box], width: int, height: int, padding: float = ROI_PADDING
+) -> Box:
+    """Union of the code lines' ``boxes``, padded by ``padding`` line heights."""
+    margin = int(max(b[3] - b[1] for b in boxes) * padding)
+    return (
+        max(0, min(b[0] for b in boxes) - margin),
+        max(0, min(b[1] for b in boxes) - margin),
+        min(width, max(b[2] for b in boxes) + margin),
+        min(height, max(b[3] for b in boxes) + margin),
+    )
+
+
+class LiveOCR:
+    """
+    OCR a stream of camera frames, reading only frames worth reading.
+
+    Each frame is scored on a small gray copy: blurry frames (low Laplacian
+    variance) are skipped, and while searching so are frames that barely
+    differ from the last OCRed one. Once a frame yields codes, their region is
+    tracked: later sharp frames are read only inside it (re-centred on every
+    read that finds all tracked codes), a fraction of a full-frame pass. The
+    codes are the union of all reads, so a read that misses one neither
+    shrinks the region nor counts; the stream is done once ``stable_frames``
+    reads have found exactly the tracked codes since they last changed. A
+    large scene change or ``ROI_MISSES`` empty region reads go back to full
+    frames.
+
+    Usage:
+        >>> live = LiveOCR()
+        >>> for frame in frames:
+        ...     live.feed(frame)
+        ...     if live.done:
+        ...         break
+        >>> live.codes
+
+    Args:
+        reader (LineReader): OCR pass returning lines with boxes (default:
+            Tesseract).
+        min_sharpness (float): See ``MIN_SHARPNESS``.
+        min_change (float): See ``MIN_CHANGE``.
+        stable_frames (int): See ``STABLE_FRAMES``.
+        roi_padding (float): See ``ROI_PADDING``.
+    """
+
+    def __init__(
+        self,
+        reader: LineReader = tesseract_lines,
+        min_sharpness: float = MIN_SHARPNESS,
+        min_change: float = MIN_CHANGE,
+        stable_frames: int = STABLE_FRAMES,
+        roi_padding: float = ROI_PADDING,
+    ):
+        self.reader = reader
+        self.min_sharpness = min_sharpness
+        self.min_change = min_change
+        self.stable_frames = max(1, stable_frames)
+        self.roi_padding = roi_padding
+        self.reset()
+
+    def reset(self) -> None:
+        self.codes: List[str] = []
+        self.stable = 0
+        self.roi: Optional[Box] = None
+        self.frames = 0
+        self.reads = 0
+        self._scale = 1.0
+        self._misses = 0
+        self._last: Optional[np.ndarray] = None
+
+    @property
+    def done(self) -> bool:
+        return bool(self.codes) and self.stable >= self.stable_frames
+
+    def _read(self, image: np.ndarray, offset: Box) -> List[TextLine]:
+        """OCR ``image`` (a crop at ``offset``) at the scale of the last full read."""
+        scaled = resize(image, self._scale)
+        lines = self.reader(scaled)
+        x0, y0 = offset[0], offset[1]
+        return [
+            {
+                **line,
+                "box": (
+                    int(line["box"][0] / self._scale) + x0,
+                    int(line["box"][1] / self._scale) + y0,
+                    int(line["box"][2] / self._scale) + x0,
+                    int(line["box"][3] / self._scale) + y0,
+                ),
+            }
+            for line in lines
+        ]
+
+    def feed(self, frame: np.ndarray) -> FrameResult:
+        """Score ``frame`` and OCR it (or its code region) when it is worth it."""
+        index = self.frames
+        self.frames += 1
+        result: FrameResult = {
+            "index": index,
+            "action": "stopped",
+            "sharpness": 0.0,
+            "change": 0.0,
+            "codes": [],
+            "roi": self.roi,
+            "stable": self.stable,
+        }
+        if self.done:
+            return result
+        with span("live.score"):
+            gray = analysis_gray(frame)
+            result["sharpness"] = sharpness(gray)
+            thumb = thumbnail(gray)
+            result["change"] = frame_change(self._last, thumb)
+        if result["sharpness"] < self.min_sharpness:
+            result["action"] = "blurry"
+            return result
+        if self.roi is not None and result["change"] >= LOST_CHANGE:
+            # The voucher moved away: look at the whole frame again
+            self.roi = None
+        if self.roi is None and result["change"] < self.min_change:
+            result["action"] = "unchanged"
+            return result
+
+        height, width = frame.shape[:2]
+        if self.roi is None:
+            result["action"] = "ocr"
+            with span("live.ocr", region="full"):
+                source = (
+                    frame
+                    if frame.ndim == 2
+                    else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                )
+                # Crops of later frames are read at the same scale
+                self._scale = rescale_factor(
+                    estimate_char_height(source), TARGET_CHAR_HEIGHT["tesseract"]
+                )
+                lines = self._read(source, (0, 0, width, height))
+        else:
+            result["action"] = "roi"
+            x0, y0, x1, y1 = self.roi
+            with span("live.ocr", region="roi"):
+                lines = self._read(frame[y0:y1, x0:x1], self.roi)
+        self._last = thumb
+        self.reads += 1
+
+        codes = extract_voucher_codes("\n".join(line["text"] for line in lines))
+        CODES_FOUND.observe(len(codes), stage=f"live.{result['action']}")
+        result["codes"] = codes
+        code_boxes = [
+            line["box"] for line in lines if CODE_PATTERN.search(line["text"])
+        ]
+        if codes and code_boxes:
+            self._misses = 0
+            region = code_region(code_boxes, width, height, self.roi_padding)
+            missed = set(self.codes) - set(codes)
+            added = [code for code in codes if code not in self.codes]
+            if not missed:
+                # Every tracked code is in view: re-centre on them
+                self.roi = region
+            elif added and self.roi is None:
+                self.roi = region
+            elif added:
+                # Never shrink onto a partial read: grow to cover the new codes
+                self.roi = (
+                    min(self.roi[0], region[0]),
+                    min(self.roi[1], region[1]),
+                    max(self.roi[2], region[2]),
+                    max(self.roi[3], region[3]),
+                )
+            if added:
+                # Codes accumulate until a read finds all of them again
+                self.codes, self.stable = self.codes + added, 1
+            elif not missed:
+                self.stable += 1
+        elif self.roi is not None:
+            self._misses += 1
+            if self._misses >= ROI_MISSES:
+                self.roi, self._misses = None, 0
+        result["roi"] = self.roi
+        result["stable"] = self.stable
+        return result
+
+
+def run_stream(
+    frames: Iterable[np.ndarray], live: Optional[LiveOCR] = None
+) -> Iterator[FrameResult]:
+    """Feed ``frames`` to ``live`` (a new ``LiveOCR`` by default) until it is done."""
+    live = live or LiveOCR()
+    for frame in frames:
+        yield live.feed(frame)
+        if live.done:
+            return
+
+
+def iter_frames(source: str) -> Iterator[np.ndarray]:
+    """
+    Frames of a video file, a camera index, a directory or a glob of images.
+
+    Raises:
+        ValueError: If ``source`` cannot be opened.
+    """
+    if os.path.isdir(source) or any(c in source for c in "*?["):
+        pattern = os.path.join(source, "*") if os.path.isdir(source) else source
+        for path in sorted(glob.glob(pattern)):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source: {source}")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def session_key(source: str, started: Optional[float] = None) -> str:
+    """
+    Database key of one stream session of ``source``.
+
+    Camera indices repeat across sessions, so the start time (default: now)
+    keeps each session's codes in its own row.
+    """
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(started))
+    return f"{source}@{stamp}"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> List[str]:
+    parser = argparse.ArgumentParser(
+        description="OCR voucher codes from a stream of camera frames"
+    )
+    parser.add_argument(
+        "source", help="Video file, camera index, or directory/glob of frame images"
+    )
+    parser.add_argument("--min-sharpness", type=float, default=MIN_SHARPNESS)
+    parser.add_argument("--min-change", type=float, default=MIN_CHANGE)
+    parser.add_argument(
+        "--stable-frames",
+        type=int,
+        default=STABLE_FRAMES,
+        help="Agreeing reads before the codes are accepted",
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Store the accepted codes in the voucher database",
+    )
+    parser.add_argument(
+        "--session",
+        help="Key the stored codes are filed under "
+        "(default: the source and the session's start time)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Print every frame's scores"
+    )
+    args = parser.parse_args(argv)
+    session = args.session or session_key(args.source)
+
+    live = LiveOCR(
+        min_sharpness=args.min_sharpness,
+        min_change=args.min_change,
+        stable_frames=args.stable_frames,
+    )
+    for result in run_stream(iter_frames(args.source), live):
+        if args.verbose or result["action"] in ("ocr", "roi"):
+            print(json.dumps(result), flush=True)
+    safe_print(
+        f"🎞️\t{live.frames} frame(s), {live.reads} read(s), "
+        f"codes {'stable' if live.done else 'not stable'}: {live.codes}"
+    )
+    if args.store and live.codes:
+        from src.database.voucher_sink import VoucherSink
+
+        with VoucherSink() as sink:
+            sink.submit(session, live.codes)
+    return live.codes
+
+
+if __name__ == "__main__":
+    main()
@@ -45,7 +45,9 @@ ocrQueue.process(concurrency, async (job) => {
     const args = [path.join(process.cwd(), 'src/ocr/cli.js'), input];
     console.log(`[OCR RUN] node ${args.join(' ')}`);
     const res = await spawnAsync('node', args, {
-      stdio: 'pipe'
+      stdio: 'pipe',
+      // The Python OCR processes split the CPUs between the concurrent jobs
+      env: { ...process.env, OCR_WORKERS: String(concurrency) }
     });
     const vouchers = res.output.split(/\r?\n/).flatMap((line) => extractVoucherCodes(line, 'tmp/extract-vouchers'));
     const result = {
@@ -0,0 +1,184 @@
+import os
+import sys
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.crop_plan import CropSpec
+from src.utils.tracing import span
+
+# Longest side of the thumbnail the heuristic runs on
+THUMBNAIL_MAX_SIDE = 600
+# Below this confidence callers should OCR the top two orientations
+MIN_CONFIDENCE = 0.6
+# Tesseract OSD orientation_conf at which we treat the answer as certain
+OSD_FULL_CONFIDENCE = 5.0
+# Mean centroid offset (fraction of line height) that counts as a clear up/down signal
+_UPDOWN_SCALE = 0.12
+
+
+class OrientationResult(TypedDict):
+    rotation: int  # counter-clockwise degrees that make the image upright
+    confidence: float  # score of ``rotation``, 0..1
+    scores: Dict[int, float]  # score per candidate rotation, summing to ~1
+    method: str  # "heuristic" or "osd"
+
+
+def _thumbnail_binary(image: np.ndarray) -> np.ndarray:
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = min(1.0, THUMBNAIL_MAX_SIDE / max(gray.shape[:2]))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15
+    )
+
+
+def _line_stats(binary: np.ndarray) -> Tuple[float, float]:
+    """
+    Score how strongly ink forms horizontal lines, and their up/down asymmetry.
+
+    Characters are joined into line blobs with a horizontal closing. Returns the
+    log aspect ratio of the wide blobs, weighted by their share of all closed ink
+    (high for horizontal text, near zero for vertical text)
+    and the mean offset of the ink centroid below each blob's center, as a
+    fraction of its height: Latin text has more ascenders than descenders, so
+    upright lines carry their ink low in the box.
+    """
+    closed = cv2.morphologyEx(
+        binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1))
+    )
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(closed, 8)
+    elongation = 0.0
+    offsets = []
+    for i in range(1, count):
+        x, y, w, h, area = stats[i]
+        if area < 20 or h < 4 or w < 2 * h:
+            continue
+        elongation += area * np.log(w / h)
+        ink = binary[y : y + h, x : x + w] & (labels[y : y + h, x : x + w] == i)
+        rows = ink.sum(axis=1).astype(np.float64)
+        if rows.sum():
+            centroid = (rows * np.arange(h)).sum() / rows.sum()
+            offsets.append((centroid - (h - 1) / 2) / h)
+    total = float(stats[1:, cv2.CC_STAT_AREA].sum())
+    return (elongation / total if total else 0.0), (
+        float(np.mean(offsets)) if offsets else 0.0
+    )
+
+
+def detect_orientation_heuristic(image: np.ndarray) -> OrientationResult:
+    """
+    Estimate orientation from text-line direction on a thumbnail (a few ms).
+
+    The horizontal/vertical decision comes from line elongation at 0° and 90°;
+    the up/down decision from the ink-centroid asymmetry, which is weak for
+    digit-only text, so such inputs get a low confidence.
+    """
+    binary = _thumbnail_binary(image)
+    elongation = {}
+    updown = {}
+    for rotation in (0, 90):
+        rotated = np.ascontiguousarray(np.rot90(binary, k=rotation // 90))
+        elongation[rotation], updown[rotation] = _line_stats(rotated)
+    total = elongation[0] + elongation[90]
+    scores: Dict[int, float] = {}
+    for rotation in (0, 90):
+        p_direction = elongation[rotation] / total if total > 0 else 0.5
+        p_upright = 0.5 + 0.5 * float(np.clip(updown[rotation] / _UPDOWN_SCALE, -1, 1))
+        scores[rotation] = p_direction * p_upright
+        scores[rotation + 180] = p_direction * (1.0 - p_upright)
+    best = max(scores, key=scores.get)
+    return {
+        "rotation": best,
+        "confidence": scores[best],
+        "scores": scores,
+        "method": "heuristic",
+    }
+
+
+def detect_orientation_osd(image: np.ndarray) -> Optional[OrientationResult]:
+    """
+    Ask Tesseract's orientation and script detection (``--psm 0``).
+
+    Returns None when Tesseract or its ``osd`` data is unavailable, or when the
+    image has too little text for OSD.
+    """
+    try:
+        import pytesseract
+
+        rgb = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        osd = pytesseract.image_to_osd(rgb, output_type=pytesseract.Output.DICT)
+    except Exception:
+        return None
+    # OSD reports the clockwise rotation that corrects the page
+    rotation = (-int(osd.get("rotate", 0))) % 360
+    confidence = min(1.0, float(osd.get("orientation_conf", 0.0)) / OSD_FULL_CONFIDENCE)
+    scores = {angle: 0.0 for angle in (0, 90, 180, 270)}
+    scores[rotation] = confidence
+    # The usual confusion is upside-down text
+    scores[(rotation + 180) % 360] = 1.0 - confidence
+    return {
+        "rotation": rotation,
+        "confidence": confidence,
+        "scores": scores,
+        "method": "osd",
+    }
+
+
+def detect_orientation(
+    image: np.ndarray, method: str = "auto", min_confidence: float = MIN_CONFIDENCE
+) -> OrientationResult:
+    """
+    Decide which rotation makes ``image`` upright.
+
+    Args:
+        image (np.ndarray): BGR or gray image.
+        method (str): ``heuristic``, ``osd``, or ``auto`` (heuristic first, then
+            Tesseract OSD only when the heuristic is below ``min_confidence``).
+        min_confidence (float): Confidence needed to skip the OSD call in auto mode.
+
+    Returns:
+        OrientationResult: The chosen rotation, its confidence and all scores.
+    """
+    with span("orientation.detect", method=method) as s:
+        if method == "osd":
+            result = detect_orientation_osd(image) or detect_orientation_heuristic(
+                image
+            )
+        else:
+            result = detect_orientation_heuristic(image)
+            if method == "auto" and result["confidence"] < min_confidence:
+                osd = detect_orientation_osd(image)
+                if osd and osd["confidence"] > result["confidence"]:
+                    result = osd
+        s.set_attributes(
+            rotation=result["rotation"],
+            confidence=round(result["confidence"], 3),
+            chosen_by=result["method"],
+        )
+    return result
+
+
+def candidate_rotations(
+    result: OrientationResult, min_confidence: float = MIN_CONFIDENCE
+) -> List[int]:
+    """The best rotation, plus the runner-up when the best is below ``min_confidence``."""
+    ranked = sorted(result["scores"], key=result["scores"].get, reverse=True)
+    if result["confidence"] >= min_confidence:
+        return ranked[:1]
+    return ranked[:2]
+
+
+def orientation_specs(
+    image: np.ndarray, method: str = "auto", min_confidence: float = MIN_CONFIDENCE
+) -> List[CropSpec]:
+    """Crop specs for the orientations worth OCRing (one, or two when unsure)."""
+    result = detect_orientation(image, method, min_confidence)
+    return [
+        CropSpec(f"angle_{rotation}", rotation=rotation)
+        for rotation in candidate_rotations(result, min_confidence)
+    ]
@@ -0,0 +1,258 @@
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.tracing import span
+
+_STOP = object()
+# Seconds between checks of the cancel flag while blocked on a queue
+_POLL_INTERVAL = 0.1
+
+
+class Stage:
+    """
+    One step of a ``StagedPipeline``.
+
+    Args:
+        name (str): Stage name, used in traces and the utilization report.
+        fn (Callable[[Any], Any]): Transforms the previous stage's output.
+        workers (int): Threads running ``fn`` concurrently.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+class StageError:
+    """Marks an item that failed in ``stage``; later stages pass it through untouched."""
+
+    def __init__(self, stage: str, item: Any, error: BaseException):
+        self.stage = stage
+        self.item = item
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"StageError({self.stage!r}, {type(self.error).__name__}: {self.error})"
+
+
+class _StageStats:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.lock = threading.Lock()
+
+
+class StagedPipeline:
+    """
+    Run items through stages connected by bounded queues, one thread pool per stage.
+
+    Each stage pulls from its input queue and pushes to the next stage's queue; a
+    full queue blocks the producer, so a slow stage applies backpressure instead of
+    letting work pile up in memory. Stages overlap: while image N is in OCR, image
+    N+1 can already be decoded and pre-processed. cv2 and subprocess-based engines
+    release the GIL, so threads are enough for the overlap.
+
+    Results are yielded in completion order. An exception in a stage does not stop
+    the pipeline: the item is wrapped in a ``StageError`` and yielded.
+
+    Usage:
+        >>> pipeline = StagedPipeline(
+        ...     [Stage("decode", load, 2), Stage("ocr", ocr, 4), Stage("extract", extract)],
+        ...     queue_size=8,
+        ... )
+        >>> for result in pipeline.run(paths):
+        ...     print(result)
+        >>> pipeline.report()["ocr"]["utilization"]
+
+    Args:
+        stages (Sequence[Stage]): Stages in execution order.
+        queue_size (int): Capacity of each inter-stage queue.
+    """
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self._stats: Dict[str, _StageStats] = {}
+        self._wall = 0.0
+        self._cancel = threading.Event()
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Feed ``items`` through all stages, yielding final outputs as they finish."""
+        self._cancel.clear()
+        self._stats = {s.name: _StageStats(s.workers) for s in self.stages}
+        queues: List[queue.Queue] = [
+            queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)
+        ]
+        threads = [
+            threading.Thread(
+                target=self._feed,
+                args=(items, queues[0]),
+                name="pipeline-feed",
+                daemon=True,
+            )
+        ]
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            next_workers = (
+                self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            )
+            for n in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(
+                            stage,
+                            queues[index],
+                            queues[index + 1],
+                            remaining,
+                            lock,
+                            next_workers,
+                        ),
+                        name=f"pipeline-{stage.name}-{n}",
+                        daemon=True,
+                    )
+                )
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                result = self._get(queues[-1])
+                if result is _STOP or result is None and self._cancel.is_set():
+                    break
+                yield result
+        finally:
+            self._cancel.set()
+            for thread in threads:
+                thread.join(timeout=5)
+            self._wall = time.perf_counter() - started
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._cancel.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._cancel.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _feed(self, items: Iterable[Any], out: queue.Queue) -> None:
+        try:
+            for item in items:
+                if not self._put(out, item):
+                    return
+        except Exception as e:
+            self._put(out, StageError("feed", None, e))
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._put(out, _STOP)
+
+    def _work(
+        self,
+        stage: Stage,
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        remaining: List[int],
+        lock: threading.Lock,
+        next_workers: int,
+    ) -> None:
+        stats = self._stats[stage.name]
+        try:
+            while True:
+                waited = time.perf_counter()
+                item = self._get(inbox)
+                starved = time.perf_counter() - waited
+                if item is _STOP or item is None and self._cancel.is_set():
+                    return
+                failed = False
+                busy = 0.0
+                if isinstance(item, StageError):
+                    result = item
+                else:
+                    began = time.perf_counter()
+                    try:
+                        with span(f"pipeline.{stage.name}"):
+                            result = stage.fn(item)
+                    except Exception as e:
+                        result = StageError(stage.name, item, e)
+                        failed = True
+                    busy = time.perf_counter() - began
+                waited = time.perf_counter()
+                if not self._put(outbox, result):
+                    return
+                blocked = time.perf_counter() - waited
+                with stats.lock:
+                    stats.items += 1
+                    stats.errors += failed
+                    stats.busy += busy
+                    stats.starved += starved
+                    stats.blocked += blocked
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(next_workers):
+                    self._put(outbox, _STOP)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-stage statistics of the last run.
+
+        ``utilization`` is busy time divided by ``workers × wall time``; the stage
+        closest to 1.0 is the bottleneck. ``blocked`` is time spent waiting on a
+        full downstream queue and ``starved`` time spent waiting for input.
+        """
+        wall = self._wall or 1e-9
+        report = {}
+        for name, stats in self._stats.items():
+            report[name] = {
+                "workers": stats.workers,
+                "items": stats.items,
+                "errors": stats.errors,
+                "busy_seconds": stats.busy,
+                "starved_seconds": stats.starved,
+                "blocked_seconds": stats.blocked,
+                "utilization": stats.busy / (stats.workers * wall),
+            }
+        return report
+
+    def bottleneck(self) -> Optional[str]:
+        """Name of the stage with the highest utilization in the last run."""
+        report = self.report()
+        if not report:
+            return None
+        return max(report, key=lambda name: report[name]["utilization"])
+
+
+def parse_stage_workers(spec: str) -> Dict[str, int]:
+    """Parse ``"decode=2,ocr=4"`` into ``{"decode": 2, "ocr": 4}``."""
+    workers = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, count = part.partition("=")
+        workers[name.strip()] = int(count)
+    return workers
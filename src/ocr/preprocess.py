@@ -0,0 +1,366 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+    Union,
+)
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.rescale import (
+    DEFAULT_TARGET_CHAR_HEIGHT,
+    fit_pixel_budget,
+    rescale_for_ocr,
+)
+from src.utils.tracing import span
+
+# Intermediate images worth keeping when several chains run on the same image
+# (the tuner); single-chain callers keep none, as a process rarely sees an
+# image twice and each entry is a full-resolution array
+MEMO_SIZE = 8
+# Skew below this many degrees is left alone by the deskew step
+DESKEW_MIN_ANGLE = 2.0
+
+# A step takes an image (BGR or gray) plus its parameters and returns a new image.
+# Steps must not modify their input: it may be a memoized result shared by chains.
+StepFunction = Callable[..., np.ndarray]
+
+
+class Step(NamedTuple):
+    """A named preprocessing step with its parameters, hashable for memoization."""
+
+    name: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    def __str__(self) -> str:
+        if not self.params:
+            return self.name
+        args = ",".join(f"{k}={v}" for k, v in self.params)
+        return f"{self.name}({args})"
+
+
+def step(name: str, **params: Any) -> Step:
+    """Build a ``Step``; parameters are sorted so equal steps hash equally."""
+    return Step(name, tuple(sorted(params.items())))
+
+
+class StepTiming(TypedDict):
+    step: str
+    seconds: float  # time spent in this run (0 when cached)
+    cached: bool
+    cost: float  # time the step took when it was computed
+
+
+class PreprocessResult(TypedDict):
+    image: np.ndarray
+    chain: str
+    timings: List[StepTiming]
+
+
+def _gray(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _rescale(
+    image: np.ndarray, target_char_height: float = DEFAULT_TARGET_CHAR_HEIGHT
+) -> np.ndarray:
+    return rescale_for_ocr(image, target_char_height)[0]
+
+
+def _upscale(image: np.ndarray, factor: float = 2.0) -> np.ndarray:
+    return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+
+
+def _equalize(image: np.ndarray) -> np.ndarray:
+    return cv2.equalizeHist(_gray(image))
+
+
+def _clahe(image: np.ndarray, clip: float = 2.0, grid: int = 8) -> np.ndarray:
+    return cv2.createCLAHE(clipLimit=clip, tileGridSize=(grid, grid)).apply(
+        _gray(image)
+    )
+
+
+def _sharpen(image: np.ndarray) -> np.ndarray:
+    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+    return cv2.filter2D(image, -1, kernel)
+
+
+def _otsu(image: np.ndarray) -> np.ndarray:
+    _, binary = cv2.threshold(_gray(image), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def _adaptive(image: np.ndarray, block: int = 31, c: int = 15) -> np.ndarray:
+    return cv2.adaptiveThreshold(
+        _gray(image), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block, c
+    )
+
+
+def _median(image: np.ndarray, ksize: int = 3) -> np.ndarray:
+    return cv2.medianBlur(image, ksize)
+
+
+def _blur(image: np.ndarray, ksize: int = 5, sigma: float = 1.0) -> np.ndarray:
+    return cv2.GaussianBlur(image, (ksize, ksize), sigma)
+
+
+def _deskew(image: np.ndarray, min_angle: float = DESKEW_MIN_ANGLE) -> np.ndarray:
+    from src.ocr.image_utils import detect_image_skew_angle
+
+    angle = detect_image_skew_angle(image)
+    if abs(angle) <= min_angle:
+        return image
+    # Same convention as PIL.Image.rotate(angle, expand=True)
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width = int(height * sin + width * cos)
+    new_height = int(height * cos + width * sin)
+    matrix[0, 2] += new_width / 2 - width / 2
+    matrix[1, 2] += new_height / 2 - height / 2
+    return cv2.warpAffine(image, matrix, (new_width, new_height), borderValue=0)
+
+
+def _dewarp(image: np.ndarray) -> np.ndarray:
+    from src.ocr.image_utils import dewarp_image
+
+    result = dewarp_image(image, save=False)
+    return image if result is None else result[0]
+
+
+STEPS: Dict[str, StepFunction] = {
+    "rescale": _rescale,
+    "gray": _gray,
+    "upscale": _upscale,
+    "equalize": _equalize,
+    "clahe": _clahe,
+    "sharpen": _sharpen,
+    "otsu": _otsu,
+    "adaptive": _adaptive,
+    "median": _median,
+    "blur": _blur,
+    "deskew": _deskew,
+    "dewarp": _dewarp,
+}
+
+# Named chains, one per entry point's historical preprocessing
+CHAINS: Dict[str, List[Step]] = {
+    "none": [],
+    # cli.preprocess_image
+    "cli": [step("rescale"), step("blur", ksize=5, sigma=1.0), step("dewarp")],
+    # cli without the blur, for sharp scans
+    "cli_sharp": [step("rescale"), step("dewarp")],
+    # focus_impl.preprocess_image_for_ocr (the image is decoded at OCR scale)
+    "focus": [
+        step("gray"),
+        step("equalize"),
+        step("sharpen"),
+        step("otsu"),
+        step("median", ksize=3),
+    ],
+    # focus_pytesseract.focus_extract_text_from_image
+    "deskew_dewarp": [step("deskew"), step("dewarp")],
+    # pytesseract_impl and easyocr_impl
+    "dewarp": [step("dewarp")],
+}
+
+
+def register_step(name: str, fn: StepFunction) -> None:
+    """Make ``fn`` available to chains as ``name`` (replacing any existing step)."""
+    STEPS[name] = fn
+
+
+def register_chain(name: str, steps: Sequence[Step]) -> None:
+    """
+    Register a chain of steps under ``name``.
+
+    Raises:
+        ValueError: If a step is not registered.
+    """
+    for s in steps:
+        if s.name not in STEPS:
+            raise ValueError(f"Unknown preprocessing step: {s.name}")
+    CHAINS[name] = list(steps)
+
+
+def get_chain(chain: Union[str, Sequence[Step]]) -> List[Step]:
+    """
+    Resolve a chain name (or pass a list of steps through).
+
+    Raises:
+        ValueError: If ``chain`` is not a registered chain name.
+    """
+    if not isinstance(chain, str):
+        return list(chain)
+    try:
+        return list(CHAINS[chain])
+    except KeyError:
+        raise ValueError(
+            f"Unknown preprocessing chain: {chain} (known: {', '.join(sorted(CHAINS))})"
+        )
+
+
+def image_key(image: np.ndarray) -> str:
+    """Content hash of ``image`` used as the memo key when the caller gives none."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.shape}{image.dtype}".encode())
+    h.update(np.ascontiguousarray(image).data)
+    return h.hexdigest()
+
+
+class Preprocessor:
+    """
+    Run named preprocessing chains with memoized intermediate results.
+
+    Results are cached by ``(image key, step prefix)``, so chains that share a
+    prefix (``cli`` and ``cli_sharp`` both start with ``rescale``) compute it
+    once per image. Cached arrays are shared: treat them as read-only.
+
+    Memoization is off by default; enable it only where chains share images.
+
+    Usage:
+        >>> pre = Preprocessor(memo_size=MEMO_SIZE)
+        >>> for name in ("cli", "cli_sharp", "focus"):
+        ...     result = pre.run(image, name, key=path)
+        ...     print(name, result["timings"])
+
+    Args:
+        memo_size (int): Intermediate images kept (least recently used are
+            dropped); 0 disables memoization.
+    """
+
+    def __init__(self, memo_size: int = 0):
+        self.memo_size = memo_size
+        self._memo: (
+            "OrderedDict[Tuple[str, Tuple[Step, ...]], Tuple[np.ndarray, float]]"
+        ) = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(
+        self, key: Tuple[str, Tuple[Step, ...]]
+    ) -> Optional[Tuple[np.ndarray, float]]:
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is not None:
+                self._memo.move_to_end(key)
+            return entry
+
+    def _put(
+        self, key: Tuple[str, Tuple[Step, ...]], image: np.ndarray, cost: float
+    ) -> None:
+        if self.memo_size <= 0:
+            return
+        with self._lock:
+            self._memo[key] = (image, cost)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+    def run(
+        self,
+        image: np.ndarray,
+        chain: Union[str, Sequence[Step]] = "cli",
+        key: Optional[str] = None,
+        on_step: Optional[Callable[[Step, np.ndarray, StepTiming], None]] = None,
+        max_pixels: Optional[int] = None,
+    ) -> PreprocessResult:
+        """
+        Apply ``chain`` to ``image``.
+
+        Args:
+            image (np.ndarray): BGR image.
+            chain: A chain name from ``CHAINS`` or a list of ``Step``.
+            key (Optional[str]): Identifies the image for memoization (e.g. its
+                path); defaults to a hash of the pixels.
+            on_step (Optional[Callable]): Called after every step (cached or
+                not) with the step, its output and its timing, e.g. to save
+                debug images.
+            max_pixels (Optional[int]): Shrink the output of any step that
+                grows past this many pixels (e.g. ``upscale``), so no
+                intermediate exceeds the budget.
+
+        Returns:
+            PreprocessResult: The processed image and one timing per step.
+
+        Raises:
+            ValueError: If the chain or one of its steps is unknown.
+        """
+        name = chain if isinstance(chain, str) else "+".join(str(s) for s in chain)
+        steps = get_chain(chain)
+        for s in steps:
+            if s.name not in STEPS:
+                raise ValueError(f"Unknown preprocessing step: {s.name}")
+        memoize = self.memo_size > 0
+        if memoize:
+            # Hashing a large frame costs tens of ms: only when it can pay off
+            key = key or image_key(image)
+            if max_pixels:
+                # Budgeted intermediates differ from unbudgeted ones
+                key = f"{key}@{max_pixels}px"
+        timings: List[StepTiming] = []
+        with span("preprocess.chain", chain=name, steps=len(steps)):
+            for i, s in enumerate(steps):
+                prefix = (key, tuple(steps[: i + 1]))
+                cached = self._get(prefix) if memoize else None
+                if cached is not None:
+                    image, cost = cached
+                    timing: StepTiming = {
+                        "step": str(s),
+                        "seconds": 0.0,
+                        "cached": True,
+                        "cost": cost,
+                    }
+                else:
+                    started = time.perf_counter()
+                    with span(f"preprocess.{s.name}", **dict(s.params)):
+                        image = STEPS[s.name](image, **dict(s.params))
+                    if max_pixels:
+                        image = fit_pixel_budget(image, max_pixels)[0]
+                    seconds = time.perf_counter() - started
+                    timing = {
+                        "step": str(s),
+                        "seconds": seconds,
+                        "cached": False,
+                        "cost": seconds,
+                    }
+                    self._put(prefix, image, seconds)
+                timings.append(timing)
+                if on_step:
+                    on_step(s, image, timing)
+        return {"image": image, "chain": name, "timings": timings}
+
+
+# Shared by every single-chain caller, so it memoizes nothing: batch and watch
+# workers never see an image twice and would only pin its intermediates
+_default = Preprocessor()
+
+
+def preprocess(
+    image: np.ndarray,
+    chain: Union[str, Sequence[Step]] = "cli",
+    key: Optional[str] = None,
+    on_step: Optional[Callable[[Step, np.ndarray, StepTiming], None]] = None,
+    max_pixels: Optional[int] = None,
+) -> PreprocessResult:
+    """Run ``chain`` on ``image`` with the shared module-level ``Preprocessor``."""
+    return _default.run(image, chain, key=key, on_step=on_step, max_pixels=max_pixels)
@@ -1,75 +1,72 @@
 import sys
 import os
-import pytesseract
-from PIL import Image
-from proxy_hunter import write_file
+import cv2
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from src.ocr.image_utils import dewarp_image
-from src.database.VoucherDatabase import (
-    extract_voucher_codes,
-    get_database_instance,
-    safe_print,
-    store_voucher_in_database,
-)
+from src.ocr.crop_plan import HALVES, iter_crops
+from src.ocr.decoders import read_image
+from src.ocr.preprocess import preprocess
+from src.ocr.refine import refine, tesseract_words, words_text
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.database.voucher_sink import get_voucher_sink
 from src.utils.file import get_relative_path
+from src.utils.metrics import CODES_FOUND, CROP_COUNT, flush_metrics
+from src.utils.tracing import span
 
 
-def extract_text_from_image(image_path, lang="eng"):
+def extract_text_from_image(image_path, lang="eng", chain="dewarp"):
     """
     Extract text from an image using Tesseract OCR.
+
+    The preprocessed image (by default dewarped, or the original when dewarping
+    fails) is OCRed once with word confidences; only low-confidence or
+    partial-code lines are then re-OCRed, instead of a second pass over the
+    whole image.
     :param image_path: Path to the image file.
     :param lang: Language code for Tesseract (default: 'eng').
+    :param chain: Preprocessing chain (see preprocess.CHAINS).
     :return: Extracted text as a string.
     """
-    img = Image.open(image_path)
-    original_tesseract = pytesseract.image_to_string(img, lang=lang)
-    # Save original OCR result
+    from proxy_hunter import write_file
+
+    image = preprocess(read_image(image_path), chain)["image"]
+    with span("pytesseract.ocr", variant="words"):
+        words = tesseract_words(image, lang=lang, config="")
+    result = refine(image, words)
+    # Save first-pass and refined OCR results
     base_name = os.path.splitext(os.path.basename(image_path))[0]
     tmp_dir = get_relative_path("tmp/ocr_results")
     os.makedirs(tmp_dir, exist_ok=True)
-    original_txt_path = os.path.join(tmp_dir, f"{base_name}_original.txt")
-    write_file(original_txt_path, original_tesseract)
-    # Dewarping
-    dewarped_result = dewarp_image(image_path)
-    if dewarped_result is not None:
-        dewarped_img = dewarped_result[0]  # Get the PIL image
-        dewarped_tesseract = pytesseract.image_to_string(dewarped_img, lang=lang)
-        # Save dewarped OCR result
-        dewarped_txt_path = get_relative_path(tmp_dir, f"{base_name}_dewarped.txt")
-        write_file(dewarped_txt_path, dewarped_tesseract)
-        # Merge original and dewarped results, removing duplicates and preserving order
-        merged = original_tesseract.splitlines() + dewarped_tesseract.splitlines()
-        merged = list(dict.fromkeys([line.strip() for line in merged if line.strip()]))
-        return "\n".join(merged)
-    return original_tesseract
+    write_file(os.path.join(tmp_dir, f"{base_name}_original.txt"), words_text(words))
+    if result["region_texts"]:
+        refined_txt_path = get_relative_path(tmp_dir, f"{base_name}_refined.txt")
+        write_file(refined_txt_path, "\n".join(result["region_texts"]))
+    # Drop repeated lines, preserving order
+    lines = [line.strip() for line in result["text"].splitlines() if line.strip()]
+    return "\n".join(dict.fromkeys(lines))
 
 
-def split_and_extract_text_from_image(image_path: str) -> str:
+def split_and_extract_text_from_image(image_path: str, chain: str = "dewarp") -> str:
     """
-    Split the image into quarters and extract text from each part.
+    Split the image into left/right halves and extract text from each part.
     :param image_path: Path to the image file.
+    :param chain: Preprocessing chain (see preprocess.CHAINS).
     :return: Extracted text from all parts.
     """
-    img = Image.open(image_path)
-    dewarped_result = dewarp_image(image_path)
-    if dewarped_result is not None:
-        img = dewarped_result[0]  # Get the PIL image
-    else:
-        safe_print("❌\tDewarping failed, using original image.")
-    width, height = img.size
-    halves = [
-        img.crop((0, 0, width // 2, height)),  # Left half
-        img.crop((width // 2, 0, width, height)),  # Right half
-    ]
+    import pytesseract
+
+    image = preprocess(read_image(image_path), chain)["image"]
+    # pytesseract reads arrays as RGB
+    img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image.ndim == 3 else image
+    halves = HALVES[:2]  # Left and right half
+
+    CROP_COUNT.observe(len(halves), stage="pytesseract")
 
     all_text = []
-    for i, half in enumerate(halves):
-        half_path = get_relative_path("tmp/split", f"half_{i}.png")
-        os.makedirs(os.path.dirname(half_path), exist_ok=True)
-        half.save(half_path)
-        text = pytesseract.image_to_string(half, lang="eng")
+    for i, (_, half) in enumerate(iter_crops(img, halves)):
+        with span("pytesseract.ocr", variant=f"half_{i}"):
+            text = pytesseract.image_to_string(half, lang="eng")
         if text:
             all_text.append(text)
 
@@ -80,12 +77,10 @@ if __name__ == "__main__":
     voucher_path = "test/fixtures/voucher-fix.jpeg"
     extract = split_and_extract_text_from_image(voucher_path)
     result = extract_voucher_codes(extract)
-    try:
-        db_helper = get_database_instance()
-        safe_print("✅\tDatabase initialized successfully")
-    except Exception as e:
-        safe_print(f"❌\tError initializing database: {str(e)}")
+    CODES_FOUND.observe(len(result), stage="pytesseract")
     if result:
-        for code in result:
-            # safe_print(f"📜\tFound voucher code: {code}")
-            store_voucher_in_database(db_helper, code, voucher_path)
+        # All codes of the image in one transaction, written behind the OCR
+        sink = get_voucher_sink()
+        sink.submit(voucher_path, result)
+        sink.flush()
+    flush_metrics()
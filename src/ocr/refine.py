@@ -0,0 +1,288 @@
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, TypedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.tiling import Box, TextLine
+from src.utils.metrics import CROP_COUNT
+from src.utils.tracing import span
+
+# Words below this Tesseract confidence (0..100) are worth a second look
+LOW_CONFIDENCE = 60.0
+# A line with at least this many digits but no complete code holds a partial code
+PARTIAL_CODE_DIGITS = 8
+# Same pattern as ``extract_voucher_codes``
+CODE_PATTERN = re.compile(r"\b\d{4}\s*\d{4}\s*\d{4}\s*\d{4}\b")
+# Regions are padded by this many line heights so cut-off digits are included
+REGION_PADDING = 0.75
+# Upper bound on re-OCRed regions per image; the least confident go first
+MAX_REGIONS = 8
+# Second pass: one text line, digits only
+REFINE_CONFIG = "--psm 7 -c tessedit_char_whitelist=0123456789"
+
+
+class Word(TypedDict):
+    text: str
+    box: Box  # x0, y0, x1, y1 in pixels
+    conf: float  # 0..100, -1 when Tesseract gives none
+    line: Tuple[int, int, int]  # Tesseract (block, paragraph, line) numbers
+
+
+class RefineResult(TypedDict):
+    text: str  # first-pass text, weak lines replaced by their regions' re-reads
+    regions: List[Box]
+    region_texts: List[str]
+
+
+# Re-OCR for one small region: pixels in, text out
+RegionReader = Callable[[np.ndarray], str]
+
+
+def tesseract_words(
+    image: np.ndarray,
+    lang: str = "eng",
+    config: str = "--psm 6",
+    channel_order: str = "BGR",
+) -> List[Word]:
+    """
+    Run Tesseract once and keep every word with its box and confidence.
+
+    Args:
+        image (np.ndarray): Gray, BGR or RGB image.
+        lang (str): Tesseract language.
+        config (str): Extra Tesseract options.
+        channel_order (str): ``BGR`` (OpenCV) or ``RGB`` for 3-channel input.
+    """
+    import pytesseract
+
+    rgb = image
+    if image.ndim == 3 and channel_order == "BGR":
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    with span("refine.words", engine="tesseract") as s:
+        data = pytesseract.image_to_data(
+            rgb, lang=lang, config=config, output_type=pytesseract.Output.DICT
+        )
+        words: List[Word] = []
+        for i, text in enumerate(data["text"]):
+            if not str(text).strip():
+                continue
+            left, top = int(data["left"][i]), int(data["top"][i])
+            words.append(
+                {
+                    "text": str(text),
+                    "box": (
+                        left,
+                        top,
+                        left + int(data["width"][i]),
+                        top + int(data["height"][i]),
+                    ),
+                    "conf": float(data["conf"][i]),
+                    "line": (
+                        int(data["block_num"][i]),
+                        int(data["par_num"][i]),
+                        int(data["line_num"][i]),
+                    ),
+                }
+            )
+        s.set_attribute("words", len(words))
+    return words
+
+
+def _union(boxes: Sequence[Box]) -> Box:
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    )
+
+
+def _line_groups(words: Sequence[Word]) -> List[List[Word]]:
+    groups: Dict[Tuple[int, int, int], List[Word]] = {}
+    for word in words:
+        groups.setdefault(word["line"], []).append(word)
+    return [sorted(group, key=lambda w: w["box"][0]) for group in groups.values()]
+
+
+def words_to_lines(words: Sequence[Word]) -> List[TextLine]:
+    """Group words into lines in Tesseract's reading order."""
+    return [
+        {
+            "text": " ".join(w["text"] for w in group),
+            "box": _union([w["box"] for w in group]),
+            "conf": sum(w["conf"] for w in group) / len(group),
+        }
+        for group in _line_groups(words)
+    ]
+
+
+def words_text(words: Sequence[Word]) -> str:
+    """Plain text of ``words``, one line per Tesseract line."""
+    return "\n".join(line["text"] for line in words_to_lines(words))
+
+
+def _line_weakness(group: Sequence[Word], low_confidence: float) -> Optional[float]:
+    """Return the line's lowest digit-word confidence when it needs a re-read, else None."""
+    digit_words = [w for w in group if any(c.isdigit() for c in w["text"])]
+    if not digit_words:
+        return None
+    text = " ".join(w["text"] for w in group)
+    worst = min(w["conf"] for w in digit_words)
+    digits = sum(c.isdigit() for c in text)
+    partial = digits >= PARTIAL_CODE_DIGITS and not CODE_PATTERN.search(text)
+    if partial or worst < low_confidence:
+        return worst
+    return None
+
+
+def _pad(box: Box, width: int, height: int) -> Box:
+    x0, y0, x1, y1 = box
+    pad = int(round((y1 - y0) * REGION_PADDING))
+    return (
+        max(0, x0 - 2 * pad),
+        max(0, y0 - pad),
+        min(width, x1 + 2 * pad),
+        min(height, y1 + pad),
+    )
+
+
+def _merge_boxes(boxes: List[Box]) -> List[Box]:
+    merged: List[Box] = []
+    for box in boxes:
+        for i, other in enumerate(merged):
+            if box[0] < other[2] and other[0] < box[2]:
+                if box[1] < other[3] and other[1] < box[3]:
+                    merged[i] = _union([box, other])
+                    break
+        else:
+            merged.append(box)
+    return merged
+
+
+def _region_of(box: Box, regions: Sequence[Box]) -> Optional[Box]:
+    """The region holding the centre of ``box``, if any."""
+    cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    for region in regions:
+        if region[0] <= cx < region[2] and region[1] <= cy < region[3]:
+            return region
+    return None
+
+
+def weak_regions(
+    words: Sequence[Word],
+    image_size: Tuple[int, int],
+    low_confidence: float = LOW_CONFIDENCE,
+    max_regions: int = MAX_REGIONS,
+) -> List[Box]:
+    """
+    Find the lines worth re-reading: digit words below ``low_confidence`` or a
+    partial code (many digits, no complete 16-digit code).
+
+    Args:
+        words (Sequence[Word]): First-pass words.
+        image_size (Tuple[int, int]): ``(width, height)`` of the OCRed image.
+        low_confidence (float): Confidence below which a digit word is suspect.
+        max_regions (int): Keep at most this many regions, least confident first.
+
+    Returns:
+        List[Box]: Padded, non-overlapping regions in image coordinates.
+    """
+    width, height = image_size
+    weak = []
+    for group in _line_groups(words):
+        worst = _line_weakness(group, low_confidence)
+        if worst is not None:
+            box = _pad(_union([w["box"] for w in group]), width, height)
+            weak.append((worst, box))
+    weak.sort(key=lambda item: item[0])
+    return _merge_boxes([box for _, box in weak[:max_regions]])
+
+
+def heavy_preprocess(region: np.ndarray) -> np.ndarray:
+    """
+    Pre-process a small region harder than the full image can afford.
+
+    Upscales 2x, equalizes local contrast (CLAHE), binarizes with Otsu and adds a
+    white border, which Tesseract's line mode needs around the text.
+    """
+    gray = region if region.ndim == 2 else cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    gray = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4)).apply(gray)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Tesseract expects dark text on a light background
+    if np.count_nonzero(binary) < binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+    return cv2.copyMakeBorder(binary, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+
+
+def tesseract_region(region: np.ndarray) -> str:
+    """Default ``RegionReader``: heavy pre-processing, then Tesseract in digit line mode."""
+    import pytesseract
+
+    return pytesseract.image_to_string(
+        heavy_preprocess(region), lang="eng", config=REFINE_CONFIG
+    ).strip()
+
+
+def refine(
+    image: np.ndarray,
+    words: Sequence[Word],
+    reread: Optional[RegionReader] = None,
+    low_confidence: float = LOW_CONFIDENCE,
+    max_regions: int = MAX_REGIONS,
+) -> RefineResult:
+    """
+    Re-OCR only the weak regions of a first pass and substitute their text.
+
+    Every weak line inside a region that was re-read is replaced by the
+    region's text, so a misread that still looks like a code is not passed
+    on; weak lines whose re-read came back empty are kept.
+
+    Args:
+        image (np.ndarray): The image the words were read from (BGR or gray).
+        words (Sequence[Word]): First-pass words, e.g. from ``tesseract_words``.
+        reread (Optional[RegionReader]): OCR for one region; defaults to
+            ``tesseract_region``. Pass another engine to cross-check.
+        low_confidence (float): See ``weak_regions``.
+        max_regions (int): See ``weak_regions``.
+
+    Returns:
+        RefineResult: The combined text, the re-read regions and their texts.
+    """
+    reread = reread or tesseract_region
+    height, width = image.shape[:2]
+    with span("refine.regions") as s:
+        regions = weak_regions(words, (width, height), low_confidence, max_regions)
+        CROP_COUNT.observe(len(regions), stage="refine")
+        texts = []
+        replaced: Dict[Box, str] = {}
+        for region in regions:
+            x0, y0, x1, y1 = region
+            with span("refine.reread", width=x1 - x0, height=y1 - y0):
+                region_text = reread(image[y0:y1, x0:x1]).strip()
+            if region_text:
+                texts.append(region_text)
+                replaced[region] = region_text
+        s.set_attributes(regions=len(regions), reread=len(texts))
+    lines: List[str] = []
+    used: Set[Box] = set()
+    for group in _line_groups(words):
+        region = None
+        if _line_weakness(group, low_confidence) is not None:
+            region = _region_of(_union([w["box"] for w in group]), list(replaced))
+        if region is None:
+            lines.append(" ".join(w["text"] for w in group))
+        elif region not in used:
+            # The region's text stands in for all of its weak lines, once
+            used.add(region)
+            lines.append(replaced[region])
+    return {
+        "text": "\n".join(lines),
+        "regions": regions,
+        "region_texts": texts,
+    }
@@ -0,0 +1,274 @@
+import math
+import os
+import sys
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.decoders import Buffer, as_buffer, decode_image, image_size, sniff_format
+from src.utils.tracing import span
+
+# Dominant character height (px) each engine reads best at. Tesseract is most
+# accurate with ~30px capitals; CRAFT/CRNN in EasyOCR is trained on similar sizes.
+TARGET_CHAR_HEIGHT = {"tesseract": 32, "easyocr": 32}
+DEFAULT_TARGET_CHAR_HEIGHT = 32
+# Longest side of the thumbnail used for the connected-component pass
+THUMBNAIL_MAX_SIDE = 1000
+# Scale changes smaller than this are not worth a resize
+SCALE_TOLERANCE = 0.15
+MIN_SCALE = 0.2
+MAX_SCALE = 3.0
+# Pixels one memory-bounded job may hold per image (about 12 MB gray, 36 MB BGR)
+DEFAULT_MAX_PIXELS = 12_000_000
+
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+_REDUCED_GRAY_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _component_sizes(gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sizes and areas of connected components that are shaped like characters."""
+    # Adaptive threshold copes with the uneven lighting of phone photos
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 31, 15
+    )
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    stats = stats[1:]
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    areas = stats[:, cv2.CC_STAT_AREA]
+    # The longer side of a glyph is its height whether or not the photo is rotated
+    sizes = np.maximum(widths, heights)
+    thinness = np.minimum(widths, heights) / np.maximum(sizes, 1)
+    fill = areas / np.maximum(widths * heights, 1)
+    keep = (
+        (sizes >= 6)
+        & (sizes <= max(gray.shape[:2]) * 0.25)
+        & (thinness >= 0.15)
+        & (fill >= 0.1)
+        & (fill <= 0.95)
+    )
+    return sizes[keep], areas[keep]
+
+
+def estimate_char_height(
+    image: np.ndarray, thumbnail_max_side: int = THUMBNAIL_MAX_SIDE
+) -> Optional[float]:
+    """
+    Estimate the dominant character height of ``image`` in full-resolution pixels.
+
+    Runs an adaptive threshold and a connected-component pass on a thumbnail,
+    keeps components shaped like glyphs and takes the size that covers the most
+    ink (so speckle noise does not outvote real characters). When the thumbnail
+    leaves too few glyphs to measure, the pass is repeated at twice the resolution.
+
+    Returns:
+        Optional[float]: Height in pixels, or None when no text-like components exist.
+    """
+    gray = _to_gray(image)
+    longest = max(gray.shape[:2])
+    side = thumbnail_max_side
+    while True:
+        scale = min(1.0, side / longest)
+        thumb = (
+            cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            if scale < 1.0
+            else gray
+        )
+        sizes, areas = _component_sizes(thumb)
+        if len(sizes) >= 8 or scale >= 1.0:
+            break
+        side *= 2
+    if len(sizes) < 3:
+        return None
+    mode = int(np.bincount(sizes, weights=areas).argmax())
+    band = sizes[(sizes >= mode * 0.8) & (sizes <= mode * 1.25)]
+    return float(np.median(band)) / scale
+
+
+def rescale_factor(
+    char_height: Optional[float],
+    target_char_height: float = DEFAULT_TARGET_CHAR_HEIGHT,
+) -> float:
+    """Scale that brings ``char_height`` to the target, clamped to a sane range."""
+    if not char_height:
+        return 1.0
+    scale = target_char_height / char_height
+    scale = min(MAX_SCALE, max(MIN_SCALE, scale))
+    return 1.0 if abs(scale - 1.0) < SCALE_TOLERANCE else scale
+
+
+def resize(image: np.ndarray, scale: float) -> np.ndarray:
+    """Resize with INTER_AREA when shrinking and INTER_CUBIC when enlarging."""
+    if scale == 1.0:
+        return image
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def rescale_for_ocr(
+    image: np.ndarray, target_char_height: float = DEFAULT_TARGET_CHAR_HEIGHT
+) -> Tuple[np.ndarray, float]:
+    """
+    Resize ``image`` so its dominant characters are about ``target_char_height`` px.
+
+    Large photos are shrunk instead of OCRed at full resolution, and small inputs
+    are only enlarged as much as needed. Images without measurable text are
+    returned unchanged.
+
+    Returns:
+        Tuple[np.ndarray, float]: The (possibly) resized image and the scale applied.
+    """
+    with span("rescale.estimate") as s:
+        char_height = estimate_char_height(image)
+        scale = rescale_factor(char_height, target_char_height)
+        s.set_attributes(char_height=char_height, scale=scale)
+    if scale == 1.0:
+        return image, 1.0
+    with span("rescale.resize", scale=scale):
+        return resize(image, scale), scale
+
+
+def reduction_for_scale(scale: float) -> int:
+    """Largest JPEG DCT reduction (1, 2, 4 or 8) that does not go below ``scale``."""
+    for factor in (8, 4, 2):
+        if scale <= 1.0 / factor:
+            return factor
+    return 1
+
+
+def decode_for_ocr(
+    data: Buffer,
+    target_char_height: float = DEFAULT_TARGET_CHAR_HEIGHT,
+) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Decode an encoded image straight to OCR resolution.
+
+    Large JPEGs are first decoded at a reduced scale (cheap: libjpeg skips most of
+    the IDCT) that still leaves a ~1000px image to measure the character height on;
+    images that will be shrunk are then decoded with ``IMREAD_REDUCED_COLOR_{2,4,8}``
+    and only the remaining factor is resized. Other formats, and JPEGs too small
+    for a useful probe, are decoded at full size and rescaled.
+
+    Returns:
+        Tuple[Optional[np.ndarray], float]: BGR image (None if undecodable) and the
+        overall scale relative to the original resolution.
+    """
+    buf = as_buffer(data)
+    fmt = sniff_format(buf)
+    probe = _probe_reduction(buf) if fmt == "jpeg" else 1
+    if probe > 1:
+        with span("rescale.probe", decoder="cv2", reduction=probe):
+            thumb = cv2.imdecode(buf, _REDUCED_FLAGS[probe])
+        if thumb is not None:
+            char_height = estimate_char_height(thumb)
+            scale = rescale_factor(
+                char_height * probe if char_height else None, target_char_height
+            )
+            factor = reduction_for_scale(scale)
+            if factor == probe:
+                image = thumb
+            else:
+                with span("rescale.decode", decoder="cv2", reduction=factor):
+                    image = cv2.imdecode(
+                        buf, _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR)
+                    )
+            if image is not None:
+                return resize(image, scale * factor), scale
+    try:
+        image = decode_image(buf, fmt)
+    except ValueError:
+        return None, 1.0
+    return rescale_for_ocr(image, target_char_height)
+
+
+def _probe_reduction(buf: np.ndarray) -> int:
+    """Largest JPEG reduction whose output is still big enough to measure glyphs."""
+    size = image_size(buf)
+    if not size:
+        return 1
+    for factor in (8, 4, 2):
+        if max(size) / factor >= THUMBNAIL_MAX_SIDE:
+            return factor
+    return 1
+
+
+def budget_scale(width: int, height: int, max_pixels: int) -> float:
+    """Scale that brings a ``width`` x ``height`` image within ``max_pixels``."""
+    pixels = width * height
+    if not max_pixels or pixels <= max_pixels:
+        return 1.0
+    return math.sqrt(max_pixels / pixels)
+
+
+def fit_pixel_budget(image: np.ndarray, max_pixels: int) -> Tuple[np.ndarray, float]:
+    """
+    Shrink ``image`` to at most ``max_pixels`` pixels (channels not counted).
+
+    Returns:
+        Tuple[np.ndarray, float]: The image (unchanged when it fits) and the scale.
+    """
+    height, width = image.shape[:2]
+    scale = budget_scale(width, height, max_pixels)
+    if scale == 1.0:
+        return image, 1.0
+    with span("rescale.budget", scale=scale, max_pixels=max_pixels):
+        # Round down so the result never exceeds the budget
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def decode_within_budget(
+    data: Buffer, max_pixels: int = DEFAULT_MAX_PIXELS, gray: bool = False
+) -> np.ndarray:
+    """
+    Decode an encoded image without ever holding more than about ``max_pixels``.
+
+    JPEGs over the budget are decoded at the largest 1/2, 1/4 or 1/8 reduction
+    that still covers it, so the full-size array is never allocated. With
+    ``gray`` OpenCV decodes straight to one channel, a third of the BGR size;
+    other decoders convert right after decoding.
+
+    Returns:
+        np.ndarray: Gray (``gray``) or BGR image of at most ``max_pixels`` pixels.
+
+    Raises:
+        ValueError: If the data cannot be decoded.
+    """
+    buf = as_buffer(data)
+    fmt = sniff_format(buf)
+    size = image_size(buf)
+    scale = budget_scale(size[0], size[1], max_pixels) if size else 1.0
+    factor = reduction_for_scale(scale) if fmt == "jpeg" else 1
+    image = None
+    if factor > 1 or gray:
+        flags = _REDUCED_GRAY_FLAGS if gray else _REDUCED_FLAGS
+        with span("rescale.decode", decoder="cv2", reduction=factor, gray=gray):
+            try:
+                image = cv2.imdecode(buf, flags[factor])
+            except cv2.error:
+                image = None
+    if image is None:
+        image = decode_image(buf, fmt)
+        if gray:
+            image = _to_gray(image)
+    return fit_pixel_budget(image, max_pixels)[0]
@@ -0,0 +1,248 @@
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple, TypedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.tracing import span
+
+# A voucher code ("1234 5678 9012 3456") is about this many code heights wide
+CODE_WIDTH_RATIO = 12
+# Tiles are at least this many overlaps wide, so most of each tile is new pixels
+TILE_OVERLAP_FACTOR = 4
+MIN_TILE_SIZE = 512
+# Lines closer than this to an inner tile edge may be cut by the seam
+EDGE_MARGIN = 2
+# Two lines are the same when this share of the smaller box lies in the other
+SAME_LINE_OVERLAP = 0.5
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1 in pixels, exclusive end
+
+
+class TextLine(TypedDict):
+    text: str
+    box: Box
+    conf: float  # mean word confidence, 0..100 (-1 when the engine gives none)
+
+
+class TiledLine(TextLine):
+    tile: str
+    clipped: bool  # touches an inner tile edge, so it may be cut off
+
+
+# OCR for one tile: pixels in, lines with tile-local boxes out
+LineReader = Callable[[np.ndarray], List[TextLine]]
+
+
+class Tile(NamedTuple):
+    """A pixel region of the full image; tiles overlap so no code is cut in all of them."""
+
+    name: str
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    def view(self, image: np.ndarray) -> np.ndarray:
+        """Return the tile as a view of ``image`` (no pixels are copied)."""
+        return image[self.y0 : self.y1, self.x0 : self.x1]
+
+    def to_global(self, box: Box) -> Box:
+        x0, y0, x1, y1 = box
+        return x0 + self.x0, y0 + self.y0, x1 + self.x0, y1 + self.y0
+
+
+def tile_geometry(code_height: float) -> Tuple[int, int]:
+    """
+    Size tiles for codes about ``code_height`` pixels tall.
+
+    The overlap is one code width, so any code shorter than that lies whole in at
+    least one tile.
+
+    Returns:
+        Tuple[int, int]: ``(tile_size, overlap)`` in pixels.
+    """
+    overlap = int(math.ceil(code_height * CODE_WIDTH_RATIO))
+    return max(MIN_TILE_SIZE, overlap * TILE_OVERLAP_FACTOR), overlap
+
+
+def _starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    step = tile_size - overlap
+    count = int(math.ceil((length - tile_size) / step)) + 1
+    # Spread the tiles evenly so the last one ends on the image edge
+    return [round(i * (length - tile_size) / (count - 1)) for i in range(count)]
+
+
+def tile_plan(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """
+    Cover a ``width`` x ``height`` image with square tiles overlapping by at least ``overlap``.
+
+    Raises:
+        ValueError: If ``overlap`` is negative or not smaller than ``tile_size``.
+    """
+    if not 0 <= overlap < tile_size:
+        raise ValueError(
+            f"Tile overlap must be in [0, {tile_size}), got {overlap} for size {tile_size}"
+        )
+    tiles = []
+    for row, y in enumerate(_starts(height, tile_size, overlap)):
+        for col, x in enumerate(_starts(width, tile_size, overlap)):
+            tiles.append(
+                Tile(
+                    f"tile_{row}_{col}",
+                    x,
+                    y,
+                    min(width, x + tile_size),
+                    min(height, y + tile_size),
+                )
+            )
+    return tiles
+
+
+def _is_clipped(box: Box, tile: Tile, width: int, height: int) -> bool:
+    x0, y0, x1, y1 = box
+    return (
+        (tile.x0 > 0 and x0 - tile.x0 <= EDGE_MARGIN)
+        or (tile.y0 > 0 and y0 - tile.y0 <= EDGE_MARGIN)
+        or (tile.x1 < width and tile.x1 - x1 <= EDGE_MARGIN)
+        or (tile.y1 < height and tile.y1 - y1 <= EDGE_MARGIN)
+    )
+
+
+def _overlap_ratio(a: Box, b: Box) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return w * h / smaller if smaller else 0.0
+
+
+def merge_tile_lines(lines: Sequence[TiledLine]) -> List[TiledLine]:
+    """
+    De-duplicate lines read more than once where tiles overlap.
+
+    Lines whose boxes mostly overlap are the same physical line. Of each group the
+    line that is not cut by a tile edge wins, then the longest text, then the higher
+    confidence. The result is in reading order (top to bottom, left to right).
+    """
+
+    def rank(line: TiledLine):
+        return (not line["clipped"], len(line["text"].strip()), line["conf"])
+
+    kept: List[TiledLine] = []
+    for line in sorted(lines, key=rank, reverse=True):
+        if not any(
+            _overlap_ratio(line["box"], other["box"]) >= SAME_LINE_OVERLAP
+            for other in kept
+        ):
+            kept.append(line)
+    return sorted(kept, key=lambda line: (line["box"][1], line["box"][0]))
+
+
+def merge_tile_boxes(
+    boxes: Sequence[Tuple[Box, Tile]], width: int, height: int
+) -> List[int]:
+    """
+    De-duplicate text boxes detected more than once where tiles overlap.
+
+    Like ``merge_tile_lines`` for detections that have no text yet: boxes are
+    ``(global box, tile it was found in)`` pairs, and of each overlapping group
+    the box not cut by a seam, then the largest, wins.
+
+    Returns:
+        List[int]: Indexes of the kept boxes, in reading order.
+    """
+
+    def rank(i: int):
+        box, tile = boxes[i]
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        return (not _is_clipped(box, tile, width, height), area)
+
+    kept: List[int] = []
+    for i in sorted(range(len(boxes)), key=rank, reverse=True):
+        if not any(
+            _overlap_ratio(boxes[i][0], boxes[j][0]) >= SAME_LINE_OVERLAP for j in kept
+        ):
+            kept.append(i)
+    return sorted(kept, key=lambda i: (boxes[i][0][1], boxes[i][0][0]))
+
+
+def ocr_tiles(
+    image: np.ndarray,
+    read_lines: LineReader,
+    tile_size: int,
+    overlap: int,
+    workers: int = 4,
+) -> List[TiledLine]:
+    """
+    OCR ``image`` tile by tile in parallel and merge the lines across seams.
+
+    Tiles are views of ``image``; each worker only holds the buffer its engine
+    needs for one tile, so peak memory grows with ``workers`` x tile size, not
+    with the image.
+
+    Args:
+        image (np.ndarray): Pre-processed image.
+        read_lines (LineReader): OCR for one tile, returning lines with tile-local boxes.
+        tile_size (int): Tile side in pixels (see ``tile_geometry``).
+        overlap (int): Minimum overlap between neighbouring tiles in pixels.
+        workers (int): Tiles OCRed concurrently.
+
+    Returns:
+        List[TiledLine]: De-duplicated lines with boxes in image coordinates.
+    """
+    height, width = image.shape[:2]
+    tiles = tile_plan(width, height, tile_size, overlap)
+
+    def run(tile: Tile) -> List[TiledLine]:
+        with span("tiling.ocr", tile=tile.name):
+            lines = read_lines(tile.view(image))
+        placed = []
+        for line in lines:
+            box = tile.to_global(line["box"])
+            placed.append(
+                {
+                    "text": line["text"],
+                    "box": box,
+                    "conf": line["conf"],
+                    "tile": tile.name,
+                    "clipped": _is_clipped(box, tile, width, height),
+                }
+            )
+        return placed
+
+    with span("tiling.ocr_tiles", tiles=len(tiles), tile_size=tile_size) as s:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tiles)))) as pool:
+            found = [line for lines in pool.map(run, tiles) for line in lines]
+        merged = merge_tile_lines(found)
+        s.set_attributes(lines=len(found), merged=len(merged))
+    return merged
+
+
+def lines_text(lines: Sequence[TextLine]) -> str:
+    """Join lines into plain text in the given order."""
+    return "\n".join(line["text"] for line in lines if line["text"].strip())
+
+
+def ocr_tiled(
+    image: np.ndarray,
+    read_lines: LineReader,
+    code_height: float,
+    tile_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    workers: int = 4,
+) -> List[TiledLine]:
+    """``ocr_tiles`` with tile size and overlap defaulting to ``tile_geometry(code_height)``."""
+    default_size, default_overlap = tile_geometry(code_height)
+    tile_size = tile_size or default_size
+    if overlap is None:
+        # A small explicit tile cannot take a full code width of overlap
+        overlap = min(default_overlap, tile_size // 2)
+    return ocr_tiles(image, read_lines, tile_size, overlap, workers)
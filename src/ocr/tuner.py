@@ -0,0 +1,504 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypedDict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.crop_plan import crop_plan, iter_crops
+from src.ocr.preprocess import CHAINS, Preprocessor
+from src.ocr.refine import (
+    CODE_PATTERN,
+    refine,
+    tesseract_words,
+    words_text,
+    words_to_lines,
+)
+from src.ocr.rescale import DEFAULT_TARGET_CHAR_HEIGHT, decode_for_ocr
+from src.ocr.tiling import lines_text, ocr_tiled
+from src.utils.console import safe_print
+from src.utils.file import get_relative_path
+from src.utils.tracing import span
+
+DEFAULT_PROFILES_PATH = "data/ocr_profiles.json"
+# Labeled by test/ocr/recogizeImage2.test.js: expected.json lists the codes on this image
+DEFAULT_LABEL_IMAGE = "test/fixtures/voucher-fix.jpeg"
+DEFAULT_LABEL_CODES = "test/fixtures/expected.json"
+# Profile name -> share of the best recall it must reach; the cheapest such config wins
+PROFILE_TARGETS = {"fast": 0.8, "balanced": 0.95, "thorough": 1.0}
+# Recall every profile must reach however badly the whole search space did;
+# a profile no config reaches is not written (the builtin one stays in use)
+MIN_RECALL = 0.75
+
+
+class TuneConfig(TypedDict):
+    engine: str  # "tesseract" or "easyocr"
+    psm: int  # Tesseract page segmentation mode (0 for easyocr)
+    oem: int  # Tesseract engine mode (0 for easyocr)
+    chain: str  # preprocessing chain, see preprocess.CHAINS
+    crops: str  # crop plan name (see crop_plan.PLANS) or "tiles"
+    refine: bool  # re-OCR low-confidence lines (tesseract, non-tiled only)
+
+
+class Sample(TypedDict):
+    source: str
+    codes: List[str]
+
+
+class Trial(TypedDict):
+    name: str
+    config: TuneConfig
+    recall: float
+    precision: float
+    seconds: float  # mean per image: decode + preprocessing + OCR
+    found: int
+    expected: int
+
+
+# Used until the tuner has written a profiles file
+BUILTIN_PROFILES: Dict[str, TuneConfig] = {
+    "fast": {
+        "engine": "tesseract",
+        "psm": 6,
+        "oem": 3,
+        "chain": "cli",
+        "crops": "full",
+        "refine": False,
+    },
+    "balanced": {
+        "engine": "tesseract",
+        "psm": 6,
+        "oem": 3,
+        "chain": "cli",
+        "crops": "full",
+        "refine": True,
+    },
+    "thorough": {
+        "engine": "tesseract",
+        "psm": 6,
+        "oem": 3,
+        "chain": "cli",
+        "crops": "focus",
+        "refine": True,
+    },
+}
+
+SEARCH_SPACE: Dict[str, list] = {
+    "engine": ["tesseract"],
+    "psm": [3, 6, 11],
+    "oem": [1, 3],
+    "chain": ["none", "cli", "cli_sharp", "focus"],
+    "crops": ["full", "halves", "focus", "tiles"],
+    "refine": [False, True],
+}
+
+
+def config_name(config: TuneConfig) -> str:
+    parts = [config["engine"]]
+    if config["engine"] == "tesseract":
+        parts += [f"psm{config['psm']}", f"oem{config['oem']}"]
+    parts += [config["chain"], config["crops"]]
+    if config["refine"]:
+        parts.append("refine")
+    return "-".join(parts)
+
+
+def iter_configs(space: Optional[Dict[str, list]] = None) -> Iterable[TuneConfig]:
+    """
+    Yield every distinct configuration of ``space`` (default ``SEARCH_SPACE``).
+
+    Settings an engine ignores are normalized away so each configuration is
+    measured once: easyocr has no PSM/OEM or refinement, and tiles skip refinement.
+    """
+    space = {**SEARCH_SPACE, **(space or {})}
+    engines = [
+        engine
+        for engine in space["engine"]
+        if engine != "easyocr" or find_spec("easyocr") is not None
+    ]
+    seen = set()
+    keys = ("engine", "psm", "oem", "chain", "crops", "refine")
+    values = [engines] + [space[key] for key in keys[1:]]
+    for combo in itertools.product(*values):
+        config: TuneConfig = dict(zip(keys, combo))  # type: ignore[assignment]
+        if config["engine"] == "easyocr":
+            config.update(psm=0, oem=0, refine=False)
+        if config["crops"] == "tiles":
+            config["refine"] = False
+        name = config_name(config)
+        if name not in seen:
+            seen.add(name)
+            yield config
+
+
+def normalize_code(code: str) -> str:
+    return "".join(code.split())
+
+
+def find_codes(text: str) -> List[str]:
+    """Voucher codes in ``text``, normalized and de-duplicated in order."""
+    return list(dict.fromkeys(normalize_code(m) for m in CODE_PATTERN.findall(text)))
+
+
+def _read_easyocr(image: np.ndarray) -> str:
+    from src.ocr.easyocr_impl import get_reader
+
+    # EasyOCR reads arrays as RGB
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image.ndim == 3 else image
+    return "\n".join(get_reader(["en"], gpu=False).readtext(rgb, detail=0))
+
+
+def tesseract_options(config: TuneConfig) -> str:
+    """Tesseract command-line options (PSM and OEM) of ``config``."""
+    return f"--psm {config['psm']} --oem {config['oem']}"
+
+
+def ocr_with_config(image: np.ndarray, config: TuneConfig) -> str:
+    """
+    OCR a preprocessed image the way ``config`` says (engine, PSM/OEM, crops,
+    refinement) and return the merged text.
+    """
+    if config["engine"] == "easyocr":
+        read = _read_easyocr
+    else:
+        tesseract = tesseract_options(config)
+        if config["crops"] == "tiles":
+            lines = ocr_tiled(
+                image,
+                lambda tile: words_to_lines(tesseract_words(tile, config=tesseract)),
+                DEFAULT_TARGET_CHAR_HEIGHT,
+            )
+            return lines_text(lines)
+
+        def read(view: np.ndarray) -> str:
+            words = tesseract_words(view, config=tesseract)
+            if config["refine"]:
+                return refine(view, words)["text"]
+            return words_text(words)
+
+    if config["crops"] == "tiles":
+        # Tiling is a Tesseract line-box feature; other engines read the full image
+        return read(image)
+    return "\n".join(
+        read(view) for _, view in iter_crops(image, crop_plan(config["crops"]))
+    )
+
+
+def load_labels(path: Optional[str] = None) -> List[Sample]:
+    """
+    Load the labeled images to tune on.
+
+    Without ``path`` the repository fixture is used (``voucher-fix.jpeg`` with the
+    codes of ``expected.json``). Otherwise ``path`` is a JSONL file of
+    ``{"path" | "image" | "source": ..., "codes": [...]}`` lines; relative paths
+    are resolved against the file's directory.
+
+    Raises:
+        ValueError: If a line has no image or no codes.
+    """
+    if path is None:
+        with open(get_relative_path(DEFAULT_LABEL_CODES), "r", encoding="utf-8") as f:
+            pairs = json.load(f)
+        codes = [normalize_code(code) for pair in pairs for code in pair.values()]
+        return [{"source": get_relative_path(DEFAULT_LABEL_IMAGE), "codes": codes}]
+    base_dir = os.path.dirname(os.path.abspath(path))
+    samples: List[Sample] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            source = entry.get("path") or entry.get("image") or entry.get("source")
+            if not source or not entry.get("codes"):
+                raise ValueError(f"{path}:{number}: expected an image and its codes")
+            if not os.path.isabs(source):
+                source = os.path.join(base_dir, source)
+            codes = [normalize_code(code) for code in entry["codes"]]
+            samples.append({"source": source, "codes": codes})
+    return samples
+
+
+def tune(
+    samples: Sequence[Sample],
+    configs: Iterable[TuneConfig],
+    ocr: Callable[[np.ndarray, TuneConfig], str] = ocr_with_config,
+    on_trial: Optional[Callable[[Trial], None]] = None,
+) -> List[Trial]:
+    """
+    Measure recall, precision and latency of every config on ``samples``.
+
+    Each image is decoded once; its preprocessing chains are memoized, so
+    configs sharing a chain prefix reuse it. Latency still counts the full cost
+    of every step (see ``StepTiming["cost"]``), as a production run would pay it.
+
+    Args:
+        samples (Sequence[Sample]): Labeled images.
+        configs (Iterable[TuneConfig]): Configurations to try.
+        ocr (Callable): Runs one config on a preprocessed image; defaults to
+            ``ocr_with_config``.
+        on_trial (Optional[Callable]): Called with each finished trial.
+
+    Returns:
+        List[Trial]: One trial per config, in the order given.
+    """
+    configs = list(configs)
+    totals = {
+        config_name(c): {"found": 0, "reported": 0, "correct": 0, "seconds": 0.0}
+        for c in configs
+    }
+    expected = 0
+    for sample in samples:
+        expected += len(set(sample["codes"]))
+        started = time.perf_counter()
+        with open(sample["source"], "rb") as f:
+            image, _ = decode_for_ocr(f.read(), DEFAULT_TARGET_CHAR_HEIGHT)
+        if image is None:
+            raise ValueError(f"Could not decode labeled image: {sample['source']}")
+        decode_seconds = time.perf_counter() - started
+        preprocessor = Preprocessor(memo_size=4 * len(CHAINS))
+        for config in configs:
+            with span("tuner.trial", config=config_name(config)):
+                result = preprocessor.run(image, config["chain"], key=sample["source"])
+                started = time.perf_counter()
+                codes = set(find_codes(ocr(result["image"], config)))
+                ocr_seconds = time.perf_counter() - started
+            total = totals[config_name(config)]
+            total["correct"] += len(codes & set(sample["codes"]))
+            total["reported"] += len(codes)
+            total["seconds"] += (
+                decode_seconds + sum(t["cost"] for t in result["timings"]) + ocr_seconds
+            )
+
+    trials: List[Trial] = []
+    for config in configs:
+        total = totals[config_name(config)]
+        trial: Trial = {
+            "name": config_name(config),
+            "config": config,
+            "recall": total["correct"] / expected if expected else 0.0,
+            "precision": (
+                total["correct"] / total["reported"] if total["reported"] else 0.0
+            ),
+            "seconds": total["seconds"] / max(1, len(samples)),
+            "found": total["correct"],
+            "expected": expected,
+        }
+        trials.append(trial)
+        if on_trial:
+            on_trial(trial)
+    return trials
+
+
+def pareto_front(trials: Sequence[Trial]) -> List[Trial]:
+    """
+    Trials no other trial beats on both recall and latency, fastest first.
+
+    Ties in latency are broken by precision, so among equally fast configs the
+    one reporting fewer false codes is kept.
+    """
+    ordered = sorted(
+        trials, key=lambda t: (t["seconds"], -t["recall"], -t["precision"])
+    )
+    front: List[Trial] = []
+    for trial in ordered:
+        if not front or trial["recall"] > front[-1]["recall"]:
+            front.append(trial)
+    return front
+
+
+def choose_profiles(
+    trials: Sequence[Trial],
+    targets: Optional[Dict[str, float]] = None,
+    min_recall: float = MIN_RECALL,
+) -> Dict[str, Trial]:
+    """
+    Pick the cheapest Pareto-optimal trial reaching each profile's target.
+
+    Targets are shares of the best recall measured (``PROFILE_TARGETS``), so
+    ``thorough`` is the cheapest config with the best recall. Every profile
+    must also reach ``min_recall`` outright: when the whole search space does
+    badly, a share of the best would still be a poor profile. Profiles no
+    trial qualifies for are left out.
+    """
+    front = pareto_front(trials)
+    if not front:
+        return {}
+    best = front[-1]["recall"]
+    profiles = {}
+    for name, target in (targets or PROFILE_TARGETS).items():
+        floor = max(target * best, min_recall) - 1e-9
+        trial = next((t for t in front if t["recall"] >= floor), None)
+        if trial is not None:
+            profiles[name] = trial
+    return profiles
+
+
+def save_profiles(
+    profiles: Dict[str, Trial],
+    front: Sequence[Trial],
+    path: str = DEFAULT_PROFILES_PATH,
+) -> str:
+    """Write the chosen profiles and the Pareto front as JSON; returns the path."""
+    path = get_relative_path(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    document = {
+        "profiles": {name: trial["config"] for name, trial in profiles.items()},
+        "measured": {name: _summary(trial) for name, trial in profiles.items()},
+        "front": [_summary(trial) for trial in front],
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _summary(trial: Trial) -> dict:
+    return {
+        "name": trial["name"],
+        "recall": round(trial["recall"], 4),
+        "precision": round(trial["precision"], 4),
+        "seconds": round(trial["seconds"], 4),
+    }
+
+
+# Profiles file path -> ((mtime_ns, size) or None when missing, its profiles)
+_profiles_cache: Dict[str, Tuple[Optional[Tuple[int, int]], Dict[str, TuneConfig]]] = {}
+_profiles_lock = threading.Lock()
+
+
+def load_profiles(path: str = DEFAULT_PROFILES_PATH) -> Dict[str, TuneConfig]:
+    """
+    Tuned profiles from ``path`` layered over ``BUILTIN_PROFILES``.
+
+    Batch runs look a profile up per image, so the file is parsed again only
+    when its mtime or size changed.
+    """
+    path = get_relative_path(path)
+    try:
+        stat = os.stat(path)
+        version: Optional[Tuple[int, int]] = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = None
+    with _profiles_lock:
+        cached = _profiles_cache.get(path)
+    if cached is not None and cached[0] == version:
+        return dict(cached[1])
+    profiles = dict(BUILTIN_PROFILES)
+    if version is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles.update(json.load(f).get("profiles", {}))
+    with _profiles_lock:
+        _profiles_cache[path] = (version, profiles)
+    return dict(profiles)
+
+
+def load_profile(name: str, path: str = DEFAULT_PROFILES_PATH) -> TuneConfig:
+    """
+    Look up a named profile.
+
+    Raises:
+        ValueError: If no such profile exists.
+    """
+    profiles = load_profiles(path)
+    try:
+        return profiles[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown OCR profile: {name} (known: {', '.join(sorted(profiles))})"
+        )
+
+
+def _csv(value: str, cast=str) -> list:
+    return [cast(item) for item in value.split(",") if item]
+
+
+def _targets(value: str) -> Dict[str, float]:
+    targets = {}
+    for item in _csv(value):
+        name, _, target = item.partition("=")
+        targets[name] = float(target)
+    return targets
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Trial]:
+    parser = argparse.ArgumentParser(
+        description="Search OCR settings on labeled images and write named profiles"
+    )
+    parser.add_argument(
+        "-l", "--labels", help="JSONL of {path, codes} (default: the test fixture)"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=DEFAULT_PROFILES_PATH,
+        help=f"Profiles file to write (default: {DEFAULT_PROFILES_PATH})",
+    )
+    parser.add_argument("--engines", default="tesseract,easyocr")
+    parser.add_argument("--psm", default="3,6,11")
+    parser.add_argument("--oem", default="1,3")
+    parser.add_argument("--chains", default=",".join(SEARCH_SPACE["chain"]))
+    parser.add_argument("--crops", default=",".join(SEARCH_SPACE["crops"]))
+    parser.add_argument(
+        "--no-refine", action="store_true", help="Do not search refinement"
+    )
+    parser.add_argument(
+        "--targets",
+        default=",".join(f"{k}={v}" for k, v in PROFILE_TARGETS.items()),
+        help="Profile targets as shares of the best recall, e.g. fast=0.8,thorough=1",
+    )
+    parser.add_argument(
+        "--min-recall",
+        type=float,
+        default=MIN_RECALL,
+        help=f"Recall every profile must reach (default: {MIN_RECALL})",
+    )
+    args = parser.parse_args(argv)
+
+    space = {
+        "engine": _csv(args.engines),
+        "psm": _csv(args.psm, int),
+        "oem": _csv(args.oem, int),
+        "chain": _csv(args.chains),
+        "crops": _csv(args.crops),
+        "refine": [False] if args.no_refine else [False, True],
+    }
+    samples = load_labels(args.labels)
+    configs = list(iter_configs(space))
+    safe_print(f"🚀\tTuning {len(configs)} configurations on {len(samples)} image(s)")
+
+    def report(trial: Trial) -> None:
+        safe_print(
+            f"📊\t{trial['name']}: recall {trial['recall']:.0%}, "
+            f"precision {trial['precision']:.0%}, {trial['seconds']:.2f}s/image"
+        )
+
+    trials = tune(samples, configs, on_trial=report)
+    front = pareto_front(trials)
+    targets = _targets(args.targets)
+    profiles = choose_profiles(trials, targets, args.min_recall)
+    path = save_profiles(profiles, front, args.output)
+    for name in targets:
+        trial = profiles.get(name)
+        if trial is None:
+            safe_print(
+                f"⚠️\t{name}: no configuration reaches {args.min_recall:.0%} "
+                "recall, the builtin profile stays in use"
+            )
+        else:
+            safe_print(f"✅\t{name}: {trial['name']} ({trial['recall']:.0%} recall)")
+    safe_print(f"💾\tProfiles saved to {path}")
+    return profiles
+
+
+if __name__ == "__main__":
+    main()
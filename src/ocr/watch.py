@@ -0,0 +1,649 @@
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import multiprocessing
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TypedDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.voucher_sink import VoucherSink
+from src.ocr.batch import (
+    ENGINE_FUNCTIONS,
+    ENGINES,
+    IMAGE_EXTENSIONS,
+    BatchResult,
+    _process_in_worker,
+    default_worker_count,
+)
+from src.ocr.preprocess import CHAINS
+from src.ocr.rescale import DEFAULT_MAX_PIXELS
+from src.ocr.tuner import load_profile
+from src.utils.console import safe_print
+from src.utils.file import get_relative_path
+from src.utils.thread_budget import ThreadBudget, init_worker
+
+# Where the /upload route stores incoming images
+DEFAULT_WATCH_DIR = "tmp/uploads"
+# A file is OCRed once its size and mtime stayed the same for this many seconds
+DEFAULT_SETTLE = 1.0
+# Seconds between directory scans when inotify is not available
+DEFAULT_POLL_INTERVAL = 2.0
+# Names of files still being written by uploaders and browsers
+PARTIAL_SUFFIXES = (".part", ".tmp", ".crdownload", ".download")
+
+Signature = Tuple[int, int]  # (size, mtime_ns)
+
+
+class IndexEntry(TypedDict):
+    path: str
+    size: int
+    mtime_ns: int
+    hash: str
+    status: str  # "ok" or "error"
+    codes: List[str]
+
+
+def is_candidate(path: str) -> bool:
+    """Whether ``path`` looks like a finished image upload."""
+    name = os.path.basename(path)
+    if name.startswith(".") or name.lower().endswith(PARTIAL_SUFFIXES):
+        return False
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def content_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """BLAKE2b of the file contents, read in chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan(directory: str) -> Dict[str, Signature]:
+    """Signatures of every candidate image under ``directory`` (stat only)."""
+    found: Dict[str, Signature] = {}
+    stack = [directory]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and is_candidate(entry.path):
+                    st = entry.stat()
+                    found[os.path.abspath(entry.path)] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                # Removed while scanning
+                continue
+    return found
+
+
+class WatchIndex:
+    """
+    Persistent index of processed files: path, size, mtime, content hash, result.
+
+    Stored as append-only JSONL (the last line of a path wins) and loaded into
+    memory on start, like ``batch.Checkpoint``. A file whose size and mtime
+    match its entry is not read again; one whose stat changed but whose hash
+    did not (touched, or rewritten with the same bytes) is not OCRed again.
+    The file is compacted on open once it holds mostly superseded lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, IndexEntry] = {}
+        self.by_hash: Dict[str, str] = {}
+        lines = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted run
+                        continue
+                    self._remember(entry)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if lines > 2 * len(self.entries) + 100:
+            self._compact()
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def _remember(self, entry: IndexEntry) -> None:
+        self.entries[entry["path"]] = entry
+        if entry["status"] == "ok":
+            self.by_hash[entry["hash"]] = entry["path"]
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def get(self, path: str) -> Optional[IndexEntry]:
+        return self.entries.get(path)
+
+    def is_current(self, path: str, sig: Optional[Signature]) -> bool:
+        """Whether ``path`` was processed successfully with this signature."""
+        entry = self.entries.get(path)
+        return (
+            entry is not None
+            and entry["status"] == "ok"
+            and (entry["size"], entry["mtime_ns"]) == sig
+        )
+
+    def record(self, entry: IndexEntry) -> None:
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        self._remember(entry)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class PollingWatcher:
+    """Report created or modified images by comparing directory scans."""
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        snapshot: Optional[Dict[str, Signature]] = None,
+    ):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = dict(snapshot) if snapshot is not None else scan(directory)
+        self._next_scan = time.monotonic() + interval
+
+    def poll(self, timeout: float) -> List[str]:
+        """Wait up to ``timeout`` seconds and return paths that changed."""
+        delay = min(timeout, self._next_scan - time.monotonic())
+        if delay > 0:
+            time.sleep(delay)
+        if time.monotonic() < self._next_scan:
+            return []
+        self._next_scan = time.monotonic() + self.interval
+        current = scan(self.directory)
+        changed = [p for p, sig in current.items() if self._snapshot.get(p) != sig]
+        self._snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    Report created or modified images with Linux inotify, through ``ctypes``.
+
+    Every directory of the tree is watched; directories created later are
+    added (and scanned, since files may land in them before the watch). A
+    queue overflow falls back to one full scan.
+
+    Raises:
+        OSError: If inotify is not available (not Linux, or out of watches).
+    """
+
+    MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+    def __init__(self, directory: str):
+        name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self.directory = directory
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self._add(directory)
+        self._add_tree(directory)
+
+    def _add(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), ctypes.c_uint32(self.MASK)
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_add_watch failed: {os.strerror(error)}")
+        self._dirs[wd] = directory
+
+    def _add_tree(self, directory: str) -> None:
+        for root, _, _ in os.walk(directory):
+            try:
+                self._add(root)
+            except OSError as e:
+                # Removed since the walk listed it; otherwise (e.g. out of
+                # watches) the rest of the tree is still watched
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    safe_print(f"⚠️\tNot watching {root}: {e}")
+
+    def poll(self, timeout: float) -> List[str]:
+        """Wait up to ``timeout`` seconds and return paths that changed."""
+        readable, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed: Set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                changed.update(scan(self.directory))
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.abspath(os.path.join(directory, os.fsdecode(name)))
+            if mask & _IN_ISDIR:
+                self._add_tree(path)
+                changed.update(scan(path))
+            elif is_candidate(path):
+                changed.add(path)
+        return sorted(changed)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def make_watcher(
+    directory: str,
+    interval: float = DEFAULT_POLL_INTERVAL,
+    snapshot: Optional[Dict[str, Signature]] = None,
+    use_inotify: bool = True,
+):
+    """An ``InotifyWatcher`` where possible, a ``PollingWatcher`` otherwise."""
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            safe_print(f"⚠️\tinotify unavailable ({e}), polling every {interval}s")
+    return PollingWatcher(directory, interval, snapshot)
+
+
+class Debouncer:
+    """
+    Hold changed paths until their size and mtime stop changing.
+
+    Uploads are written in chunks; OCRing a half-written JPEG fails or, worse,
+    finds no code and marks the image done.
+    """
+
+    def __init__(self, settle: float = DEFAULT_SETTLE):
+        self.settle = settle
+        self._pending: Dict[str, Tuple[Optional[Signature], float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, path: str) -> None:
+        self._pending[path] = (signature(path), time.monotonic())
+
+    def ready(self) -> Iterator[Tuple[str, Signature]]:
+        """Yield (and forget) paths that settled, dropping deleted ones."""
+        now = time.monotonic()
+        for path, (last, since) in list(self._pending.items()):
+            sig = signature(path)
+            if sig is None:
+                del self._pending[path]
+            elif sig != last:
+                self._pending[path] = (sig, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                yield path, sig
+
+
+def watch(
+    directory: str,
+    output: str,
+    index: Optional[str] = None,
+    engine: str = "cli",
+    workers: Optional[int] = None,
+    store: bool = False,
+    settle: float = DEFAULT_SETTLE,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    preprocess_chain: Optional[str] = None,
+    max_pixels: Optional[int] = None,
+    profile: Optional[str] = None,
+    once: bool = False,
+    use_inotify: bool = True,
+    executor: Optional[Executor] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """
+    OCR images as they appear in ``directory``, resuming from a persistent index.
+
+    On start the directory is stat-scanned once and compared with the index,
+    so only files added or changed while stopped are queued; nothing already
+    processed is hashed or OCRed again. Afterwards changes come from inotify
+    (or periodic scans), are debounced until the file stops growing, and run
+    on a pool of ``batch`` workers. Results are appended to ``output`` like
+    ``batch.run_batch``; a file with the same content as one already OCRed
+    reuses its codes.
+
+    Args:
+        directory (str): Directory to watch (recursively).
+        output (str): JSONL file receiving one result line per processed file.
+        index (Optional[str]): Index file (default ``<output>.index``).
+        engine (str): One of ``batch.ENGINES``.
+        workers (Optional[int]): Worker processes (default: CPU count).
+        store (bool): Also save codes to the voucher database (see
+            ``voucher_sink.VoucherSink``).
+        settle (float): Seconds a file must stay unchanged before OCR.
+        poll_interval (float): Seconds between scans without inotify.
+        preprocess_chain (Optional[str]): Preprocessing chain name.
+        max_pixels (Optional[int]): Memory-bounded mode, see ``batch.run_batch``.
+        profile (Optional[str]): Named OCR profile, see ``batch.run_batch``.
+        once (bool): Process what is new, then return instead of watching.
+        use_inotify (bool): False forces polling (e.g. on network filesystems).
+        executor (Optional[Executor]): Pool to run OCR on (default: a process
+            pool of ``workers``).
+        stop (Optional[threading.Event]): Set to stop watching.
+
+    Returns:
+        Dict[str, int]: Counts of ``ok``, ``error``, ``unchanged`` and
+            ``duplicate`` files.
+
+    Raises:
+        ValueError: If ``engine`` is unknown or ``directory`` does not exist.
+    """
+    if engine not in ENGINE_FUNCTIONS:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if not os.path.isdir(directory):
+        raise ValueError(f"Not a directory: {directory}")
+    if profile:
+        load_profile(profile)
+    directory = os.path.abspath(directory)
+    stop = stop or threading.Event()
+    files = WatchIndex(index or f"{output}.index")
+    counts = {"ok": 0, "error": 0, "unchanged": 0, "duplicate": 0}
+    debouncer = Debouncer(settle)
+    # Started with the first result, after the process pool forked its workers
+    sink: Optional[VoucherSink] = None
+    owns_executor = executor is None
+    if owns_executor:
+        workers = workers or default_worker_count()
+        budget = ThreadBudget(workers)
+
+        def new_pool() -> Executor:
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_worker,
+                initargs=(budget, multiprocessing.Value("i", 0)),
+            )
+
+        executor = new_pool()
+    # Bound queued files so a burst of uploads streams through the pool
+    max_in_flight = (workers or 1) * 2
+    in_flight: Dict = {}  # future -> (path, signature, hash, executor)
+
+    snapshot = scan(directory)
+    for path, sig in sorted(snapshot.items()):
+        if not files.is_current(path, sig):
+            debouncer.touch(path)
+    safe_print(
+        f"👀\tWatching {directory}: {len(snapshot)} image(s), "
+        f"{len(debouncer)} new or changed"
+    )
+    watcher = (
+        None if once else make_watcher(directory, poll_interval, snapshot, use_inotify)
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    def finish(result: BatchResult, path: str, sig: Signature, digest: str) -> str:
+        nonlocal sink
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+        status = "error" if result["error"] else "ok"
+        files.record(
+            {
+                "path": path,
+                "size": sig[0],
+                "mtime_ns": sig[1],
+                "hash": digest,
+                "status": status,
+                "codes": result["codes"],
+            }
+        )
+        if store and status == "ok":
+            if sink is None:
+                sink = VoucherSink()
+            sink.submit(path, result["codes"])
+        return status
+
+    def dispatch(path: str, sig: Signature) -> None:
+        try:
+            digest = content_hash(path)
+        except OSError:
+            # Deleted since it settled
+            return
+        entry = files.get(path)
+        if entry and entry["status"] == "ok" and entry["hash"] == digest:
+            # Touched or rewritten with the same bytes: keep the result
+            files.record({**entry, "size": sig[0], "mtime_ns": sig[1]})
+            counts["unchanged"] += 1
+            return
+        if any(digest == d for _, _, d, _ in in_flight.values()):
+            # Same bytes as a file being OCRed: wait for its result and reuse it
+            debouncer.touch(path)
+            return
+        same = files.by_hash.get(digest)
+        if same is not None and same != path:
+            codes = files.entries[same]["codes"]
+            safe_print(f"♻️\t{path} has the same content as {same}")
+            result: BatchResult = {
+                "source": path,
+                "key": f"{path}|{sig[0]}|{sig[1]}",
+                "engine": engine,
+                "codes": codes,
+                "error": None,
+                "seconds": 0.0,
+            }
+            finish(result, path, sig, digest)
+            counts["duplicate"] += 1
+            return
+        item = {"source": path, "key": f"{path}|{sig[0]}|{sig[1]}"}
+        future = executor.submit(
+            _process_in_worker, item, engine, preprocess_chain, max_pixels, profile
+        )
+        in_flight[future] = (path, sig, digest, executor)
+
+    try:
+        with open(output, "a", encoding="utf-8") as out:
+            while not stop.is_set():
+                if len(in_flight) < max_in_flight:
+                    for path, sig in debouncer.ready():
+                        dispatch(path, sig)
+                        if len(in_flight) >= max_in_flight:
+                            break
+                if once and not debouncer and not in_flight:
+                    break
+                busy = bool(in_flight or debouncer)
+                timeout = min(settle, 0.1) if busy else poll_interval
+                if in_flight:
+                    done, _ = wait(
+                        list(in_flight), timeout=0, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        path, sig, digest, pool = in_flight.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            # The worker died (e.g. killed for memory); the
+                            # file is retried on restart like any failure
+                            result = {
+                                "source": path,
+                                "key": f"{path}|{sig[0]}|{sig[1]}",
+                                "engine": engine,
+                                "codes": [],
+                                "error": f"{type(e).__name__}: {e}",
+                                "seconds": 0.0,
+                            }
+                            if (
+                                owns_executor
+                                and isinstance(e, BrokenExecutor)
+                                and pool is executor
+                            ):
+                                safe_print("⚠️\tOCR worker pool broke, restarting it")
+                                executor.shutdown(wait=False, cancel_futures=True)
+                                executor = new_pool()
+                        counts[finish(result, path, sig, digest)] += 1
+                if watcher is not None:
+                    for path in watcher.poll(timeout):
+                        debouncer.touch(path)
+                else:
+                    time.sleep(timeout)
+    finally:
+        if watcher is not None:
+            watcher.close()
+        if owns_executor:
+            # Unfinished files are not in the index, so they are redone on restart
+            executor.shutdown(wait=True, cancel_futures=True)
+        files.close()
+        if sink is not None:
+            sink.close()
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, int]:
+    parser = argparse.ArgumentParser(
+        description="OCR voucher images as they land in a directory"
+    )
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=get_relative_path(DEFAULT_WATCH_DIR),
+        help=f"Directory to watch (default: {DEFAULT_WATCH_DIR})",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=get_relative_path("tmp/watch/results.jsonl"),
+        help="JSONL file receiving one result per image",
+    )
+    parser.add_argument(
+        "--index", help="Processed-file index (default: <output>.index)"
+    )
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="cli")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Store found voucher codes in the voucher database",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE,
+        help="Seconds a file must stay unchanged before it is OCRed",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Scan the directory periodically instead of using inotify",
+    )
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Process new and changed files, then exit",
+    )
+    parser.add_argument(
+        "-p",
+        "--preprocess",
+        default=None,
+        choices=sorted(CHAINS),
+        help="Preprocessing chain (default: each engine's own)",
+    )
+    parser.add_argument(
+        "-P",
+        "--profile",
+        default=None,
+        help="Named OCR profile from the tuner; replaces --preprocess",
+    )
+    parser.add_argument(
+        "--max-pixels",
+        type=int,
+        nargs="?",
+        const=DEFAULT_MAX_PIXELS,
+        default=None,
+        help="Memory-bounded mode: images of at most this many pixels "
+        f"(default {DEFAULT_MAX_PIXELS})",
+    )
+    args = parser.parse_args(argv)
+    try:
+        counts = watch(
+            args.directory,
+            args.output,
+            index=args.index,
+            engine=args.engine,
+            workers=args.workers,
+            store=args.store,
+            settle=args.settle,
+            poll_interval=args.poll_interval,
+            preprocess_chain=args.preprocess,
+            max_pixels=args.max_pixels,
+            profile=args.profile,
+            once=args.once,
+            use_inotify=not args.poll,
+        )
+    except KeyboardInterrupt:
+        return {}
+    safe_print(
+        f"✅\t{counts['ok']} ok, {counts['error']} failed, "
+        f"{counts['unchanged']} unchanged, {counts['duplicate']} duplicate"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    main()
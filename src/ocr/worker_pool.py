@@ -0,0 +1,302 @@
+import gc
+import multiprocessing
+import os
+import sys
+from multiprocessing.connection import Connection, wait
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TypedDict,
+)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.thread_budget import ThreadBudget
+from src.utils.tracing import span
+
+MB = 1024 * 1024
+# Jobs a worker runs before it is replaced by a fresh fork of the supervisor
+DEFAULT_MAX_JOBS = 500
+# Private memory one worker grows to on top of the shared model weights
+DEFAULT_WORKER_MEMORY_MB = 512
+# Memory left free for the supervisor, the page cache and spikes
+DEFAULT_RESERVE_MB = 1024
+
+
+class WorkerError:
+    """Returned in place of a result when the job raised or its worker died."""
+
+    def __init__(self, item: Any, error: str):
+        self.item = item
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"WorkerError({self.error})"
+
+
+class PoolStats(TypedDict):
+    started: int  # worker processes forked, including replacements
+    recycled: int  # workers retired after max_jobs or max_rss
+    crashed: int  # workers that died without retiring
+    jobs: int
+
+
+def available_memory_bytes() -> Optional[int]:
+    """``MemAvailable`` from ``/proc/meminfo``, or None where it is unknown."""
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of ``pid`` (default: this process), 0 where unknown."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def pool_size(
+    worker_memory_mb: int = DEFAULT_WORKER_MEMORY_MB,
+    reserve_mb: int = DEFAULT_RESERVE_MB,
+    max_workers: Optional[int] = None,
+) -> int:
+    """
+    Number of workers that fit in the memory available right now.
+
+    Shared weights are already counted in the supervisor's RSS, so each extra
+    worker only needs its private ``worker_memory_mb``.
+
+    Args:
+        worker_memory_mb (int): Private memory per worker.
+        reserve_mb (int): Memory left free.
+        max_workers (Optional[int]): Upper bound (default: CPU count).
+    """
+    cap = max_workers or os.cpu_count() or 1
+    available = available_memory_bytes()
+    if available is None:
+        return cap
+    fit = (available - reserve_mb * MB) // (worker_memory_mb * MB)
+    return max(1, min(cap, int(fit)))
+
+
+def _worker_main(
+    slot: int,
+    fn: Callable[[Any], Any],
+    conn: Connection,
+    max_jobs: int,
+    max_rss: int,
+    budget: Optional[ThreadBudget],
+) -> None:
+    if budget is not None:
+        budget.apply(slot)
+    jobs = 0
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            break
+        if item is None:
+            break
+        try:
+            result = fn(item)
+        except Exception as e:
+            result = WorkerError(item, f"{type(e).__name__}: {e}")
+        jobs += 1
+        retire = bool(max_jobs and jobs >= max_jobs) or bool(
+            max_rss and rss_bytes() > max_rss
+        )
+        # The retire flag travels with the result so no job is sent to a leaving worker
+        conn.send((result, retire))
+        if retire:
+            break
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process: Any, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.item: Any = None
+        self.busy = False
+
+
+class PreforkPool:
+    """
+    Load models once, then fork workers that share them copy-on-write.
+
+    ``preload`` runs in the supervisor before any worker exists (e.g. building
+    the EasyOCR Reader), so every worker inherits the loaded weights instead of
+    reading them from disk, and the weight pages stay shared until written.
+    The garbage collector is frozen after preloading so collections in the
+    workers do not touch, and thereby copy, the preloaded objects.
+
+    Each worker has its own pipe and runs one job at a time, so the supervisor
+    always knows which job a worker holds. A worker retires after ``max_jobs``
+    jobs or once its RSS exceeds ``max_rss_mb``; the supervisor forks a
+    replacement, which starts with the models already loaded. A worker that
+    dies mid-job yields a ``WorkerError`` for that job and is replaced as well.
+
+    Do not run inference in the supervisor before ``start()``: torch's OpenMP
+    pool does not survive ``fork``.
+
+    Usage:
+        >>> with PreforkPool(ocr_one, preload=get_reader, max_jobs=200) as pool:
+        ...     for item, result in pool.imap_unordered(items):
+        ...         print(item, result)
+
+    Args:
+        fn (Callable[[Any], Any]): Runs one job in a worker; items and results
+            must be picklable, ``fn`` itself is inherited through ``fork``.
+        workers (Optional[int]): Worker processes (default: ``pool_size()``).
+        preload (Optional[Callable[[], Any]]): Loads shared state before forking.
+        max_jobs (int): Jobs per worker before it is recycled (0 for no limit).
+        max_rss_mb (Optional[int]): RSS above which a worker is recycled.
+        budget (Optional[ThreadBudget]): CPU share applied in every worker
+            (default: CPUs split between ``workers``).
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[Any], Any],
+        workers: Optional[int] = None,
+        preload: Optional[Callable[[], Any]] = None,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        max_rss_mb: Optional[int] = None,
+        budget: Optional[ThreadBudget] = None,
+    ):
+        # Raises ValueError where fork is unavailable (Windows)
+        self._ctx = multiprocessing.get_context("fork")
+        self.fn = fn
+        self.workers = workers or pool_size()
+        self.preload = preload
+        self.max_jobs = max_jobs
+        self.max_rss = (max_rss_mb or 0) * MB
+        self.budget = budget or ThreadBudget(self.workers)
+        self.stats: PoolStats = {"started": 0, "recycled": 0, "crashed": 0, "jobs": 0}
+        self._slots: Dict[int, _Worker] = {}
+        self._started = False
+
+    def __enter__(self) -> "PreforkPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start(self) -> None:
+        if self._started:
+            return
+        if self.preload:
+            with span("worker_pool.preload"):
+                self.preload()
+        gc.collect()
+        gc.freeze()
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._started = True
+
+    def _spawn(self, slot: int) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                slot,
+                self.fn,
+                child_conn,
+                self.max_jobs,
+                self.max_rss,
+                self.budget,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._slots[slot] = _Worker(process, parent_conn)
+        self.stats["started"] += 1
+
+    def _replace(self, slot: int) -> None:
+        worker = self._slots[slot]
+        worker.conn.close()
+        worker.process.join()
+        self._spawn(slot)
+
+    def imap_unordered(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+        """
+        Run ``fn`` on every item and yield ``(item, result)`` as jobs finish.
+
+        Items are handed out one per idle worker, so large inputs stream
+        through. ``result`` is a ``WorkerError`` for failed jobs.
+        """
+        self.start()
+        source = iter(items)
+        exhausted = False
+        while True:
+            for worker in self._slots.values():
+                if exhausted or worker.busy:
+                    continue
+                try:
+                    worker.item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                worker.busy = True
+                worker.conn.send(worker.item)
+            busy = {slot: w for slot, w in self._slots.items() if w.busy}
+            if not busy:
+                return
+            waitables = {}
+            for slot, worker in busy.items():
+                waitables[worker.conn] = slot
+                waitables[worker.process.sentinel] = slot
+            done = set()
+            for ready in wait(list(waitables)):
+                slot = waitables[ready]
+                if slot in done:
+                    continue
+                done.add(slot)
+                worker = self._slots[slot]
+                item, worker.item, worker.busy = worker.item, None, False
+                try:
+                    result, retire = worker.conn.recv()
+                except (EOFError, OSError):
+                    # Died mid-job (crash, OOM kill): fail the job, fork a replacement
+                    worker.process.join()
+                    self.stats["crashed"] += 1
+                    error = f"Worker exited with code {worker.process.exitcode}"
+                    self._replace(slot)
+                    yield item, WorkerError(item, error)
+                    continue
+                self.stats["jobs"] += 1
+                if retire:
+                    self.stats["recycled"] += 1
+                    self._replace(slot)
+                yield item, result
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the workers after their current job."""
+        for worker in self._slots.values():
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._slots.values():
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self._slots.clear()
+        gc.unfreeze()
+        self._started = False
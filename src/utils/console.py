@@ -0,0 +1,12 @@
+import sys
+
+
+def safe_print(message, file=sys.stderr):
+    """Safely print messages, handling encoding issues"""
+    try:
+        print(message, file=file)
+        file.flush()
+    except UnicodeEncodeError:
+        # Fallback to ASCII if Unicode fails
+        print(message.encode("ascii", "ignore").decode("ascii"), file=file)
+        file.flush()
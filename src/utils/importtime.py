@@ -0,0 +1,144 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence, TypedDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.console import safe_print
+
+# Cold-start budget (seconds) per entry point: a fresh interpreter importing it
+STARTUP_BUDGETS: Dict[str, float] = {
+    "src.ocr.batch_urls": 1.0,
+    "src.ocr.cli": 1.0,
+    "src.ocr.pytesseract_impl": 1.0,
+}
+# Imported on first use only; an entry point loading one at import time regressed
+LAZY_MODULES = (
+    "torch",
+    "easyocr",
+    "pytesseract",
+    "imageio",
+    "requests",
+    "jsonpickle",
+    "proxy_hunter",
+)
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+class ImportRecord(TypedDict):
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int  # 0 for modules imported by the measured statement itself
+
+
+def measure_imports(
+    module: str, python: Optional[str] = None, cwd: Optional[str] = None
+) -> List[ImportRecord]:
+    """
+    Import ``module`` in a fresh interpreter under ``-X importtime``.
+
+    Args:
+        module (str): Dotted module name, e.g. ``src.ocr.cli``.
+        python (Optional[str]): Interpreter (default: the running one).
+        cwd (Optional[str]): Working directory (default: the repository root).
+
+    Returns:
+        List[ImportRecord]: Every module imported, in completion order.
+
+    Raises:
+        ValueError: If the import fails.
+    """
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    proc = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd or root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise ValueError(f"Importing {module} failed:\n{proc.stderr.strip()}")
+    records: List[ImportRecord] = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            records.append(
+                {
+                    "module": match.group(4),
+                    "self_seconds": int(match.group(1)) / 1e6,
+                    "cumulative_seconds": int(match.group(2)) / 1e6,
+                    "depth": (len(match.group(3)) - 1) // 2,
+                }
+            )
+    return records
+
+
+def startup_seconds(records: Sequence[ImportRecord], module: str) -> float:
+    """Cumulative import time of ``module`` itself (its whole import tree)."""
+    for record in records:
+        if record["module"] == module:
+            return record["cumulative_seconds"]
+    return 0.0
+
+
+def loaded_lazy_modules(
+    records: Sequence[ImportRecord], lazy: Sequence[str] = LAZY_MODULES
+) -> List[str]:
+    """The ``lazy`` top-level packages that were imported anyway."""
+    loaded = {r["module"].split(".")[0] for r in records}
+    return [name for name in lazy if name in loaded]
+
+
+def import_report(records: Sequence[ImportRecord], module: str, top: int = 15) -> str:
+    """
+    Summarize an import trace: total time, the slowest direct and package-level
+    imports, and lazy modules loaded too early.
+    """
+    total = startup_seconds(records, module)
+    lines = [f"{module}: {total * 1000:.1f} ms cold import, {len(records)} modules"]
+    # Top-level packages by the time their own modules took
+    packages: Dict[str, float] = {}
+    for r in records:
+        name = r["module"].split(".")[0]
+        packages[name] = packages.get(name, 0.0) + r["self_seconds"]
+    lines.append("slowest packages (self time):")
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+    early = loaded_lazy_modules(records)
+    if early:
+        lines.append(f"loaded at import time (should be lazy): {', '.join(early)}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Report cold-start import time of the OCR entry points"
+    )
+    parser.add_argument(
+        "modules",
+        nargs="*",
+        default=sorted(STARTUP_BUDGETS),
+        help="Modules to import (default: every budgeted entry point)",
+    )
+    parser.add_argument("--top", type=int, default=15, help="Packages to list")
+    args = parser.parse_args(argv)
+    status = 0
+    for module in args.modules:
+        records = measure_imports(module)
+        safe_print(import_report(records, module, args.top))
+        budget = STARTUP_BUDGETS.get(module)
+        seconds = startup_seconds(records, module)
+        if budget is not None and seconds > budget:
+            safe_print(f"❌\t{module} took {seconds:.2f}s, budget is {budget:.2f}s")
+            status = 1
+        if loaded_lazy_modules(records):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.file import get_relative_path
+
+
+def get_job_log_path(jobId: str) -> str:
+    """
+    Returns the absolute path to the log file for a given job ID.
+    """
+    output_dir = get_relative_path("tmp/logs")
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"{jobId}.log")
+
+
+class JobLogger:
+    """
+    Buffered, structured logger for a single OCR job.
+
+    Records are kept in memory and written as JSON lines when the job completes or
+    fails, so a job costs one open and one write instead of one per message. Every
+    record carries ``type``, ``job_id``, ``ts`` and ``stage``; typed records add
+    ``message``, ``text`` or ``vouchers``, and the closing job record carries the
+    per-stage ``timings``. Tracing spans can be routed here with
+    ``start_trace(job_id, sink=logger.span)``.
+
+    Usage:
+        >>> with JobLogger("job-1") as logger:
+        ...     logger.log("decode", "Image loaded", width=640)
+        ...     logger.text("ocr", "3028 8786 6115 0824")
+        ...     logger.vouchers("extract", ["3028878661150824"])
+
+    Args:
+        job_id (str): Unique identifier for the job.
+        path (Optional[str]): Log file path (default ``tmp/logs/<job_id>.log``).
+        reset (bool): Truncate an existing log file on the first write (default True).
+    """
+
+    def __init__(self, job_id: str, path: Optional[str] = None, reset: bool = True):
+        self.job_id = job_id
+        self.path = path or get_job_log_path(job_id)
+        self.reset = reset
+        self.status: Optional[str] = None
+        self._records: List[Dict[str, Any]] = []
+        self._timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._fh = None
+        self._append(
+            "job",
+            "job",
+            status="started",
+            date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+    def _append(self, type: str, stage: str, **fields: Any) -> Dict[str, Any]:
+        record = {
+            "type": type,
+            "job_id": self.job_id,
+            "ts": time.time(),
+            "stage": stage,
+        }
+        record.update(fields)
+        self._records.append(record)
+        return record
+
+    def log(self, stage: str, message: str, **fields: Any) -> Dict[str, Any]:
+        """Record a free-form message for ``stage``."""
+        return self._append("log", stage, message=message, **fields)
+
+    def text(self, stage: str, text: str) -> Dict[str, Any]:
+        """Record raw OCR text produced by ``stage``."""
+        return self._append("ocr_text", stage, text=text)
+
+    def vouchers(self, stage: str, codes: List[str]) -> Dict[str, Any]:
+        """Record voucher codes extracted by ``stage``."""
+        return self._append("vouchers", stage, vouchers=list(codes))
+
+    def timing(self, stage: str, seconds: float) -> None:
+        """Accumulate wall time for ``stage``; totals are written with the job summary."""
+        self._timings[stage] = self._timings.get(stage, 0.0) + seconds
+
+    def error(self, stage: str, error: BaseException) -> Dict[str, Any]:
+        return self._append("error", stage, error=f"{type(error).__name__}: {error}")
+
+    def span(self, record: Dict[str, Any]) -> None:
+        """Tracing sink: store a finished span and add its duration to the timings."""
+        self._records.append(dict(record, job_id=self.job_id))
+        if record.get("duration") is not None:
+            self.timing(record["name"], record["duration"])
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """Records buffered since the last flush."""
+        return list(self._records)
+
+    def flush(self) -> None:
+        """Write buffered records in a single write; the file stays open until close."""
+        if not self._records:
+            return
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fh = open(self.path, "w" if self.reset else "a", encoding="utf-8")
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in self._records
+        )
+        self._records.clear()
+        self._fh.write(payload)
+        self._fh.flush()
+
+    def close(self, status: str = "completed") -> None:
+        """Append the job summary (status, total duration, per-stage timings) and flush."""
+        if self.status is not None:
+            return
+        self.status = status
+        self._append(
+            "job",
+            "job",
+            status=status,
+            duration=time.perf_counter() - self._started,
+            timings=self._timings,
+        )
+        try:
+            self.flush()
+        finally:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_value is not None:
+            self.error("job", exc_value)
+            self.close("failed")
+        else:
+            self.close("completed")
+
+
+def read_job_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a JSON-lines job log written by ``JobLogger``.
+
+    Returns:
+        List[Dict[str, Any]]: One dictionary per record, in write order.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,142 @@
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, TypedDict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.metrics import STAGE_PEAK_MEMORY
+
+MB = 1024 * 1024
+
+_current_tracker: ContextVar[Optional["MemoryTracker"]] = ContextVar(
+    "ocr_current_memory_tracker", default=None
+)
+
+
+class StageMemory(TypedDict):
+    stage: str
+    peak_bytes: int  # most memory allocated at once above the stage's start
+    retained_bytes: int  # allocated in the stage and still alive when it ended
+    max_rss_bytes: int  # the process's RSS high-water mark so far
+
+
+def max_rss_bytes() -> int:
+    """Peak resident set size of this process, 0 where unknown."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryTracker:
+    """
+    Measure the peak memory of each pipeline stage with ``tracemalloc``.
+
+    NumPy and OpenCV arrays are allocated through Python's tracked allocator, so
+    every image buffer a stage holds at once counts towards its peak. Stages
+    nest: a stage's peak includes the peaks of the stages inside it.
+
+    Tracing costs CPU on every Python allocation; it is only enabled for
+    memory-bounded jobs. ``tracemalloc`` is process-wide, so stages running in
+    other threads at the same time add to each other's peaks.
+
+    Usage:
+        >>> with track_memory() as tracker:
+        ...     with memory_stage("decode"):
+        ...         image = decode(data)
+        >>> print(tracker.report())
+    """
+
+    def __init__(self):
+        self.stages: List[StageMemory] = []
+        self._stack: List[List[int]] = []  # [start bytes, peak seen in children]
+        self._owns_tracing = False
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    def stop(self) -> None:
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # Keep the enclosing stage's peak before resetting it for this one
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        entry = [current, 0]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, entry[1])
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            record: StageMemory = {
+                "stage": name,
+                "peak_bytes": max(0, peak - entry[0]),
+                "retained_bytes": max(0, current - entry[0]),
+                "max_rss_bytes": max_rss_bytes(),
+            }
+            self.stages.append(record)
+            STAGE_PEAK_MEMORY.observe(record["peak_bytes"], stage=name)
+
+    def peaks(self) -> Dict[str, int]:
+        """Peak bytes per stage name (the largest when a stage ran more than once)."""
+        peaks: Dict[str, int] = {}
+        for record in self.stages:
+            peaks[record["stage"]] = max(
+                peaks.get(record["stage"], 0), record["peak_bytes"]
+            )
+        return peaks
+
+    def report(self) -> str:
+        lines = [
+            f"{r['stage']}: peak {r['peak_bytes'] / MB:.1f} MB, "
+            f"retained {r['retained_bytes'] / MB:.1f} MB"
+            for r in self.stages
+        ]
+        if self.stages:
+            lines.append(f"max RSS {self.stages[-1]['max_rss_bytes'] / MB:.1f} MB")
+        return "\n".join(lines)
+
+
+@contextmanager
+def track_memory() -> Iterator[MemoryTracker]:
+    """Trace allocations and make a new ``MemoryTracker`` current for this context."""
+    tracker = MemoryTracker()
+    tracker.start()
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+        tracker.stop()
+
+
+def current_tracker() -> Optional[MemoryTracker]:
+    return _current_tracker.get()
+
+
+@contextmanager
+def memory_stage(name: str) -> Iterator[None]:
+    """Measure ``name`` with the current tracker; does nothing outside ``track_memory``."""
+    tracker = _current_tracker.get()
+    if tracker is None:
+        yield
+        return
+    with tracker.stage(name):
+        yield
@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.file import get_relative_path
+
+if TYPE_CHECKING:
+    # http.server is only needed by serve_metrics, not by every pipeline import
+    from http.server import ThreadingHTTPServer
+
+# Bucket upper bounds (seconds) for stage latency histograms
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Bucket upper bounds for small integer counts (crops, codes per image)
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 4, 8, 16, 32, 64)
+# Bucket upper bounds (bytes) for per-stage peak memory, 1 MB to 2 GB
+MEMORY_BUCKETS: Tuple[float, ...] = tuple(float(2**n * 1024 * 1024) for n in range(12))
+
+DEFAULT_METRICS_DIR = "tmp/metrics"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, object]) -> LabelKey:
+    """Build a hashable, ordered label key, rejecting unknown label names."""
+    unknown = set(labels) - set(labelnames)
+    if unknown:
+        raise ValueError(f"Unknown label(s): {', '.join(sorted(unknown))}")
+    return tuple((name, str(labels.get(name, ""))) for name in labelnames)
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [f'{name}="{_escape_label_value(value)}"' for name, value in pairs]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing counter with optional labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increment the counter for the given label values."""
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Return the current value for the given label values."""
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "type": self.type_name,
+                "help": self.help,
+                "labelnames": list(self.labelnames),
+                "values": [[list(map(list, k)), v] for k, v in self._values.items()],
+            }
+
+    def merge_dict(self, data: dict) -> None:
+        with self._lock:
+            for key, value in data.get("values", []):
+                k = tuple(tuple(pair) for pair in key)
+                self._values[k] = self._values.get(k, 0.0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """A cumulative histogram with fixed bucket bounds and optional labels."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Record a single observation for the given label values."""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        """Return the number of observations for the given label values."""
+        series = self._values.get(_label_key(self.labelnames, labels))
+        return series[-1] if series else 0
+
+    def sum(self, **labels) -> float:
+        """Return the sum of observations for the given label values."""
+        series = self._values.get(_label_key(self.labelnames, labels))
+        return series[-2] if series else 0.0
+
+    def render(self) -> Iterable[str]:
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, cumulative in zip(self.buckets, series):
+                    le = ("le", _format_value(bound))
+                    yield f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+                inf = ("le", "+Inf")
+                yield f"{self.name}_bucket{_format_labels(key, inf)} {series[-1]}"
+                yield f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}"
+                yield f"{self.name}_count{_format_labels(key)} {series[-1]}"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "type": self.type_name,
+                "help": self.help,
+                "labelnames": list(self.labelnames),
+                "buckets": list(self.buckets),
+                "values": [
+                    [list(map(list, k)), list(v)] for k, v in self._values.items()
+                ],
+            }
+
+    def merge_dict(self, data: dict) -> None:
+        if list(data.get("buckets", self.buckets)) != list(self.buckets):
+            # Bucket layout changed between releases; drop the stale series
+            return
+        with self._lock:
+            for key, series in data.get("values", []):
+                k = tuple(tuple(pair) for pair in key)
+                current = self._values.get(k)
+                if current is None:
+                    self._values[k] = list(series)
+                else:
+                    self._values[k] = [a + b for a, b in zip(current, series)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """
+    Collection of named metrics that can be rendered in the Prometheus text format.
+
+    Metrics live in-process; ``flush`` merges them into an on-disk state file so that
+    short-lived CLI processes (one per OCR job) accumulate into a single exposition.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, "Counter | Histogram"] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(
+                    f"Metric {name} already registered as {metric.type_name}"
+                )
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {name: metric.to_dict() for name, metric in self._metrics.items()}
+
+    def merge_dict(self, data: dict) -> None:
+        """Add the values of a serialized registry into this one."""
+        for name, item in data.items():
+            if item.get("type") == "histogram":
+                metric = self.histogram(
+                    name, item["help"], item["labelnames"], item["buckets"]
+                )
+            else:
+                metric = self.counter(name, item["help"], item["labelnames"])
+            metric.merge_dict(item)
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def reinit_locks(self) -> None:
+        """
+        Replace every lock with a new one, in a child right after ``fork``.
+
+        A thread of the parent (a voucher sink, a pipeline stage) may hold a
+        metric lock at the moment of the fork; the child's copy would stay
+        locked forever and its ``flush`` would deadlock.
+        """
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+
+    def flush(self, directory: Optional[str] = None) -> str:
+        """
+        Merge in-process values into the on-disk state and rewrite the textfile.
+
+        The in-process registry is reset afterwards, so flushing twice never counts
+        an observation twice.
+
+        Args:
+            directory (Optional[str]): Target directory (default ``tmp/metrics``).
+
+        Returns:
+            str: Path of the written ``ocr_metrics.prom`` file.
+        """
+        directory = directory or get_relative_path(DEFAULT_METRICS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        state_path = os.path.join(directory, "ocr_metrics.json")
+        prom_path = os.path.join(directory, "ocr_metrics.prom")
+        with _FileLock(os.path.join(directory, ".lock")):
+            merged = MetricsRegistry()
+            if os.path.exists(state_path):
+                try:
+                    with open(state_path, "r", encoding="utf-8") as f:
+                        merged.merge_dict(json.load(f))
+                except (OSError, ValueError):
+                    pass
+            merged.merge_dict(self.to_dict())
+            _atomic_write(state_path, json.dumps(merged.to_dict()))
+            _atomic_write(prom_path, merged.render())
+        self.reset()
+        return prom_path
+
+
+class _FileLock:
+    """Best-effort inter-process lock around the metrics state file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+")
+        try:
+            import fcntl
+
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            # Windows: no advisory locks, writes are still atomic via os.replace
+            pass
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+def _atomic_write(path: str, content: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.reinit_locks)
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "ocr_stage_duration_seconds",
+    "Wall time spent in each OCR pipeline stage",
+    ("stage",),
+)
+CROP_COUNT = REGISTRY.histogram(
+    "ocr_crop_count", "Number of crops produced per image", ("stage",), COUNT_BUCKETS
+)
+CODES_FOUND = REGISTRY.histogram(
+    "ocr_codes_found", "Voucher codes found per image", ("stage",), COUNT_BUCKETS
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "ocr_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "ocr_stage_errors_total", "Pipeline stages that raised an exception", ("stage",)
+)
+STAGE_PEAK_MEMORY = REGISTRY.histogram(
+    "ocr_stage_peak_memory_bytes",
+    "Peak memory allocated while an OCR stage ran (memory-bounded mode)",
+    ("stage",),
+    MEMORY_BUCKETS,
+)
+
+
+def flush_metrics(directory: Optional[str] = None) -> str:
+    """Flush the default registry to ``tmp/metrics`` (see ``MetricsRegistry.flush``)."""
+    return REGISTRY.flush(directory)
+
+
+def load_metrics(directory: Optional[str] = None) -> MetricsRegistry:
+    """Load the aggregated on-disk metrics together with unflushed in-process values."""
+    directory = directory or get_relative_path(DEFAULT_METRICS_DIR)
+    registry = MetricsRegistry()
+    state_path = os.path.join(directory, "ocr_metrics.json")
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            registry.merge_dict(json.load(f))
+    registry.merge_dict(REGISTRY.to_dict())
+    return registry
+
+
+def serve_metrics(
+    port: int = 9464, host: str = "127.0.0.1", directory: Optional[str] = None
+) -> "ThreadingHTTPServer":
+    """
+    Serve aggregated metrics on ``http://host:port/metrics`` from a daemon thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call ``shutdown()`` to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = load_metrics(directory).render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expose aggregated OCR metrics")
+    parser.add_argument(
+        "command", choices=["print", "serve"], help="Print metrics or serve them"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for serve")
+    parser.add_argument("--port", type=int, default=9464, help="Port for serve")
+    parser.add_argument(
+        "-d", "--dir", default=None, help="Metrics directory (default: tmp/metrics)"
+    )
+    args = parser.parse_args()
+    if args.command == "print":
+        print(load_metrics(args.dir).render(), end="")
+    else:
+        srv = serve_metrics(args.port, args.host, args.dir)
+        print(f"Serving metrics on http://{args.host}:{args.port}/metrics")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.tracing import span
+
+# Read by OpenMP (tesseract, torch), MKL and OpenBLAS when they start their pools.
+# OMP_THREAD_LIMIT is the one tesseract honours; the others cap torch and numpy.
+THREAD_ENV_VARS = (
+    "OMP_THREAD_LIMIT",
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+)
+
+# Set by a parent that runs several OCR processes at once (the Node job queue):
+# concurrent jobs, and optionally threads per job
+WORKERS_ENV = "OCR_WORKERS"
+THREADS_ENV = "OCR_THREADS"
+
+
+def env_count(name: str) -> Optional[int]:
+    """Positive integer from environment variable ``name``, None when unset or invalid."""
+    value = os.environ.get(name, "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (respects taskset/cgroup affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    """
+    Split the machine's CPUs between concurrent OCR workers.
+
+    Every worker gets ``threads`` CPUs for torch intra-op threads, OpenCV's pool
+    and each tesseract subprocess, so ``workers`` jobs in parallel use about as
+    many threads as there are CPUs instead of ``workers × CPUs``.
+
+    Usage:
+        >>> budget = ThreadBudget(workers=4, pin=True)
+        >>> budget.apply(index=0)  # in worker 0, before loading models
+
+    Args:
+        workers (int): Jobs running at the same time.
+        cpus (Optional[Sequence[int]]): CPUs to share (default: ``available_cpus()``).
+        threads (Optional[int]): Threads per worker (default: CPUs / workers, at least 1).
+        pin (bool): Pin each worker process to its own CPU set in ``apply``.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        cpus: Optional[Sequence[int]] = None,
+        threads: Optional[int] = None,
+        pin: bool = False,
+    ):
+        if workers < 1:
+            raise ValueError("A thread budget needs at least one worker")
+        self.workers = workers
+        self.cpus = list(cpus) if cpus else available_cpus()
+        self.threads = threads or max(1, len(self.cpus) // workers)
+        self.pin = pin
+
+    def __repr__(self) -> str:
+        return (
+            f"ThreadBudget(workers={self.workers}, cpus={len(self.cpus)}, "
+            f"threads={self.threads}, pin={self.pin})"
+        )
+
+    def cpu_set(self, index: int) -> List[int]:
+        """The ``threads`` CPUs of worker ``index`` (wrapping when oversubscribed)."""
+        start = (index * self.threads) % len(self.cpus)
+        return [
+            self.cpus[(start + i) % len(self.cpus)]
+            for i in range(min(self.threads, len(self.cpus)))
+        ]
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables limiting native thread pools, e.g. for subprocesses."""
+        return {name: str(self.threads) for name in THREAD_ENV_VARS}
+
+    def apply(self, index: Optional[int] = None) -> None:
+        """
+        Apply the budget to this process.
+
+        Exports ``env()`` (inherited by tesseract subprocesses and read by torch
+        on import), sets OpenCV's thread count and, when torch is already loaded,
+        its intra-op threads. With ``pin`` and a worker ``index`` the process is
+        also pinned to ``cpu_set(index)``.
+        """
+        with span("thread_budget.apply", threads=self.threads, worker=index):
+            os.environ.update(self.env())
+            import cv2
+
+            cv2.setNumThreads(self.threads)
+            torch = sys.modules.get("torch")
+            if torch is not None:
+                torch.set_num_threads(self.threads)
+            if self.pin and index is not None and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, self.cpu_set(index))
+
+
+_budget: Optional[ThreadBudget] = None
+_lock = threading.Lock()
+
+
+def configure(
+    workers: int = 1,
+    cpus: Optional[Sequence[int]] = None,
+    threads: Optional[int] = None,
+    pin: bool = False,
+) -> ThreadBudget:
+    """Set and apply this process's budget (see ``ThreadBudget`` for the arguments)."""
+    global _budget
+    budget = ThreadBudget(workers, cpus, threads, pin)
+    with _lock:
+        _budget = budget
+    budget.apply()
+    return budget
+
+
+def current_budget() -> ThreadBudget:
+    """
+    The configured budget, or one from ``$OCR_WORKERS``/``$OCR_THREADS``.
+
+    Without either the process gets every CPU, like a single worker.
+    """
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = ThreadBudget(
+                env_count(WORKERS_ENV) or 1, threads=env_count(THREADS_ENV)
+            )
+        return _budget
+
+
+def apply_budget() -> None:
+    """
+    Re-apply the current budget before starting an OCR job.
+
+    Cheap enough to call per job; it catches torch being imported after the
+    budget was first applied (EasyOCR loads it lazily).
+    """
+    current_budget().apply()
+
+
+def init_worker(budget: ThreadBudget, counter: "multiprocessing.Value") -> None:
+    """
+    ``ProcessPoolExecutor`` initializer: adopt ``budget`` as worker N.
+
+    ``counter`` is a shared ``multiprocessing.Value("i", 0)`` handing out worker
+    indexes, which choose the CPU set when the budget pins workers.
+    """
+    global _budget
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    with _lock:
+        _budget = budget
+    budget.apply(index % budget.workers)
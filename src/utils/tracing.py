@@ -0,0 +1,176 @@
+import functools
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.metrics import STAGE_ERRORS, STAGE_LATENCY
+
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar(
+    "ocr_current_tracer", default=None
+)
+_current_span: ContextVar[Optional["Span"]] = ContextVar(
+    "ocr_current_span", default=None
+)
+
+
+class Span:
+    """
+    A single timed pipeline stage with free-form attributes.
+
+    Spans are created through ``span()``/``traced()``; nesting is tracked through
+    context variables, so a span opened inside another becomes its child.
+    """
+
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "trace_id",
+        "attributes",
+        "start_time",
+        "_start",
+        "duration",
+        "status",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.trace_id = trace_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute (e.g. crop count, cache hit) to the span."""
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "span",
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Collects finished spans for one OCR job.
+
+    Args:
+        job_id (str): Identifier used as the trace id.
+        sink (Optional[Callable[[dict], None]]): Receives each span record on ``flush``.
+    """
+
+    def __init__(self, job_id: str, sink: Optional[Callable[[dict], None]] = None):
+        self.job_id = job_id
+        self.sink = sink
+        self.spans: List[Dict[str, Any]] = []
+        self._flushed = 0
+
+    def record(self, span: Span) -> None:
+        self.spans.append(span.to_dict())
+
+    def flush(self) -> None:
+        """Send spans recorded since the last flush to the sink."""
+        pending = self.spans[self._flushed :]
+        self._flushed = len(self.spans)
+        if self.sink:
+            for record in pending:
+                self.sink(record)
+
+
+def start_trace(job_id: str, sink: Optional[Callable[[dict], None]] = None) -> Tracer:
+    """Create a tracer for ``job_id`` and make it current for this context."""
+    tracer = Tracer(job_id, sink)
+    _current_tracer.set(tracer)
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a pipeline stage.
+
+    The duration is always observed in the ``ocr_stage_duration_seconds`` histogram;
+    the span itself is kept only when a tracer is active (see ``start_trace``).
+
+    Example:
+        >>> with span("cli.ocr", engine="tesseract") as s:
+        ...     text = run_ocr(image)
+        ...     s.set_attribute("chars", len(text))
+    """
+    tracer = _current_tracer.get()
+    parent = _current_span.get()
+    s = Span(
+        name,
+        trace_id=tracer.job_id if tracer else None,
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.set_attribute("error", f"{type(e).__name__}: {e}")
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        s.end()
+        _current_span.reset(token)
+        STAGE_LATENCY.observe(s.duration or 0.0, stage=name)
+        if tracer:
+            tracer.record(s)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator form of ``span``; defaults to ``<module>.<function>`` as the name."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
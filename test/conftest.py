@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    """Keep metrics flushed by tests (and their worker processes) out of tmp/."""
+    directory = str(tmp_path / "metrics")
+    monkeypatch.setattr(metrics, "DEFAULT_METRICS_DIR", directory)
+    return directory
@@ -0,0 +1,97 @@
+import csv
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.database.export import export, iter_pages, iter_report, query_plan
+from src.database.SQLiteHelper import SQLiteHelper
+from src.database.VoucherDatabase import (
+    VOUCHER_COLUMNS,
+    store_scanned_image,
+    store_voucher_in_database,
+)
+
+CODE_A = "1111222233334444"
+CODE_B = "5555666677778888"
+
+
+@pytest.fixture
+def db(tmp_path):
+    helper = SQLiteHelper(str(tmp_path / "vouchers.db"))
+    yield helper
+    helper.close()
+
+
+@pytest.fixture
+def filled(db):
+    store_voucher_in_database(db, CODE_A, "a.jpg")
+    store_voucher_in_database(db, CODE_B, "a.jpg")
+    store_voucher_in_database(db, CODE_A, "b.jpg")
+    store_scanned_image(db, "empty.jpg")
+    return db
+
+
+def test_backfills_codes_of_existing_vouchers(db):
+    db.create_table("vouchers", VOUCHER_COLUMNS)
+    db.insert("vouchers", {"image_path": "old.jpg", "codes": CODE_A})
+    db.insert("vouchers", {"image_path": "old2.jpg", "codes": CODE_A})
+    rows = [r for page in iter_pages(db, "codes") for r in page]
+    assert [r["image_path"] for r in rows] == ["old.jpg", "old2.jpg"]
+    assert re.match(r"^\d{4}-\d{2}-\d{2}$", rows[0]["day"])
+
+
+def test_pages_are_keyset_ordered(filled):
+    pages = list(iter_pages(filled, "vouchers", page_size=2))
+    assert [len(p) for p in pages] == [2, 1]
+    assert pages[0][0] == {**pages[0][0], "codes": [CODE_A, CODE_B]}
+    assert pages[1][0]["codes"] == []
+    with pytest.raises(ValueError):
+        list(iter_pages(filled, "nope"))
+
+
+def test_export_jsonl_and_csv(filled, tmp_path):
+    path = str(tmp_path / "out" / "vouchers.jsonl")
+    assert export(filled, path, "jsonl", page_size=1) == 3
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [r["image_path"] for r in rows] == ["a.jpg", "b.jpg", "empty.jpg"]
+
+    path = str(tmp_path / "codes.csv")
+    assert export(filled, path, "csv", table="codes") == 3
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["code"] for r in rows] == [CODE_A, CODE_B, CODE_A]
+    with pytest.raises(ValueError):
+        export(filled, path, "xml")
+
+
+def test_reports(filled):
+    days = list(iter_report(filled, "codes-per-day"))
+    assert [d["codes"] for d in days] == [3]
+    assert list(iter_report(filled, "codes-per-day", until="2000-01-01")) == []
+    assert list(iter_report(filled, "duplicates")) == [
+        {"code": CODE_A, "images": 2, "first_image": "a.jpg"}
+    ]
+    assert list(iter_report(filled, "no-codes")) == [{"image_path": "empty.jpg"}]
+    with pytest.raises(ValueError):
+        list(iter_report(filled, "nope"))
+
+
+@pytest.mark.parametrize("name", ["codes-per-day", "duplicates", "no-codes"])
+def test_reports_use_covering_indexes(db, name):
+    plan = " | ".join(query_plan(db, name))
+    assert "USING COVERING INDEX" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_export_parquet(filled, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "vouchers.parquet")
+    assert export(filled, path, "parquet", page_size=2) == 3
+    table = pq.read_table(path)
+    assert table.column("codes").to_pylist()[0] == [CODE_A, CODE_B]
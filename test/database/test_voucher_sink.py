@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.database.SQLiteHelper import SQLiteHelper
+from src.database.voucher_sink import VoucherSink, is_busy
+
+CODE_A = "1111222233334444"
+CODE_B = "5555666677778888"
+
+
+class _FlakySink(VoucherSink):
+    """Reports the database locked for the first ``busy`` writes."""
+
+    def __init__(self, busy: int, **kwargs):
+        self.busy = busy
+        self.written = []
+        super().__init__(**kwargs)
+
+    def _writer(self):
+        def write(batch):
+            if self.busy:
+                self.busy -= 1
+                raise sqlite3.OperationalError("database is locked")
+            self.written.extend(batch)
+
+        return write
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "vouchers.db")
+
+
+def _vouchers(path):
+    with SQLiteHelper(path) as db:
+        rows = db.conn.execute(
+            "SELECT image_path, codes FROM vouchers ORDER BY image_path"
+        ).fetchall()
+        count = db.conn.execute("SELECT COUNT(*) FROM voucher_codes").fetchone()
+    return dict(rows), count[0]
+
+
+def test_batches_events_into_transactions(db_path):
+    sink = VoucherSink(db_path=db_path, batch_size=3, flush_interval=60)
+    for i in range(7):
+        sink.submit(f"img{i}.jpg", [CODE_A])
+    sink.submit("img0.jpg", [CODE_B, "12 34", CODE_A])
+    sink.submit("empty.jpg", [])
+    sink.flush()
+    stats = sink.stats()
+    assert (stats["written"], stats["batches"]) == (9, 3)
+    assert stats["depth"] == 0
+    sink.close()
+
+    vouchers, codes = _vouchers(db_path)
+    assert vouchers["img0.jpg"] == f"{CODE_A}, {CODE_B}"
+    assert vouchers["empty.jpg"] == ""
+    assert codes == 8
+
+
+def test_close_flushes_and_rejects_new_events(db_path):
+    with VoucherSink(db_path=db_path, flush_interval=60) as sink:
+        sink.submit("a.jpg", [CODE_A])
+    assert _vouchers(db_path)[0] == {"a.jpg": CODE_A}
+    with pytest.raises(RuntimeError):
+        sink.submit("b.jpg", [CODE_B])
+
+
+def test_retries_busy_database():
+    sink = _FlakySink(busy=2, retries=3, flush_interval=0)
+    sink.submit("a.jpg", [CODE_A])
+    sink.close()
+    assert sink.written == [("a.jpg", [CODE_A])]
+    assert sink.stats()["retries"] == 2
+
+    sink = _FlakySink(busy=5, retries=2, flush_interval=0)
+    sink.submit("a.jpg", [CODE_A])
+    sink.close()
+    assert (sink.written, sink.stats()["errors"]) == ([], 1)
+
+
+def test_is_busy():
+    assert is_busy(sqlite3.OperationalError("database is locked"))
+    assert not is_busy(sqlite3.OperationalError("no such table: x"))
+    assert not is_busy(ValueError("locked"))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        VoucherSink("redis")
@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr import batch
+from src.ocr.batch import ENGINE_FUNCTIONS, iter_batch_inputs, make_item, run_batch
+from src.ocr.pipeline import Stage, StagedPipeline
+
+CODE_A = "1111222233334444"
+CODE_B = "5555666677778888"
+
+
+def _fake_ocr(source, chain=None, max_pixels=None, profile=None):
+    # The "image" holds the text the engine would read
+    with open(source, encoding="utf-8") as f:
+        text = f.read()
+    if text == "boom":
+        raise ValueError("cannot decode")
+    return text
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", _fake_ocr)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+def _results(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_expands_directories_globs_and_manifests(tmp_path):
+    a = _write(tmp_path / "imgs" / "a.jpg", CODE_A)
+    b = _write(tmp_path / "imgs" / "sub" / "b.PNG", CODE_B)
+    _write(tmp_path / "imgs" / "notes.txt", "")
+    assert [i["source"] for i in iter_batch_inputs(str(tmp_path / "imgs"))] == [a, b]
+    assert [i["source"] for i in iter_batch_inputs(str(tmp_path / "imgs/*.jpg"))] == [a]
+
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        "\n".join(
+            [
+                json.dumps("imgs/a.jpg"),
+                json.dumps({"path": b}),
+                "",
+                json.dumps({"url": "https://example.com/c.jpg"}),
+                '{"path": "imgs/trunc',
+                json.dumps({"size": 3}),
+            ]
+        ),
+        encoding="utf-8",
+    )
+    invalid = []
+    items = list(iter_batch_inputs(str(manifest), invalid.append))
+    assert [i["source"] for i in items] == [a, b, "https://example.com/c.jpg"]
+    assert items[2]["key"] == "https://example.com/c.jpg"
+    # Local keys change when the file does
+    assert items[0]["key"].startswith(f"{a}|{len(CODE_A)}|")
+    assert [m.split(": ")[0] for m in invalid] == [f"{manifest}:5", f"{manifest}:6"]
+
+
+def test_resumes_from_checkpoint_and_writes_error_rows(tmp_path, fake_engine):
+    _write(tmp_path / "imgs" / "a.jpg", CODE_A)
+    _write(tmp_path / "imgs" / "b.jpg", f"{CODE_B} and {CODE_A}")
+    _write(tmp_path / "imgs" / "bad.jpg", "boom")
+    output = str(tmp_path / "out" / "results.jsonl")
+
+    counts = run_batch(str(tmp_path / "imgs"), output, engine="fake", workers=1)
+    assert counts == {"ok": 2, "error": 1, "skipped": 0, "invalid": 0}
+    rows = {os.path.basename(r["source"]): r for r in _results(output)}
+    assert rows["a.jpg"]["codes"] == [CODE_A]
+    assert sorted(rows["b.jpg"]["codes"]) == [CODE_A, CODE_B]
+    assert rows["bad.jpg"]["codes"] == []
+    assert rows["bad.jpg"]["error"] == "ValueError: cannot decode"
+
+    # Finished items are skipped; the failed one is retried
+    counts = run_batch(str(tmp_path / "imgs"), output, engine="fake", workers=1)
+    assert counts == {"ok": 0, "error": 1, "skipped": 2, "invalid": 0}
+    assert len(_results(output)) == 4
+
+
+def test_bad_manifest_lines_do_not_stop_the_batch(tmp_path, fake_engine):
+    a = _write(tmp_path / "a.jpg", CODE_A)
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(f'{{"path": "a.j\n{json.dumps(a)}\n', encoding="utf-8")
+    output = str(tmp_path / "results.jsonl")
+    counts = run_batch(str(manifest), output, engine="fake", workers=1)
+    assert counts == {"ok": 1, "error": 0, "skipped": 0, "invalid": 1}
+    assert _results(output)[0]["codes"] == [CODE_A]
+
+
+def test_pipelined_input_failure_keeps_draining(tmp_path, monkeypatch):
+    paths = [
+        _write(tmp_path / f"{n}.jpg", code)
+        for n, code in (("a", CODE_A), ("b", CODE_B))
+    ]
+
+    def broken_input(source, on_invalid):
+        yield from (make_item(p) for p in paths)
+        raise OSError("manifest went away")
+
+    def fake_pipeline(stage_workers, chain, max_pixels, profile):
+        def ocr(job):
+            job["codes"] = [_fake_ocr(job["item"]["source"])]
+            return job
+
+        return StagedPipeline([Stage("ocr", ocr, 2)])
+
+    monkeypatch.setattr(batch, "iter_batch_inputs", broken_input)
+    monkeypatch.setattr(batch, "build_cli_pipeline", fake_pipeline)
+    output = str(tmp_path / "results.jsonl")
+    counts = run_batch(str(tmp_path), output, pipelined=True)
+    assert counts == {"ok": 2, "error": 1, "skipped": 0, "invalid": 0}
+    assert sorted(r["codes"][0] for r in _results(output)) == [CODE_A, CODE_B]
+
+
+def test_unknown_engine(tmp_path):
+    with pytest.raises(ValueError):
+        run_batch(str(tmp_path), str(tmp_path / "out.jsonl"), engine="nope")
+
+
+def test_profile_reaches_the_engine(tmp_path, monkeypatch):
+    _write(tmp_path / "imgs" / "a.jpg", CODE_A)
+
+    def engine(source, chain=None, max_pixels=None, profile=None):
+        # Runs in a worker process: a wrong profile shows up as an error row
+        if profile != "fast":
+            raise ValueError(f"profile {profile!r} did not reach the engine")
+        return _fake_ocr(source)
+
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", engine)
+    output = str(tmp_path / "results.jsonl")
+    run_batch(str(tmp_path / "imgs"), output, engine="fake", workers=1, profile="fast")
+    assert _results(output)[0]["codes"] == [CODE_A]
+    with pytest.raises(ValueError):
+        run_batch(str(tmp_path / "imgs"), output, engine="fake", profile="turbo")
+
+
+def test_a_crashed_worker_fails_its_item_and_the_batch_goes_on(tmp_path, monkeypatch):
+    def crashing(source, chain=None, max_pixels=None, profile=None):
+        text = _fake_ocr(source)
+        if text == "crash":
+            os._exit(1)
+        return text
+
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", crashing)
+    _write(tmp_path / "imgs" / "0-crash.jpg", "crash")
+    for name, code in (("a", CODE_A), ("b", CODE_B), ("c", CODE_A)):
+        _write(tmp_path / "imgs" / f"{name}.jpg", code)
+    output = str(tmp_path / "results.jsonl")
+    counts = run_batch(str(tmp_path / "imgs"), output, engine="fake", workers=1)
+    rows = {os.path.basename(r["source"]): r for r in _results(output)}
+    assert len(rows) == 4 and counts["ok"] + counts["error"] == 4
+    assert rows["0-crash.jpg"]["error"].startswith("BrokenProcessPool")
+    # Items submitted after the crash run on a new pool
+    assert rows["b.jpg"]["codes"] == [CODE_B] and rows["c.jpg"]["codes"] == [CODE_A]
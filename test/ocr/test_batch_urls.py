@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr import batch_urls
+from src.ocr.batch_urls import (
+    PENDING_PER_OCR_WORKER,
+    dedupe_urls,
+    ingest_urls,
+    iter_downloaded_images,
+)
+
+_PNG = cv2.imencode(".png", np.full((8, 8), 255, np.uint8))[1].tobytes()
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class _StubFetcher:
+    """Serves ``_PNG`` after a delay, failing URLs as configured."""
+
+    def __init__(self, delay=0.0, failures=None):
+        self.delay = delay
+        self.failures = dict(failures or {})  # url -> exceptions to raise first
+        self.calls = Counter()
+        self.active = Counter()
+        self.peak = Counter()
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        host = url.split("/")[2]
+        with self._lock:
+            self.calls[url] += 1
+            self.active[host] += 1
+            self.peak[host] = max(self.peak[host], self.active[host])
+            errors = self.failures.get(url)
+            error = errors.pop(0) if errors else None
+        try:
+            time.sleep(self.delay)
+            if error is not None:
+                raise error
+            return _PNG
+        finally:
+            with self._lock:
+                self.active[host] -= 1
+
+
+def _download(urls, **kwargs):
+    async def collect():
+        return [item async for item in iter_downloaded_images(urls, **kwargs)]
+
+    return {item["url"]: item for item in asyncio.run(collect())}
+
+
+def test_limits_requests_per_host():
+    fetcher = _StubFetcher(delay=0.02)
+    urls = [f"http://{host}/{i}.png" for host in ("a", "b") for i in range(8)]
+    items = _download(urls, per_host_limit=2, max_concurrency=16, fetcher=fetcher)
+    assert len(items) == 16
+    assert all(item["image"].shape == (8, 8, 3) for item in items.values())
+    assert fetcher.peak == {"a": 2, "b": 2}
+
+
+def test_retries_transient_errors_only():
+    flaky, missing, down = (f"http://a/{name}.png" for name in ("flaky", "404", "down"))
+    fetcher = _StubFetcher(
+        failures={
+            flaky: [requests.ConnectionError("reset"), _http_error(503)],
+            missing: [_http_error(404)],
+            down: [requests.Timeout("slow")] * 5,
+        }
+    )
+    items = _download([flaky, missing, down], retries=2, backoff=0, fetcher=fetcher)
+    assert (items[flaky]["error"], items[flaky]["attempts"]) == (None, 3)
+    assert items[missing]["attempts"] == 1
+    assert items[missing]["error"].startswith("HTTPError")
+    assert items[down]["attempts"] == 3
+    assert items[down]["error"] == "Timeout: slow"
+    assert fetcher.calls == {flaky: 3, missing: 1, down: 3}
+
+
+def test_backoff_grows_and_is_capped():
+    assert dedupe_urls([" http://a/1 ", "", "http://a/1", "http://b/2"]) == [
+        "http://a/1",
+        "http://b/2",
+    ]
+    for attempt in range(8):
+        delay = batch_urls.backoff_delay(attempt, base=0.5, cap=4.0)
+        assert 0 <= delay <= min(4.0, 0.5 * 2**attempt)
+
+
+def test_ingest_dedupes_reports_errors_and_bounds_pending_images():
+    fetcher = _StubFetcher(failures={"http://a/bad.png": [_http_error(404)]})
+    urls = [f"http://a/{i}.png" for i in range(12)] + ["http://a/1.png"]
+    urls.append("http://a/bad.png")
+    release = threading.Event()
+    ocred = []
+
+    def slow_ocr(url, image):
+        release.wait(5)
+        ocred.append(url)
+        return {"text": url, "vouchers": ["1234567812345678"]}
+
+    async def run():
+        task = asyncio.create_task(
+            ingest_urls(urls, ocr=slow_ocr, ocr_workers=2, fetcher=fetcher)
+        )
+        await asyncio.sleep(0.2)
+        # OCR is stuck: downloads stop once the pending images fill the slots
+        held = sum(fetcher.calls.values())
+        release.set()
+        return held, await task
+
+    held, results = asyncio.run(run())
+    assert held == 2 * PENDING_PER_OCR_WORKER
+    assert len(results) == 13
+    assert fetcher.calls["http://a/1.png"] == 1
+    by_url = {r["url"]: r for r in results}
+    assert by_url["http://a/bad.png"]["error"].startswith("HTTPError")
+    assert by_url["http://a/bad.png"]["vouchers"] == []
+    assert "http://a/bad.png" not in ocred
+    assert by_url["http://a/3.png"]["vouchers"] == ["1234567812345678"]
+
+
+def test_default_fetcher_leaves_retries_to_the_downloader():
+    adapter = batch_urls.get_url_fetcher().session.get_adapter("https://a/1.png")
+    assert adapter.max_retries.total == 0
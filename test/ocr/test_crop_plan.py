@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.crop_plan import (
+    FOCUS,
+    QUARTERS,
+    ROTATIONS,
+    CropSpec,
+    crop_plan,
+    is_cv2_compatible,
+    iter_crops,
+    save_crops,
+)
+
+
+def _image() -> np.ndarray:
+    return np.arange(60 * 80 * 3, dtype=np.uint32).reshape(60, 80, 3).astype(np.uint8)
+
+
+def test_regions_are_views():
+    image = _image()
+    for spec, view in iter_crops(image, FOCUS + QUARTERS):
+        assert np.shares_memory(view, image), spec.name
+    _, top_right = list(iter_crops(image, QUARTERS))[1]
+    np.testing.assert_array_equal(top_right, image[:30, 40:])
+
+
+def test_rotations_match_pil():
+    image = _image()
+    for spec, rotated in iter_crops(image, ROTATIONS):
+        expected = np.asarray(Image.fromarray(image).rotate(spec.rotation, expand=True))
+        np.testing.assert_array_equal(rotated, expected)
+        assert is_cv2_compatible(rotated)
+
+
+def test_crops_are_produced_lazily():
+    seen = []
+
+    def specs():
+        for spec in ROTATIONS:
+            seen.append(spec.name)
+            yield spec
+
+    crops = iter_crops(_image(), specs())
+    next(crops)
+    assert seen == ["angle_0"]
+
+
+def test_unknown_plan():
+    assert len(crop_plan("halves")) == 4
+    with pytest.raises(ValueError):
+        crop_plan("thirds")
+
+
+def test_save_crops(tmp_path):
+    directory = str(tmp_path)
+    paths = save_crops(_image(), [CropSpec("left", (0, 0, 0.5, 1))], directory)
+    assert paths == [os.path.join(directory, "left.png")]
+    assert Image.open(paths[0]).size == (40, 60)
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.decoders import (
+    DECODERS,
+    decode_image,
+    image_size,
+    load_image,
+    load_pil_image,
+    read_image,
+    register_decoder,
+    sniff_format,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "fixtures")
+
+
+def _sample() -> np.ndarray:
+    image = np.zeros((40, 60, 3), np.uint8)
+    image[:, :30] = (255, 0, 0)  # blue in BGR
+    return image
+
+
+def test_sniff_format():
+    for ext, fmt in ((".jpg", "jpeg"), (".png", "png"), (".bmp", "bmp")):
+        ok, encoded = cv2.imencode(ext, _sample())
+        assert ok
+        assert sniff_format(encoded.tobytes()) == fmt
+    with open(os.path.join(FIXTURES, "noise.avif"), "rb") as f:
+        assert sniff_format(f.read(64)) == "avif"
+    assert sniff_format(b"plain text") is None
+
+
+def test_image_size_from_header():
+    for ext in (".jpg", ".png"):
+        _, encoded = cv2.imencode(ext, _sample())
+        assert image_size(encoded) == (60, 40)
+
+
+def test_decode_returns_canonical_bgr():
+    _, encoded = cv2.imencode(".png", _sample())
+    image = decode_image(encoded.tobytes())
+    assert image.shape == (40, 60, 3)
+    assert image.dtype == np.uint8
+    assert tuple(image[0, 0]) == (255, 0, 0)
+    gray = load_image(cv2.cvtColor(_sample(), cv2.COLOR_BGR2GRAY))
+    assert gray.shape == (40, 60, 3)
+
+
+def test_pil_round_trip_keeps_channel_order():
+    pil = load_pil_image(_sample())
+    assert pil.getpixel((0, 0)) == (0, 0, 255)
+    assert tuple(load_image(pil)[0, 0]) == (255, 0, 0)
+
+
+def test_read_image_memory_maps_files(tmp_path):
+    image = read_image(os.path.join(FIXTURES, "noise.avif"))
+    assert image.ndim == 3
+    assert image.shape[2] == 3
+    empty = tmp_path / "empty.png"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        read_image(str(empty))
+
+
+def test_falls_through_the_decoder_chain(monkeypatch):
+    calls = []
+
+    def failing(buf):
+        calls.append(len(buf))
+        return None
+
+    monkeypatch.setitem(DECODERS, "png", list(DECODERS["png"]))
+    register_decoder("png", failing)
+    _, encoded = cv2.imencode(".png", _sample())
+    assert decode_image(encoded).shape == (40, 60, 3)
+    assert calls == [len(encoded)]
+    with pytest.raises(ValueError):
+        decode_image(b"not an image at all")
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.image_utils import detect_document_quad, dewarp_image, warp_quad
+
+CORNERS = np.array([[30, 25], [2960, 45], [2975, 2170], [20, 2160]], np.float32)
+
+
+def _photo() -> np.ndarray:
+    """A large photo of a bright, slightly skewed page on a thin dark margin."""
+    image = np.full((2200, 3000, 3), 40, np.uint8)
+    cv2.fillConvexPoly(image, CORNERS.astype(np.int32), (235, 235, 235))
+    cv2.putText(image, "1234", (900, 1100), cv2.FONT_HERSHEY_SIMPLEX, 8, (0, 0, 0), 20)
+    return image
+
+
+def test_detects_corners_at_full_resolution():
+    corners = detect_document_quad(_photo(), detect_max_side=600)
+    assert corners is not None
+    assert np.abs(corners - CORNERS).max() < 2.0
+
+
+def test_returns_ndarray_in_caller_color_order():
+    photo = _photo()
+    photo[:, :, 0] = np.where(photo[:, :, 1] > 200, 255, photo[:, :, 0])
+    warped, path = dewarp_image(photo, save=False)
+    assert isinstance(warped, np.ndarray)
+    assert path is None
+    center = warped[warped.shape[0] // 4, warped.shape[1] // 4]
+    assert tuple(center) == (255, 235, 235)
+    rgb, _ = dewarp_image(Image.fromarray(photo), save=False)
+    assert tuple(rgb[rgb.shape[0] // 4, rgb.shape[1] // 4]) == (255, 235, 235)
+
+
+def test_crop_is_fused_into_the_warp():
+    photo = _photo()
+    corners = detect_document_quad(photo)
+    full = warp_quad(photo, corners)
+    half = warp_quad(photo, corners, crop=(0.5, 0.0, 1.0, 0.5))
+    height, width = full.shape[:2]
+    expected = full[: height // 2, width // 2 :]
+    assert half.shape[:2] == expected.shape[:2]
+    diff = np.abs(half.astype(int) - expected.astype(int))
+    assert diff.mean() < 1.0
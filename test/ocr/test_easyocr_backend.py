@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("easyocr")
+
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.ocr.decoders import read_image
+from src.ocr.easyocr_impl import extract_text_from_image
+
+FIXTURES = ["test/fixtures/voucher-fix.jpeg", "test/fixtures/voucher.jpeg"]
+
+
+def _codes(image, options):
+    results = extract_text_from_image(image, easyocr_options=options)
+    return extract_voucher_codes(" ".join(r["text"] for r in results))
+
+
+@pytest.mark.parametrize("path", FIXTURES)
+@pytest.mark.parametrize("backend", ["torchscript", "onnx"])
+def test_backend_matches_eager(backend, path, tmp_path):
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    # EasyOCR reads arrays as RGB
+    image = read_image(path)[:, :, ::-1].copy()
+    eager = _codes(image, {"gpu": False})
+    optimized = {"gpu": False, "backend": backend, "backend_cache_dir": str(tmp_path)}
+    assert _codes(image, optimized) == eager
+    # The second Reader loads the cached export instead of exporting again
+    exported = sorted(os.listdir(tmp_path))
+    assert exported
+    from src.ocr import easyocr_impl
+
+    easyocr_impl._readers.clear()
+    assert _codes(image, optimized) == eager
+    assert sorted(os.listdir(tmp_path)) == exported
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.image_fetcher import ImageFetcher, ImageTooLargeError, RawBytesCache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "fixtures", "voucher.jpeg")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the voucher fixture with an ETag and counts full responses."""
+
+    body = open(FIXTURE, "rb").read()
+    etag = '"voucher-v1"'
+    full_responses = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        type(self).full_responses += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    StandInHandler.full_responses = 0
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_fetch_caches_original_bytes_and_revalidates(server, tmp_path):
+    fetcher = ImageFetcher(cache=RawBytesCache(str(tmp_path)))
+    url = f"{server}/voucher.jpeg"
+    first = fetcher.fetch(url)
+    second = fetcher.fetch(url)
+    assert first == second == StandInHandler.body
+    # The second request was answered with 304 Not Modified
+    assert StandInHandler.full_responses == 1
+    with open(fetcher.cache.get(url)["path"], "rb") as f:
+        assert f.read() == StandInHandler.body
+
+
+def test_fetch_rejects_oversized_body(server, tmp_path):
+    fetcher = ImageFetcher(cache=RawBytesCache(str(tmp_path)), max_bytes=1024)
+    with pytest.raises(ImageTooLargeError):
+        fetcher.fetch(f"{server}/voucher.jpeg")
+    assert fetcher.cache.get(f"{server}/voucher.jpeg") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = RawBytesCache(str(tmp_path), max_bytes=250)
+    cache.put("http://a/1", b"x" * 100)
+    cache.put("http://a/2", b"x" * 100)
+    cache.touch("http://a/1")
+    cache.put("http://a/3", b"x" * 100)
+    assert cache.get("http://a/1") is not None
+    assert cache.get("http://a/2") is None
+    assert cache.get("http://a/3") is not None
@@ -0,0 +1,164 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr import live as live_module
+from src.ocr.live import (
+    LiveOCR,
+    frame_change,
+    run_stream,
+    session_key,
+    sharpness,
+    thumbnail,
+)
+
+CODE = "1234 5678 9012 3456"
+CODE_2 = "6543 2109 8765 4321"
+
+
+def _frame(x=200, y=300, text=CODE, noise=0):
+    frame = np.full((720, 1280, 3), 255, np.uint8)
+    cv2.rectangle(frame, (40, 40), (1240, 680), (90, 90, 90), 3)
+    if text:
+        cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    if noise:
+        rng = np.random.default_rng(noise)
+        frame = cv2.add(frame, rng.integers(0, 4, frame.shape, dtype=np.uint8))
+    return frame
+
+
+class _InkReader:
+    """Reads ``CODE`` where the frame has text-sized dark pixels, like OCR would."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, image):
+        self.shapes.append(image.shape[:2])
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        ys, xs = np.nonzero(gray < 60)
+        if not len(xs):
+            return []
+        box = (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+        return [{"text": CODE, "box": box, "conf": 90.0}]
+
+
+class _TwoLineReader:
+    """Reads ``CODE`` and ``CODE_2`` from the top and bottom ink bands."""
+
+    def __init__(self, miss_calls=()):
+        self.calls = 0
+        self.miss_calls = set(miss_calls)  # calls that lose the bottom line
+
+    def __call__(self, image):
+        self.calls += 1
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        ink = gray < 60
+        rows = np.nonzero(ink.any(axis=1))[0]
+        if not len(rows):
+            return []
+        split = rows[0] + (rows[-1] - rows[0]) // 2
+        lines = []
+        for text, band in ((CODE, slice(None, split)), (CODE_2, slice(split, None))):
+            ys, xs = np.nonzero(ink[band])
+            y0 = 0 if band.start is None else band.start
+            box = (int(xs.min()), y0 + int(ys.min()), int(xs.max()) + 1)
+            lines.append({"text": text, "box": box + (y0 + int(ys.max()) + 1,)})
+        return lines[:1] if self.calls in self.miss_calls else lines
+
+
+def _two_codes(noise=0):
+    frame = _frame(noise=noise)
+    cv2.putText(frame, CODE_2, (200, 450), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return frame
+
+
+def test_scores_separate_blur_and_change():
+    gray = cv2.cvtColor(_frame(), cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (31, 31), 10)
+    assert sharpness(gray) > 10 * sharpness(blurred)
+    same = frame_change(thumbnail(gray), thumbnail(gray))
+    moved = cv2.cvtColor(_frame(x=500, y=500), cv2.COLOR_BGR2GRAY)
+    assert same == 0.0
+    assert frame_change(thumbnail(gray), thumbnail(moved)) > 0.01
+    assert frame_change(None, thumbnail(gray)) == 1.0
+
+
+def test_gates_frames_tracks_the_code_region_and_stops_when_stable():
+    reader = _InkReader()
+    live = LiveOCR(reader, stable_frames=3)
+    blurry = cv2.GaussianBlur(_frame(), (41, 41), 15)
+    frames = [
+        _frame(text=None),  # nothing to read yet
+        _frame(text=None, noise=1),  # same scene
+        blurry,
+        _frame(),
+        _frame(x=210, noise=2),  # small movement: stays in the region
+        _frame(noise=3),
+        _frame(noise=4),  # never reached
+    ]
+    results = list(run_stream(frames, live))
+    actions = [r["action"] for r in results]
+    assert actions == ["ocr", "unchanged", "blurry", "ocr", "roi", "roi"]
+    assert live.done and live.codes == ["1234567890123456"]
+    assert live.reads == 4
+    # Region reads only look at the code line
+    full, roi = reader.shapes[1], reader.shapes[2]
+    assert roi[0] * roi[1] < full[0] * full[1] / 5
+    x0, y0, x1, y1 = results[-1]["roi"]
+    assert x0 < 210 and y0 < 300 - 30 and x1 > 600 and y1 > 300
+    assert live.feed(_frame())["action"] == "stopped"
+
+
+def test_loses_the_region_when_the_codes_disappear():
+    reader = _InkReader()
+    live = LiveOCR(reader, stable_frames=5)
+    live.feed(_frame())
+    assert live.roi is not None
+    # The voucher is gone: the region reads come back empty, then a full read
+    for noise in (1, 2):
+        live.feed(_frame(text=None, noise=noise))
+    assert live.roi is None
+    assert live.feed(_frame(x=600, y=600))["action"] == "ocr"
+    assert live.stable == 2
+
+
+def test_a_read_missing_a_code_neither_shrinks_the_region_nor_counts():
+    # The second region read loses the bottom code (motion blur, glare)
+    live = LiveOCR(_TwoLineReader(miss_calls={3}), stable_frames=3)
+    both = ["1234567890123456", "6543210987654321"]
+    for noise in range(1, 4):
+        live.feed(_two_codes(noise))
+    assert live.codes == both
+    assert not live.done and live.stable == 2
+    assert live.roi[1] < 300 - 30 and live.roi[3] > 450
+    live.feed(_two_codes(4))
+    assert live.done and live.codes == both
+
+
+def test_store_keys_each_session_separately(monkeypatch):
+    assert session_key("0", 0) != session_key("0", 3600)
+    assert session_key("0", 0).startswith("0@")
+    submitted = []
+
+    class FakeSink:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def submit(self, key, codes):
+            submitted.append((key, codes))
+
+    monkeypatch.setattr(
+        live_module, "LiveOCR", lambda **kw: LiveOCR(_InkReader(), **kw)
+    )
+    monkeypatch.setattr(live_module, "iter_frames", lambda source: iter([_frame()] * 3))
+    monkeypatch.setattr("src.database.voucher_sink.VoucherSink", FakeSink)
+    live_module.main(["0", "--store", "--stable-frames", "1", "--session", "desk-1"])
+    assert submitted == [("desk-1", ["1234567890123456"])]
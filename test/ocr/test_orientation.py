@@ -0,0 +1,57 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.orientation import (
+    candidate_rotations,
+    detect_orientation,
+    orientation_specs,
+)
+
+
+def _page() -> np.ndarray:
+    image = np.full((900, 1200, 3), 255, np.uint8)
+    lines = [
+        "the quick brown fox jumps",
+        "over the lazy dog while",
+        "kids play with bright kites",
+        "voucher code 1234 5678",
+    ]
+    for i, text in enumerate(lines):
+        cv2.putText(
+            image, text, (40, 120 + i * 160), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4
+        )
+    return image
+
+
+@pytest.mark.parametrize("k", range(4))
+def test_detects_each_rotation(k):
+    rotated = np.ascontiguousarray(np.rot90(_page(), k=k))
+    result = detect_orientation(rotated, method="heuristic")
+    assert result["rotation"] == (360 - 90 * k) % 360
+    assert sum(result["scores"].values()) == pytest.approx(1.0)
+
+
+def test_specs_restore_upright_page():
+    page = _page()
+    rotated = np.ascontiguousarray(np.rot90(page, k=1))
+    specs = orientation_specs(rotated, method="heuristic")
+    assert len(specs) in (1, 2)
+    np.testing.assert_array_equal(specs[0].view(rotated), page)
+
+
+def test_low_confidence_keeps_runner_up():
+    result = {
+        "rotation": 0,
+        "confidence": 0.5,
+        "scores": {0: 0.5, 180: 0.4, 90: 0.07, 270: 0.03},
+        "method": "heuristic",
+    }
+    assert candidate_rotations(result) == [0, 180]
+    result["confidence"] = 0.9
+    assert candidate_rotations(result) == [0]
@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.ocr.pipeline import Stage, StagedPipeline, StageError, parse_stage_workers
+
+
+def test_pipeline_runs_all_items_and_overlaps_stages():
+    events = []
+    lock = threading.Lock()
+    ocr_started = threading.Event()
+
+    def record(*event):
+        with lock:
+            events.append(event)
+
+    def decode(x):
+        record("decode", "start", x)
+        if x == 9:
+            # Only finishes once OCR runs alongside: serial stages never get here
+            ocr_started.wait(5)
+        record("decode", "end", x)
+        return x * 10
+
+    def ocr(x):
+        record("ocr", "start", x)
+        ocr_started.set()
+        record("ocr", "end", x)
+        return x + 1
+
+    pipeline = StagedPipeline([Stage("decode", decode), Stage("ocr", ocr)])
+    results = sorted(pipeline.run(range(10)))
+    assert results == [x * 10 + 1 for x in range(10)]
+    # OCR starts on early items before decoding has finished the last one
+    assert events.index(("ocr", "start", 0)) < events.index(("decode", "end", 9))
+    report = pipeline.report()
+    assert report["decode"]["items"] == report["ocr"]["items"] == 10
+
+
+def test_pipeline_applies_backpressure():
+    in_flight = []
+    lock = threading.Lock()
+    produced = [0]
+
+    def produce():
+        for i in range(50):
+            with lock:
+                produced[0] += 1
+            yield i
+
+    def slow(x):
+        time.sleep(0.01)
+        return x
+
+    pipeline = StagedPipeline([Stage("fast", lambda x: x), Stage("slow", slow)], 2)
+    for result in pipeline.run(produce()):
+        with lock:
+            in_flight.append(produced[0] - len(in_flight) - 1)
+    # Never more than the queue capacities plus one item per worker are buffered
+    assert max(in_flight) <= 2 * 3 + 2
+    assert pipeline.bottleneck() == "slow"
+
+
+def test_pipeline_wraps_stage_errors():
+    def maybe_fail(x):
+        if x == 3:
+            raise ValueError("bad image")
+        return x
+
+    pipeline = StagedPipeline([Stage("decode", maybe_fail, 2), Stage("ocr", str)])
+    results = list(pipeline.run(range(5)))
+    errors = [r for r in results if isinstance(r, StageError)]
+    assert len(results) == 5
+    assert len(errors) == 1 and errors[0].stage == "decode" and errors[0].item == 3
+    assert pipeline.report()["decode"]["errors"] == 1
+    assert parse_stage_workers("decode=2, ocr=4") == {"decode": 2, "ocr": 4}
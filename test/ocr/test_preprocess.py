@@ -0,0 +1,107 @@
+import os
+import sys
+from unittest import mock
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr import preprocess
+from src.ocr.preprocess import (
+    MEMO_SIZE,
+    STEPS,
+    Preprocessor,
+    get_chain,
+    register_step,
+    step,
+)
+
+
+def _image() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def calls():
+    """Registers a ``counted`` step and returns the tags it ran with."""
+    seen = []
+
+    def counted(image, tag="x"):
+        seen.append(tag)
+        return cv2.GaussianBlur(image, (3, 3), 0)
+
+    register_step("counted", counted)
+    yield seen
+    STEPS.pop("counted", None)
+
+
+def test_chains_share_memoized_prefix(calls):
+    pre = Preprocessor(memo_size=MEMO_SIZE)
+    image = _image()
+    first = [step("counted", tag="a"), step("gray")]
+    second = [step("counted", tag="a"), step("otsu")]
+    pre.run(image, first)
+    result = pre.run(image, second)
+    assert calls == ["a"]
+    assert [t["cached"] for t in result["timings"]] == [True, False]
+    assert result["timings"][0]["step"] == "counted(tag=a)"
+    # A different image misses the cache
+    pre.run(_image() // 2, first)
+    assert calls == ["a", "a"]
+
+
+def test_shared_preprocessor_keeps_no_intermediates(calls):
+    image = _image()
+    chain = [step("counted", tag="a"), step("gray")]
+    preprocess.preprocess(image, chain)
+    preprocess.preprocess(image, chain)
+    assert calls == ["a", "a"]
+    assert len(preprocess._default._memo) == 0
+
+
+def test_disabled_memo_does_not_hash_the_image():
+    with mock.patch.object(preprocess, "image_key", side_effect=AssertionError):
+        preprocess.preprocess(_image(), [step("gray")], max_pixels=60_000)
+
+
+def test_focus_chain_matches_manual_steps():
+    image = _image()
+    gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    sharp = cv2.filter2D(gray, -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+    _, binary = cv2.threshold(sharp, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    expected = cv2.medianBlur(binary, 3)
+    result = Preprocessor(memo_size=0).run(image, "focus")
+    np.testing.assert_array_equal(result["image"], expected)
+    assert len(result["timings"]) == len(get_chain("focus"))
+
+
+def test_on_step_sees_every_step():
+    seen = []
+    Preprocessor().run(
+        _image(),
+        [step("gray"), step("median", ksize=3)],
+        on_step=lambda s, out, timing: seen.append((str(s), out.ndim)),
+    )
+    assert seen == [("gray", 2), ("median(ksize=3)", 2)]
+
+
+def test_max_pixels_bounds_every_step():
+    sizes = []
+    result = Preprocessor(memo_size=0).run(
+        _image(),
+        [step("upscale", factor=4.0), step("gray")],
+        on_step=lambda s, out, timing: sizes.append(out.shape[0] * out.shape[1]),
+        max_pixels=60_000,
+    )
+    assert all(size <= 60_000 for size in sizes)
+    assert result["image"].ndim == 2
+
+
+def test_unknown_chain_or_step():
+    with pytest.raises(ValueError):
+        Preprocessor().run(_image(), "no-such-chain")
+    with pytest.raises(ValueError):
+        Preprocessor().run(_image(), [step("no-such-step")])
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.database.VoucherDatabase import extract_voucher_codes
+from src.ocr.refine import heavy_preprocess, refine, weak_regions, words_to_lines
+
+
+def _word(text, x0, y0, x1, y1, conf, line):
+    return {"text": text, "box": (x0, y0, x1, y1), "conf": conf, "line": (1, 1, line)}
+
+
+# A clean code, a code with one blurry group, a cut-off code and a plain text line
+WORDS = [
+    _word("1234", 10, 10, 60, 30, 95, 1),
+    _word("5678", 70, 10, 120, 30, 94, 1),
+    _word("9012", 130, 10, 180, 30, 96, 1),
+    _word("3456", 190, 10, 240, 30, 93, 1),
+    _word("1111", 10, 100, 60, 120, 91, 2),
+    _word("2Z22", 70, 100, 120, 120, 31, 2),
+    _word("3333", 130, 100, 180, 120, 90, 2),
+    _word("4444", 190, 100, 240, 120, 92, 2),
+    _word("8765", 10, 200, 60, 220, 88, 3),
+    _word("4321", 70, 200, 120, 220, 90, 3),
+    _word("Voucher", 10, 300, 120, 320, 20, 4),
+]
+
+
+def test_lines_keep_boxes_and_mean_confidence():
+    first = words_to_lines(WORDS)[0]
+    assert first["text"] == "1234 5678 9012 3456"
+    assert first["box"] == (10, 10, 240, 30)
+    assert first["conf"] == pytest.approx(94.5)
+
+
+def test_only_weak_code_lines_are_selected():
+    regions = weak_regions(WORDS, (400, 400))
+    assert len(regions) == 2
+    # The blurry line is least confident, so it comes first
+    assert regions[0][1] < 100 < 120 < regions[0][3]
+    assert regions[1][1] < 200 < 220 < regions[1][3]
+    assert weak_regions(WORDS, (400, 400), max_regions=1) == regions[:1]
+
+
+def test_refine_rereads_regions_only():
+    image = np.full((400, 400), 255, np.uint8)
+    shapes = []
+
+    def reread(region):
+        shapes.append(region.shape)
+        return "1111222233334444"
+
+    result = refine(image, WORDS, reread=reread)
+    assert len(shapes) == 2
+    assert all(h < 100 and w < 400 for h, w in shapes)
+    # Each weak line is replaced by its region's re-read, in reading order
+    assert result["text"].splitlines() == [
+        "1234 5678 9012 3456",
+        "1111222233334444",
+        "1111222233334444",
+        "Voucher",
+    ]
+
+
+def test_misread_code_is_replaced_by_the_reread():
+    # The blurry group was misread as digits: still a 16-digit "code"
+    words = WORDS[:4] + [
+        _word("1111", 10, 100, 60, 120, 91, 2),
+        _word("2922", 70, 100, 120, 120, 31, 2),
+        _word("3333", 130, 100, 180, 120, 90, 2),
+        _word("4444", 190, 100, 240, 120, 92, 2),
+    ]
+    image = np.full((400, 400), 255, np.uint8)
+    result = refine(image, words, reread=lambda region: "1111222233334444")
+    assert "2922" not in result["text"]
+    assert extract_voucher_codes(result["text"]) == [
+        "1234567890123456",
+        "1111222233334444",
+    ]
+    # An empty re-read keeps the first pass
+    result = refine(image, words, reread=lambda region: "")
+    assert "1111 2922 3333 4444" in result["text"]
+
+
+def test_heavy_preprocess_gives_dark_text_on_white():
+    region = np.zeros((20, 60), np.uint8)
+    region[5:15, 10:20] = 255  # light text on a dark background
+    out = heavy_preprocess(region)
+    assert out.shape == (60, 140)
+    assert np.count_nonzero(out) > out.size / 2
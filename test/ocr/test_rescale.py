@@ -0,0 +1,109 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.rescale import (
+    decode_for_ocr,
+    decode_within_budget,
+    estimate_char_height,
+    fit_pixel_budget,
+    reduction_for_scale,
+    rescale_factor,
+    rescale_for_ocr,
+)
+
+
+def _text_image(font_scale: float, size=(2400, 3200)) -> np.ndarray:
+    """White page with several lines of black voucher-like text."""
+    image = np.full((size[0], size[1], 3), 255, np.uint8)
+    line_height = int(40 * font_scale)
+    for row in range(6):
+        cv2.putText(
+            image,
+            "ABCD 1234 EFGH 5678",
+            (50, 100 + row * line_height * 2),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            (0, 0, 0),
+            max(1, int(font_scale * 2)),
+        )
+    return image
+
+
+def test_estimate_char_height_tracks_font_size():
+    small = estimate_char_height(_text_image(2.0))
+    large = estimate_char_height(_text_image(4.0))
+    assert small is not None
+    assert large is not None
+    assert large / small == pytest.approx(2.0, abs=0.4)
+
+
+def test_blank_image_is_left_alone():
+    blank = np.full((500, 500, 3), 255, np.uint8)
+    assert estimate_char_height(blank) is None
+    image, scale = rescale_for_ocr(blank)
+    assert scale == 1.0
+    assert image is blank
+
+
+def test_large_text_is_shrunk():
+    image, scale = rescale_for_ocr(_text_image(4.0), target_char_height=32)
+    assert scale < 1.0
+    assert estimate_char_height(image) == pytest.approx(32, abs=8)
+
+
+def test_rescale_factor_is_clamped():
+    assert rescale_factor(None) == 1.0
+    assert rescale_factor(31, 32) == 1.0
+    assert rescale_factor(1, 32) == 3.0
+    assert rescale_factor(1000, 32) == 0.2
+
+
+def test_reduction_for_scale():
+    assert reduction_for_scale(1.0) == 1
+    assert reduction_for_scale(0.5) == 2
+    assert reduction_for_scale(0.3) == 2
+    assert reduction_for_scale(0.2) == 4
+    assert reduction_for_scale(0.1) == 8
+
+
+def test_decode_for_ocr_reduces_jpeg():
+    original = _text_image(4.0)
+    ok, encoded = cv2.imencode(".jpg", original)
+    assert ok
+    image, scale = decode_for_ocr(encoded.tobytes(), target_char_height=32)
+    assert scale < 1.0
+    assert image.shape[1] == pytest.approx(original.shape[1] * scale, abs=2)
+
+
+def test_decode_for_ocr_rejects_garbage():
+    image, scale = decode_for_ocr(b"not an image")
+    assert image is None
+    assert scale == 1.0
+
+
+def test_decode_within_budget_reduces_and_drops_color():
+    ok, encoded = cv2.imencode(".jpg", _text_image(4.0))
+    assert ok
+    budget = 1_000_000
+    image = decode_within_budget(encoded.tobytes(), budget, gray=True)
+    assert image.ndim == 2
+    assert image.shape[0] * image.shape[1] <= budget
+    # 1/4 JPEG reduction (600x800) would leave the budget half unused
+    assert image.shape[0] * image.shape[1] > budget * 0.9
+    ok, encoded = cv2.imencode(".png", _text_image(1.0, (300, 400)))
+    small = decode_within_budget(encoded.tobytes(), budget)
+    assert small.shape == (300, 400, 3)
+
+
+def test_fit_pixel_budget():
+    image = np.zeros((1000, 3000), np.uint8)
+    fitted, scale = fit_pixel_budget(image, 750_000)
+    assert scale == pytest.approx(0.5)
+    assert fitted.shape == (500, 1500)
+    assert fit_pixel_budget(image, 3_000_000)[0] is image
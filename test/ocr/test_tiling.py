@@ -0,0 +1,104 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.easyocr_impl import detect_lines, section_for_box
+from src.ocr.tiling import (
+    merge_tile_boxes,
+    ocr_tiled,
+    ocr_tiles,
+    tile_geometry,
+    tile_plan,
+)
+
+# Codes drawn as filled boxes; the value in each box is its "text"
+CODES = {
+    1: (100, 100, 400, 130),
+    2: (850, 300, 1150, 330),  # straddles the first vertical seam
+    3: (1500, 980, 1800, 1010),  # straddles the horizontal seam
+    4: (60, 1400, 360, 1430),
+}
+
+
+def _image() -> np.ndarray:
+    image = np.zeros((1500, 2000), np.uint8)
+    for value, (x0, y0, x1, y1) in CODES.items():
+        image[y0:y1, x0:x1] = value
+    return image
+
+
+def _read_boxes(tile: np.ndarray):
+    lines = []
+    for value in np.unique(tile[tile > 0]):
+        ys, xs = np.nonzero(tile == value)
+        box = (int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1)
+        lines.append({"text": f"code {value}", "box": box, "conf": 90.0})
+    return lines
+
+
+class _BoxDetector:
+    """Stands in for an easyocr Reader: every code box is one horizontal line."""
+
+    def detect(self, image):
+        boxes = [line["box"] for line in _read_boxes(image)]
+        return [[[x0, x1, y0, y1] for x0, y0, x1, y1 in boxes]], [[]]
+
+
+def test_plan_covers_image_with_overlap():
+    tiles = tile_plan(2000, 1500, 1000, 400)
+    assert {(t.x1, t.y1) for t in tiles if t.name == "tile_1_2"} == {(2000, 1500)}
+    xs = sorted({t.x0 for t in tiles})
+    for a, b in zip(xs, xs[1:]):
+        assert b <= a + 1000 - 400
+    assert tile_plan(300, 200, 1000, 400)[0][1:] == (0, 0, 300, 200)
+    with pytest.raises(ValueError):
+        tile_plan(2000, 1500, 400, 400)
+
+
+def test_geometry_overlap_fits_a_code():
+    tile_size, overlap = tile_geometry(32)
+    assert overlap >= 300
+    assert tile_size > overlap
+
+
+def test_codes_across_seams_are_read_once():
+    lines = ocr_tiles(_image(), _read_boxes, tile_size=1000, overlap=400, workers=3)
+    assert sorted(line["text"] for line in lines) == [f"code {v}" for v in CODES]
+    for line in lines:
+        value = int(line["text"].split()[1])
+        assert line["box"] == CODES[value]
+        assert not line["clipped"]
+
+
+def test_small_tile_size_shrinks_the_default_overlap():
+    # The default overlap for 32 px codes is wider than these tiles
+    assert tile_geometry(32)[1] > 300
+    lines = ocr_tiled(_image(), _read_boxes, code_height=32, tile_size=300)
+    assert {line["text"] for line in lines} == {f"code {v}" for v in CODES}
+
+
+def test_boxes_across_seams_are_kept_once():
+    image = _image()
+    tiles = tile_plan(2000, 1500, 1000, 400)
+    found = [
+        (tile.to_global(line["box"]), tile)
+        for tile in tiles
+        for line in _read_boxes(tile.view(image))
+    ]
+    kept = [found[i][0] for i in merge_tile_boxes(found, 2000, 1500)]
+    assert kept == list(CODES.values())
+
+
+def test_detect_lines_in_tiles():
+    horizontal, free = detect_lines(_BoxDetector(), _image(), tile_size=1000)
+    assert horizontal == [[x0, x1, y0, y1] for x0, y0, x1, y1 in CODES.values()]
+    assert free == []
+    sections = [
+        section_for_box([[x0, y0], [x1, y1]], 2000, 1500)
+        for x0, y0, x1, y1 in CODES.values()
+    ]
+    assert sections == ["top-left", "top-right", "bottom-right", "bottom-left"]
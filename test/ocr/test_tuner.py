@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr import tuner
+from src.ocr.tuner import (
+    BUILTIN_PROFILES,
+    choose_profiles,
+    config_name,
+    iter_configs,
+    load_labels,
+    load_profile,
+    pareto_front,
+    save_profiles,
+    tune,
+)
+
+
+def _trial(name, recall, seconds, precision=1.0):
+    config = dict(BUILTIN_PROFILES["fast"], chain=name)
+    return {
+        "name": name,
+        "config": config,
+        "recall": recall,
+        "precision": precision,
+        "seconds": seconds,
+        "found": 0,
+        "expected": 0,
+    }
+
+
+TRIALS = [
+    _trial("a", 0.50, 1.0),
+    _trial("b", 0.40, 2.0),  # slower and worse than a
+    _trial("c", 0.90, 3.0),
+    _trial("d", 1.00, 8.0),
+    _trial("e", 1.00, 9.0),  # as good as d but slower
+]
+
+
+def test_pareto_front():
+    assert [t["name"] for t in pareto_front(TRIALS)] == ["a", "c", "d"]
+
+
+def test_profiles_are_cheapest_meeting_target():
+    profiles = choose_profiles(TRIALS, {"fast": 0.8, "thorough": 1.0})
+    assert profiles["fast"]["name"] == "c"
+    assert profiles["thorough"]["name"] == "d"
+
+
+def test_profiles_must_reach_the_minimum_recall():
+    # Only a and b were tried: 80% of a poor best is still a poor profile
+    poor = TRIALS[:2]
+    assert choose_profiles(poor, {"fast": 0.8}, min_recall=0.75) == {}
+    profiles = choose_profiles(TRIALS, {"fast": 0.5}, min_recall=0.9)
+    assert profiles["fast"]["name"] == "c"
+
+
+def test_saved_profiles_are_loaded_over_builtins(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    save_profiles(choose_profiles(TRIALS), pareto_front(TRIALS), path)
+    assert load_profile("thorough", path)["chain"] == "d"
+    assert load_profile("fast", path)["chain"] == "c"
+    with open(path, "r", encoding="utf-8") as f:
+        assert len(json.load(f)["front"]) == 3
+    with pytest.raises(ValueError):
+        load_profile("turbo", path)
+
+
+def test_profiles_file_is_parsed_again_only_when_it_changes(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    save_profiles(choose_profiles(TRIALS), pareto_front(TRIALS), path)
+    assert load_profile("fast", path)["chain"] == "c"
+    with mock.patch.object(tuner.json, "load", side_effect=AssertionError):
+        assert load_profile("fast", path)["chain"] == "c"
+    save_profiles({"fast": TRIALS[3]}, [], path)
+    assert load_profile("fast", path)["chain"] == "d"
+
+
+def test_configs_are_distinct():
+    configs = list(
+        iter_configs(
+            {"engine": ["tesseract"], "psm": [6], "oem": [3], "chain": ["cli"]}
+        )
+    )
+    names = [config_name(c) for c in configs]
+    assert len(names) == len(set(names))
+    # Tiles never refine, so only one tiled config remains
+    assert sum(c["crops"] == "tiles" for c in configs) == 1
+
+
+def test_tune_measures_recall():
+    samples = load_labels()
+    assert len(samples[0]["codes"]) == 6
+    codes = samples[0]["codes"]
+
+    def fake_ocr(image, config):
+        found = codes if config["crops"] == "focus" else codes[:3]
+        return "\n".join(f"{c[:4]} {c[4:8]} {c[8:12]} {c[12:]}" for c in found)
+
+    configs = [
+        dict(BUILTIN_PROFILES["fast"], chain="none"),
+        dict(BUILTIN_PROFILES["thorough"], chain="none"),
+    ]
+    trials = tune(samples, configs, ocr=fake_ocr)
+    assert [t["recall"] for t in trials] == [0.5, 1.0]
+    assert all(t["seconds"] > 0 for t in trials)
@@ -0,0 +1,246 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr import watch as watch_module
+from src.ocr.batch import ENGINE_FUNCTIONS
+from src.ocr.rescale import DEFAULT_MAX_PIXELS
+from src.ocr.watch import (
+    Debouncer,
+    InotifyWatcher,
+    PollingWatcher,
+    WatchIndex,
+    is_candidate,
+    make_watcher,
+    watch,
+)
+
+CODE_A = "1111222233334444"
+CODE_B = "5555666677778888"
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    directory = tmp_path / "uploads"
+    directory.mkdir()
+    return str(directory)
+
+
+@pytest.fixture
+def output(tmp_path):
+    return str(tmp_path / "out" / "results.jsonl")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Registers the ``fake`` engine and returns the sources it OCRed."""
+    seen = []
+
+    def fake_ocr(source, chain=None, max_pixels=None, profile=None):
+        # The "image" holds the text the engine would read
+        seen.append(source)
+        with open(source, encoding="utf-8") as f:
+            return f.read()
+
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", fake_ocr)
+    return seen
+
+
+def _write(directory, name, text):
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def _run(directory, output, **kwargs):
+    with ThreadPoolExecutor(2) as pool:
+        return watch(
+            directory,
+            output,
+            engine="fake",
+            settle=0.01,
+            once=True,
+            executor=pool,
+            **kwargs,
+        )
+
+
+def _results(output):
+    with open(output, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_restart_only_processes_new_or_changed_files(uploads, output, calls):
+    a = _write(uploads, "a.jpg", CODE_A)
+    _write(uploads, "sub/b.png", CODE_B)
+    _write(uploads, "copy-of-a.jpg", CODE_A)
+    _write(uploads, "c.jpg.part", CODE_B)
+    counts = _run(uploads, output)
+    assert (counts["ok"], counts["duplicate"]) == (2, 1)
+    assert len(calls) == 2
+    codes = {os.path.basename(r["source"]): r["codes"] for r in _results(output)}
+    assert codes["copy-of-a.jpg"] == [CODE_A]
+
+    # Restart: nothing new
+    assert sum(_run(uploads, output).values()) == 0
+    # Touched, same bytes: not OCRed again
+    os.utime(a, ns=(1, 1))
+    assert _run(uploads, output)["unchanged"] == 1
+    # New content
+    _write(uploads, "a.jpg", f"{CODE_A} {CODE_B}")
+    assert _run(uploads, output)["ok"] == 1
+    assert len(calls) == 3
+
+
+def test_failed_files_are_retried_on_restart(uploads, output, calls, monkeypatch):
+    path = _write(uploads, "a.jpg", CODE_A)
+    ok = ENGINE_FUNCTIONS["fake"]
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", lambda *a: 1 / 0)
+    assert _run(uploads, output)["error"] == 1
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", ok)
+    assert _run(uploads, output)["ok"] == 1
+    index = WatchIndex(f"{output}.index")
+    assert index.get(path)["codes"] == [CODE_A]
+    index.close()
+
+
+def _watch_in_thread(stop, counts, **kwargs):
+    def run():
+        counts.update(
+            watch(engine="fake", settle=0.05, poll_interval=0.05, stop=stop, **kwargs)
+        )
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_watches_new_files_until_stopped(uploads, output, calls):
+    stop = threading.Event()
+    counts = {}
+    with ThreadPoolExecutor(1) as pool:
+        thread = _watch_in_thread(
+            stop, counts, directory=uploads, output=output, executor=pool
+        )
+        try:
+            time.sleep(0.2)
+            _write(uploads, "new/a.jpg", CODE_A)
+            deadline = time.monotonic() + 5
+            while not calls and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            time.sleep(0.2)
+            stop.set()
+            thread.join()
+    assert counts["ok"] == 1
+    assert _results(output)[0]["codes"] == [CODE_A]
+
+
+def test_debouncer_waits_for_file_to_settle(uploads):
+    path = _write(uploads, "a.jpg", "x")
+    debouncer = Debouncer(settle=0.1)
+    debouncer.touch(path)
+    assert list(debouncer.ready()) == []
+    time.sleep(0.05)
+    _write(uploads, "a.jpg", "xx")  # still being written
+    assert list(debouncer.ready()) == []
+    time.sleep(0.15)
+    assert [p for p, _ in debouncer.ready()] == [path]
+    assert len(debouncer) == 0
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watchers_report_new_images(uploads, use_inotify):
+    watcher = make_watcher(uploads, interval=0.01, use_inotify=use_inotify)
+    try:
+        path = _write(uploads, "sub/a.jpg", CODE_A)
+        _write(uploads, "sub/notes.txt", CODE_A)
+        changed = []
+        deadline = time.monotonic() + 2
+        while path not in changed and time.monotonic() < deadline:
+            changed += watcher.poll(0.05)
+        assert path in changed
+        assert all(is_candidate(p) for p in changed)
+    finally:
+        watcher.close()
+    assert isinstance(make_watcher(uploads, use_inotify=False), PollingWatcher)
+
+
+def test_watching_survives_a_directory_removed_while_added(uploads):
+    watcher = InotifyWatcher(uploads)
+    try:
+        gone = os.path.join(uploads, "gone")
+        with mock.patch.object(
+            watch_module.os, "walk", return_value=iter([(gone, [], [])])
+        ):
+            watcher._add_tree(gone)
+        assert gone not in watcher._dirs.values()
+        path = _write(uploads, "kept/a.jpg", CODE_A)
+        changed = []
+        deadline = time.monotonic() + 2
+        while path not in changed and time.monotonic() < deadline:
+            changed += watcher.poll(0.05)
+        assert path in changed
+    finally:
+        watcher.close()
+
+
+def test_a_crashed_worker_fails_its_file_and_the_pool_restarts(
+    uploads, output, monkeypatch
+):
+    def crashing_ocr(source, chain=None, max_pixels=None, profile=None):
+        with open(source, encoding="utf-8") as f:
+            text = f.read()
+        if text == "crash":
+            os._exit(1)
+        return text
+
+    monkeypatch.setitem(ENGINE_FUNCTIONS, "fake", crashing_ocr)
+    _write(uploads, "crash.jpg", "crash")
+    stop = threading.Event()
+    counts = {}
+
+    def wait_for_rows(n):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if os.path.exists(output) and len(_results(output)) >= n:
+                return
+            time.sleep(0.05)
+
+    thread = _watch_in_thread(
+        stop, counts, directory=uploads, output=output, workers=1, use_inotify=False
+    )
+    try:
+        wait_for_rows(1)
+        _write(uploads, "a.jpg", CODE_A)
+        wait_for_rows(2)
+    finally:
+        stop.set()
+        thread.join()
+    rows = {os.path.basename(r["source"]): r for r in _results(output)}
+    assert rows["crash.jpg"]["error"].startswith("BrokenProcessPool")
+    assert rows["a.jpg"]["codes"] == [CODE_A]
+    assert (counts["ok"], counts["error"]) == (1, 1)
+
+
+def test_main_passes_max_pixels(uploads):
+    counts = dict.fromkeys(("ok", "error", "unchanged", "duplicate"), 0)
+    with mock.patch.object(watch_module, "watch", return_value=counts) as run:
+        watch_module.main([uploads, "--once", "--max-pixels"])
+        assert run.call_args.kwargs["max_pixels"] == DEFAULT_MAX_PIXELS
+        watch_module.main([uploads, "--once"])
+        assert run.call_args.kwargs["max_pixels"] is None
+
+
+def test_unknown_engine(uploads, output):
+    with pytest.raises(ValueError):
+        watch_module.watch(uploads, output, engine="nope", once=True)
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.ocr.worker_pool import PreforkPool, WorkerError, pool_size
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+
+_model = {}
+
+
+def _load_model():
+    _model["weights"] = [1.5] * 1000
+    _model["loaded_in"] = os.getpid()
+
+
+def _predict(x):
+    # Workers see the supervisor's model without loading it themselves
+    return (x * _model["weights"][0], _model["loaded_in"], os.getpid())
+
+
+def test_workers_share_preloaded_model_and_are_recycled():
+    with PreforkPool(_predict, workers=2, preload=_load_model, max_jobs=2) as pool:
+        results = dict(pool.imap_unordered(range(7)))
+    assert {x: r[0] for x, r in results.items()} == {x: x * 1.5 for x in range(7)}
+    assert {r[1] for r in results.values()} == {os.getpid()}
+    assert os.getpid() not in {r[2] for r in results.values()}
+    assert pool.stats["jobs"] == 7
+    assert pool.stats["recycled"] >= 2
+    assert pool.stats["started"] == 2 + pool.stats["recycled"]
+
+
+def _fragile(x):
+    if x == 3:
+        os._exit(3)
+    if x == 4:
+        raise ValueError("bad item")
+    return x
+
+
+def test_crashed_worker_fails_its_job_and_is_replaced():
+    with PreforkPool(_fragile, workers=2, max_jobs=0) as pool:
+        results = dict(pool.imap_unordered(range(6)))
+    assert sorted(results) == list(range(6))
+    assert isinstance(results[3], WorkerError) and "code 3" in results[3].error
+    assert isinstance(results[4], WorkerError) and "bad item" in results[4].error
+    assert results[5] == 5
+    assert pool.stats["crashed"] == 1
+
+
+def test_pool_size_is_bounded():
+    assert pool_size(max_workers=3) in (1, 2, 3)
+    assert pool_size(worker_memory_mb=10**9, max_workers=8) == 1
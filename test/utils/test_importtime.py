@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.utils.importtime import (
+    STARTUP_BUDGETS,
+    import_report,
+    loaded_lazy_modules,
+    measure_imports,
+    startup_seconds,
+)
+
+
+@pytest.mark.parametrize("module", sorted(STARTUP_BUDGETS))
+def test_tesseract_path_cold_start_within_budget(module):
+    records = measure_imports(module)
+    assert loaded_lazy_modules(records) == [], import_report(records, module)
+    assert startup_seconds(records, module) <= STARTUP_BUDGETS[module], import_report(
+        records, module
+    )
+
+
+def test_report_flags_eager_heavy_imports():
+    records = measure_imports("colorsys")
+    assert startup_seconds(records, "colorsys") > 0
+    fake = records + [
+        {
+            "module": "requests",
+            "self_seconds": 0.05,
+            "cumulative_seconds": 0.05,
+            "depth": 0,
+        }
+    ]
+    assert loaded_lazy_modules(fake) == ["requests"]
+    assert "(should be lazy): requests" in import_report(fake, "colorsys")
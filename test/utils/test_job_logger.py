@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.utils.job_logger import JobLogger, read_job_log
+from src.utils.tracing import span, start_trace
+
+
+def test_job_logger_buffers_until_close(tmp_path):
+    path = str(tmp_path / "job.log")
+    with JobLogger("job-1", path=path) as logger:
+        tracer = start_trace("job-1", sink=logger.span)
+        with span("ocr"):
+            logger.text("ocr", "3028 8786 6115 0824")
+        logger.vouchers("extract", ["3028878661150824"])
+        tracer.flush()
+        assert not os.path.exists(path)
+    records = read_job_log(path)
+    assert [r["type"] for r in records] == ["job", "ocr_text", "vouchers", "span", "job"]
+    assert records[-1]["status"] == "completed"
+    assert "ocr" in records[-1]["timings"]
+    assert records[2]["vouchers"] == ["3028878661150824"]
+
+
+def test_job_logger_flushes_on_failure(tmp_path):
+    path = str(tmp_path / "job.log")
+    with pytest.raises(ValueError):
+        with JobLogger("job-2", path=path) as logger:
+            logger.log("decode", "loading")
+            raise ValueError("bad image")
+    records = read_job_log(path)
+    assert records[-2]["type"] == "error"
+    assert records[-1]["status"] == "failed"
@@ -0,0 +1,38 @@
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from src.utils.memory import MB, current_tracker, memory_stage, track_memory
+
+
+def test_stage_peaks_include_nested_stages():
+    with track_memory() as tracker:
+        assert current_tracker() is tracker
+        with memory_stage("job"):
+            with memory_stage("decode"):
+                image = np.ones((2048, 2048), np.uint8)  # 4 MB, kept
+            with memory_stage("preprocess"):
+                scratch = np.ones((4096, 2048), np.uint8)  # 8 MB, freed
+                del scratch
+    assert current_tracker() is None
+    assert not tracemalloc.is_tracing()
+    peaks = tracker.peaks()
+    assert [r["stage"] for r in tracker.stages][-1] == "job"
+    assert peaks["decode"] >= 4 * MB
+    assert 8 * MB <= peaks["preprocess"] < 9 * MB
+    # The job held the decoded image while preprocessing allocated scratch
+    assert peaks["job"] >= 12 * MB
+    retained = {r["stage"]: r["retained_bytes"] for r in tracker.stages}
+    assert retained["preprocess"] < MB
+    assert "preprocess: peak" in tracker.report()
+    del image
+
+
+def test_stage_without_tracker_is_a_no_op():
+    with memory_stage("decode"):
+        pass
+    assert current_tracker() is None
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import cv2
+import pytest
+from src.utils import thread_budget
+from src.utils.thread_budget import (
+    THREAD_ENV_VARS,
+    ThreadBudget,
+    available_cpus,
+    current_budget,
+    env_count,
+    init_worker,
+)
+
+
+@pytest.fixture
+def restore_threads():
+    saved_env = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    saved_cv2 = cv2.getNumThreads()
+    yield
+    cv2.setNumThreads(saved_cv2)
+    for name, value in saved_env.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def test_cpus_are_split_between_workers():
+    budget = ThreadBudget(workers=4, cpus=range(8))
+    assert budget.threads == 2
+    assert [budget.cpu_set(i) for i in range(4)] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert budget.env()["OMP_THREAD_LIMIT"] == "2"
+
+
+def test_oversubscribed_workers_get_one_thread_and_wrap():
+    budget = ThreadBudget(workers=6, cpus=[0, 1, 2, 3])
+    assert budget.threads == 1
+    assert [budget.cpu_set(i)[0] for i in range(6)] == [0, 1, 2, 3, 0, 1]
+    with pytest.raises(ValueError):
+        ThreadBudget(workers=0)
+
+
+def test_worker_initializer_applies_budget(restore_threads):
+    counter = multiprocessing.Value("i", 0)
+    budget = ThreadBudget(workers=2, cpus=[0, 1, 2, 3])
+    init_worker(budget, counter)
+    assert counter.value == 1
+    assert os.environ["OMP_THREAD_LIMIT"] == "2"
+    assert os.environ["OMP_NUM_THREADS"] == "2"
+    assert cv2.getNumThreads() == 2
+
+
+def test_budget_defaults_to_the_spawners_job_count(monkeypatch):
+    monkeypatch.setattr(thread_budget, "_budget", None)
+    monkeypatch.setenv("OCR_WORKERS", "2")
+    monkeypatch.delenv("OCR_THREADS", raising=False)
+    budget = current_budget()
+    assert budget.workers == 2
+    assert budget.threads == max(1, len(available_cpus()) // 2)
+
+    monkeypatch.setattr(thread_budget, "_budget", None)
+    monkeypatch.setenv("OCR_THREADS", "3")
+    assert current_budget().threads == 3
+    for value in ("", "0", "-2", "two"):
+        monkeypatch.setenv("OCR_WORKERS", value)
+        assert env_count("OCR_WORKERS") is None
@@ -0,0 +1,79 @@
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pytest
+from src.utils.metrics import STAGE_LATENCY, MetricsRegistry, flush_metrics
+from src.utils.tracing import span, start_trace
+
+
+def test_spans_nest_and_reach_sink():
+    records = []
+    tracer = start_trace("test_job", sink=records.append)
+    with span("outer", image="a.png") as outer:
+        with span("inner") as inner:
+            inner.set_attribute("codes", 2)
+    tracer.flush()
+    assert [r["name"] for r in records] == ["inner", "outer"]
+    assert records[0]["parent_id"] == outer.span_id
+    assert records[0]["attributes"] == {"codes": 2}
+    assert records[1]["attributes"] == {"image": "a.png"}
+    assert all(r["trace_id"] == "test_job" for r in records)
+    assert STAGE_LATENCY.count(stage="inner") >= 1
+
+
+def test_span_records_errors():
+    tracer = start_trace("test_job_error")
+    with pytest.raises(RuntimeError):
+        with span("failing"):
+            raise RuntimeError("boom")
+    assert tracer.spans[-1]["status"] == "error"
+    assert "boom" in tracer.spans[-1]["attributes"]["error"]
+
+
+def test_registry_renders_prometheus_text_and_merges_on_flush(tmp_path):
+    registry = MetricsRegistry()
+    hist = registry.histogram("stage_seconds", "Stage time", ("stage",), (0.1, 1.0))
+    counter = registry.counter("cache_total", "Cache lookups", ("result",))
+    hist.observe(0.05, stage="ocr")
+    hist.observe(0.5, stage="ocr")
+    counter.inc(result="hit")
+    text = registry.render()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="ocr",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="ocr",le="+Inf"} 2' in text
+    assert 'cache_total{result="hit"} 1' in text
+
+    registry.flush(str(tmp_path))
+    counter.inc(result="hit")
+    prom_path = registry.flush(str(tmp_path))
+    with open(prom_path, encoding="utf-8") as f:
+        assert 'cache_total{result="hit"} 2' in f.read()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_does_not_inherit_held_metric_locks(tmp_path):
+    # As if a sink thread was observing STAGE_LATENCY when a worker was forked
+    with STAGE_LATENCY._lock:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                STAGE_LATENCY.observe(0.1, stage="child")
+                flush_metrics(str(tmp_path))
+                os._exit(0)
+            finally:
+                os._exit(1)
+    deadline = time.monotonic() + 10
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        if time.monotonic() > deadline:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            pytest.fail("forked child deadlocked on a metric lock")
+        time.sleep(0.01)
+    assert os.waitstatus_to_exitcode(status) == 0